@@ -3,7 +3,7 @@ from aws_lambda_powertools.utilities.parser import event_parser
 from domain.model.document import Document, Workspace, Content
 from app.repository import DocumentRepository
 from app.implementation import ContentTypePolicy
-from app.interface import PreparedDocumentModel, DocumentModel
+from app.interface import PreparedDocumentModel, DocumentModel, DocumentSavedEventModel
 from app.chef import DocumentChef
 from app.middleware import middleware, BadOperationUserError
 from app.notification import NotificationManager
@@ -26,9 +26,7 @@ def handler(event: Event, context: LambdaContext):
     workspace = Workspace(event.workspace)
     content = Content(event.content_body, event.content_type)
 
-    notification_manager = NotificationManager()
-
-    with DocumentRepository.use() as repository:
+    with NotificationManager.use() as notification_manager, DocumentRepository.use(transactional=True) as repository:
         links = DocumentChef(repository).prepare_links(workspace, event.links) if event.links else []
         document = Document.create(
             workspace,
@@ -40,14 +38,9 @@ def handler(event: Event, context: LambdaContext):
         )
         repository.add(document)
 
-        def on_saved_document(saved_document):
-            if saved_document.id == document.id:
-                model = Response.build(saved_document, with_content_body_url=True)
-            else:
-                model = Response.build(saved_document)
-            notification_manager.document_saved(model)
-
-        repository.on_saved_document = on_saved_document
+        repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+            DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
+        )
 
     response = Response.build(document, with_content_body_url=True)
     return response.dict()
@@ -25,12 +25,12 @@ def handler(event: Event, context: LambdaContext):
     document_id = lib.Id(event.document_id)
     workspace = Workspace(event.workspace)
 
-    with DocumentRepository.use() as repository:
+    with NotificationManager.use() as notification_manager, DocumentRepository.use() as repository:
         document = repository.get(document_id, workspace)
         if document:
             document.delete()
 
-        repository.on_deleted_document = lambda deleted_document: NotificationManager().document_deleted(
+        repository.on_deleted_document = lambda deleted_document: notification_manager.document_deleted(
             Response.build(deleted_document)
         )
 
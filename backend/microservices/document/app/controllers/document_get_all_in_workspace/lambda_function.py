@@ -1,18 +1,28 @@
 from typing import List
+from pydantic import conint
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from aws_lambda_powertools.utilities.parser import event_parser
 from domain.model.document import Workspace
-from app.repository import DocumentRepository
-from app.interface import BaseModel, WorkspaceIdentifierModel, DocumentModel
-from app.middleware import middleware
+from app.repository import DocumentRepository, InvalidPageKeyError
+from app.interface import BaseModel, WorkspaceIdentifierModel, DocumentModel, DocumentSummaryModel
+from app.middleware import middleware, BadOperationUserError
 
 
 class Event(WorkspaceIdentifierModel):
-    pass
+    page_size: conint(gt=0) = None
+    next_token: str = None
+    summary: bool = False
 
 
 class Response(BaseModel):
     documents: List[DocumentModel]
+    next_token: str = None
+
+
+class SummaryResponse(BaseModel):
+    # response if event.summary is set
+    documents: List[DocumentSummaryModel]
+    next_token: str = None
 
 
 @middleware
@@ -20,7 +30,21 @@ class Response(BaseModel):
 def handler(event: Event, context: LambdaContext):
     workspace = Workspace(event.workspace)
 
+    if event.summary:
+        with DocumentRepository.use() as repository:
+            try:
+                summaries, next_token = next(repository.iter_workspace_summaries(
+                    workspace, event.page_size, event.next_token))
+            except InvalidPageKeyError:
+                raise BadOperationUserError("Invalid next token")
+
+        return SummaryResponse(documents=[DocumentSummaryModel.build(summary) for summary in summaries],
+                               nextToken=next_token).dict()
+
     with DocumentRepository.use() as repository:
-        documents = repository.get_all_in_workspace(workspace)
+        try:
+            documents, next_token = next(repository.iter_workspace(workspace, event.page_size, event.next_token))
+        except InvalidPageKeyError:
+            raise BadOperationUserError("Invalid next token")
 
-    return Response(documents=[DocumentModel.build(document) for document in documents]).dict()
+    return Response(documents=[DocumentModel.build(document) for document in documents], nextToken=next_token).dict()
@@ -4,7 +4,7 @@ from domain import lib
 from domain.model.document import Workspace, Content, ContentLocation
 from app.repository import DocumentRepository
 from app.implementation import LivingContentTypePolicy, THLINK_DOCUMENT
-from app.interface import DocumentIdentifierModel, PreparedHighlightModel, DocumentModel
+from app.interface import DocumentIdentifierModel, PreparedHighlightModel, DocumentModel, DocumentSavedEventModel
 from app.chef import DocumentChef
 from app.middleware import middleware, BadOperationUserError
 from app.notification import NotificationManager
@@ -24,7 +24,7 @@ def handler(event: Event, context: LambdaContext):
     document_id = lib.Id(event.document_id)
     workspace = Workspace(event.workspace)
 
-    with DocumentRepository.use() as repository:
+    with NotificationManager.use() as notification_manager, DocumentRepository.use(transactional=True) as repository:
         chef = DocumentChef(repository)
         document = chef.order(document_id, workspace)
         if LivingContentTypePolicy.is_satisfied_by(document.content.type):
@@ -35,8 +35,8 @@ def handler(event: Event, context: LambdaContext):
             links = chef.prepare_links(workspace, event.links) if event.links else []
             highlight.make_note(note, links)
 
-        repository.on_saved_document = lambda saved_document: NotificationManager().document_saved(
-            Response.build(saved_document)
+        repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+            DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
         )
 
     response = Response.build(document)
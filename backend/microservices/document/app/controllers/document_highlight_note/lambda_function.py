@@ -4,7 +4,8 @@ from domain import lib
 from domain.model.document import Workspace, Content
 from app.repository import DocumentRepository
 from app.implementation import THLINK_DOCUMENT
-from app.interface import DocumentHighlightIdentifierModel, HighlightMakeNoteModel, DocumentModel
+from app.interface import DocumentHighlightIdentifierModel, HighlightMakeNoteModel, DocumentModel,\
+    DocumentSavedEventModel
 from app.chef import DocumentChef
 from app.middleware import middleware
 from app.notification import NotificationManager
@@ -25,7 +26,7 @@ def handler(event: Event, context: LambdaContext):
     workspace = Workspace(event.workspace)
     document_highlight_id = lib.Id(event.document_highlight_id)
 
-    with DocumentRepository.use() as repository:
+    with NotificationManager.use() as notification_manager, DocumentRepository.use(transactional=True) as repository:
         chef = DocumentChef(repository)
         highlight = chef.order(document_id, workspace, document_highlight_id)
         if event.note_body:
@@ -35,8 +36,8 @@ def handler(event: Event, context: LambdaContext):
         else:
             highlight.delete_note()
 
-        repository.on_saved_document = lambda saved_document: NotificationManager().document_saved(
-            Response.build(saved_document)
+        repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+            DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
         )
 
     response = Response.build(highlight.parent)
@@ -4,7 +4,7 @@ from domain import lib
 from domain.model.document import Workspace, ContentLocation
 from app.repository import DocumentRepository
 from app.implementation import LivingContentTypePolicy
-from app.interface import DocumentIdentifierModel, PreparedLinkModel, DocumentModel
+from app.interface import DocumentIdentifierModel, PreparedLinkModel, DocumentModel, DocumentSavedEventModel
 from app.chef import DocumentChef
 from app.middleware import middleware, BadOperationUserError
 from app.notification import NotificationManager
@@ -28,7 +28,7 @@ def handler(event: Event, context: LambdaContext):
     target_document_highlight_id = lib.Id(event.target_document_highlight_id)\
         if event.target_document_highlight_id else None
 
-    with DocumentRepository.use() as repository:
+    with NotificationManager.use() as notification_manager, DocumentRepository.use(transactional=True) as repository:
         chef = DocumentChef(repository)
         document = chef.order(document_id, workspace)
         if LivingContentTypePolicy.is_satisfied_by(document.content.type):
@@ -38,8 +38,8 @@ def handler(event: Event, context: LambdaContext):
             to=chef.order(target_document_id, workspace, target_document_highlight_id),
         )
 
-        repository.on_saved_document = lambda saved_document: NotificationManager().document_saved(
-            Response.build(saved_document)
+        repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+            DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
         )
 
     response = Response.build(document)
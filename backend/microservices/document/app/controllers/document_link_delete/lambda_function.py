@@ -4,7 +4,7 @@ from domain import lib
 from domain.model.document import Workspace
 from app.repository import DocumentRepository
 from app.implementation import LivingContentTypePolicy
-from app.interface import SourceDocumentLinkIdentifierModel, DocumentModel
+from app.interface import SourceDocumentLinkIdentifierModel, DocumentModel, DocumentSavedEventModel
 from app.chef import DocumentChef
 from app.middleware import middleware, BadOperationUserError
 from app.notification import NotificationManager
@@ -25,7 +25,7 @@ def handler(event: Event, context: LambdaContext):
     workspace = Workspace(event.workspace)
     document_link_id = lib.Id(event.document_link_id)
 
-    with DocumentRepository.use() as repository:
+    with NotificationManager.use() as notification_manager, DocumentRepository.use(transactional=True) as repository:
         document = DocumentChef(repository).order(document_id, workspace)
         if LivingContentTypePolicy.is_satisfied_by(document.content.type):
             raise BadOperationUserError(f"Document content type must not be in {LivingContentTypePolicy.types}")
@@ -33,8 +33,8 @@ def handler(event: Event, context: LambdaContext):
         if link:
             link.delete()
 
-        repository.on_saved_document = lambda saved_document: NotificationManager().document_saved(
-            Response.build(saved_document)
+        repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+            DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
         )
 
     response = Response.build(document)
@@ -0,0 +1,33 @@
+from typing import List
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from aws_lambda_powertools.utilities.parser import event_parser, envelopes
+from domain import lib
+from domain.model.document import Workspace
+from app.repository import DocumentRepository
+from app.interface import DocumentIdentifierModel, DocumentSavedEventModel
+from app.middleware.middleware import logger
+from app.notification import NotificationManager
+
+
+class Event(DocumentIdentifierModel):
+    pass
+
+
+# Consumes the link preview propagation queue (see LinkPreviewPropagationQueue). Not wrapped by the middleware: errors
+# must fail the invocation, so that the jobs are retried - they are idempotent.
+@logger.inject_lambda_context
+@event_parser(model=Event, envelope=envelopes.SqsEnvelope)
+def handler(event: List[Event], context: LambdaContext):
+    jobs = dict.fromkeys((job.document_id, job.workspace) for job in event)  # deduplicate, keep the order
+    # the events of a document that is rewritten by several jobs are merged
+    with NotificationManager.use() as notification_manager:
+        for document_id, workspace in jobs:
+            # one repository per job, so that every job applies the current link previews of its document
+            with DocumentRepository.use() as repository:
+                repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+                    DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
+                )
+                document = repository.get(lib.Id(document_id), Workspace(workspace))
+                if not document:
+                    continue  # deleted in the meantime, its links and backlinks are deleted with it
+                repository.propagate_link_previews(document)
@@ -3,10 +3,11 @@ from aws_lambda_powertools.utilities.parser import event_parser
 from domain import lib
 from domain.model.document import Workspace
 from app.repository import DocumentRepository
-from app.interface import DocumentIdentifierModel, DocumentModel
+from app.interface import DocumentIdentifierModel, DocumentModel, DocumentSavedEventModel
 from app.chef import DocumentChef
 from app.middleware import middleware
 from app.notification import NotificationManager
+from app.propagation import LinkPreviewPropagationQueue
 
 
 class Event(DocumentIdentifierModel):
@@ -23,12 +24,18 @@ def handler(event: Event, context: LambdaContext):
     document_id = lib.Id(event.document_id)
     workspace = Workspace(event.workspace)
 
-    with DocumentRepository.use() as repository:
+    # the referencing documents are updated in the background, so only the document itself is written here
+    with NotificationManager.use() as notification_manager, \
+            DocumentRepository.use(defer_link_preview_propagation=True) as repository:
         document = DocumentChef(repository).order(document_id, workspace)
         document.title = event.title
 
-        repository.on_saved_document = lambda saved_document: NotificationManager().document_saved(
-            Response.build(saved_document)
+        repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+            DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
+        )
+        repository.on_link_previews_changed = lambda changed_document: LinkPreviewPropagationQueue().enqueue(
+            DocumentIdentifierModel.construct(document_id=str(changed_document.id),
+                                              workspace=str(changed_document.workspace))
         )
 
     response = Response.build(document)
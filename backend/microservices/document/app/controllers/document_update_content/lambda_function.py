@@ -5,7 +5,7 @@ from domain import lib
 from domain.model.document import Workspace, Content
 from app.repository import DocumentRepository, DocumentContentUpdatedByOtherUserError
 from app.implementation import LivingContentTypePolicy
-from app.interface import DocumentIdentifierModel, PreparedLinkModel, DocumentModel
+from app.interface import DocumentIdentifierModel, PreparedLinkModel, DocumentModel, DocumentSavedEventModel
 from app.chef import DocumentChef
 from app.middleware import middleware, BadOperationUserError
 from app.notification import NotificationManager
@@ -26,11 +26,10 @@ def handler(event: Event, context: LambdaContext):
     document_id = lib.Id(event.document_id)
     workspace = Workspace(event.workspace)
 
-    notification_manager = NotificationManager()
-
     try:
 
-        with DocumentRepository.use() as repository:
+        with NotificationManager.use() as notification_manager, \
+                DocumentRepository.use(transactional=True) as repository:
             chef = DocumentChef(repository)
             document = chef.order(document_id, workspace)
             if not LivingContentTypePolicy.is_satisfied_by(document.content.type):
@@ -39,14 +38,9 @@ def handler(event: Event, context: LambdaContext):
             links = chef.prepare_links(workspace, event.links) if event.links else []
             document.update_content(content, links, highlights=[])
 
-            def on_saved_document(saved_document):
-                if saved_document.id == document.id:
-                    model = Response.build(saved_document, with_content_body_url=True)
-                else:
-                    model = Response.build(saved_document)
-                notification_manager.document_saved(model)
-
-            repository.on_saved_document = on_saved_document
+            repository.on_saved_document = lambda saved_document: notification_manager.document_saved(
+                DocumentSavedEventModel.build(saved_document, repository.changed_fields(saved_document))
+            )
 
         response = Response.build(document, with_content_body_url=True)
         return response.dict()
@@ -1 +1,2 @@
-from .content_type import ContentTypePolicy, LivingContentTypePolicy, PDF, WEB_PAGE, THLINK_DOCUMENT
+from .content_type import ContentTypePolicy, LivingContentTypePolicy, CompressibleContentTypePolicy, PDF, WEB_PAGE, \
+    THLINK_DOCUMENT
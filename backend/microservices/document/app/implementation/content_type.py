@@ -19,3 +19,13 @@ class LivingContentTypePolicy:
     @classmethod
     def is_satisfied_by(cls, content_type: str):
         return content_type in cls.types
+
+
+class CompressibleContentTypePolicy:
+
+    # text, so the bodies are stored compressed
+    types = [WEB_PAGE, THLINK_DOCUMENT]
+
+    @classmethod
+    def is_satisfied_by(cls, content_type: str):
+        return content_type in cls.types
@@ -6,6 +6,9 @@ from .models import PreparedLinkModel,\
     HighlightModel,\
     PreparedDocumentModel,\
     DocumentModel,\
+    DocumentSavedEventModel,\
+    ClaimCheckModel,\
+    DocumentSummaryModel,\
     WorkspaceIdentifierModel,\
     DocumentIdentifierModel,\
     DocumentHighlightIdentifierModel,\
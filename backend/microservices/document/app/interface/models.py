@@ -1,11 +1,15 @@
-from typing import Any, List
+from __future__ import annotations
+from typing import Any, List, Iterable, Optional
 from domain.model.document import Link, Highlight
-from app.repository import DocumentRepositoryDocument
+from app.repository import DocumentRepositoryDocument, DocumentRepositoryDocumentSummary
 from .base_model import BaseModel
 
 
 # TODO remove redundant attrs ~> None?
 
+# The models of responses are built from the domain (trusted), so they are constructed without validation. Models of
+# events are validated.
+
 
 class PreparedLinkModel(BaseModel):
     location: str
@@ -21,14 +25,14 @@ class LinkModel(PreparedLinkModel):
     @classmethod
     def build(cls, link: Link):
         target_is_highlight = hasattr(link.target, "parent")
-        return cls(
+        return cls.construct(
             id=str(link.id),
             location=str(link.location),
-            targetDocumentId=str(link.target.parent.id) if target_is_highlight else str(link.target.id),
-            targetDocumentDighlightId=str(link.target.id) if target_is_highlight else None,
-            targetDocumentPreviewText=link.target_preview.parent.text if target_is_highlight
+            target_document_id=str(link.target.parent.id) if target_is_highlight else str(link.target.id),
+            target_document_highlight_id=str(link.target.id) if target_is_highlight else None,
+            target_document_preview_text=link.target_preview.parent.text if target_is_highlight
             else link.target_preview.text,
-            targetDocumentHighlightPreviewText=link.target_preview.text if target_is_highlight else None,
+            target_document_highlight_preview_text=link.target_preview.text if target_is_highlight else None,
         )
 
 
@@ -43,14 +47,14 @@ class BacklinkModel(BaseModel):
     @classmethod
     def build(cls, link: Link):
         source_is_highlight = hasattr(link.source, "parent")
-        return cls(
+        return cls.construct(
             id=str(link.id),
             location=str(link.location),
-            sourceDocumentId=str(link.source.parent.id) if source_is_highlight else str(link.source.id),
-            sourceDocumentHighlightId=str(link.source.id) if source_is_highlight else None,
-            sourceDocumentPreviewText=link.source_preview.parent.text if source_is_highlight
+            source_document_id=str(link.source.parent.id) if source_is_highlight else str(link.source.id),
+            source_document_highlight_id=str(link.source.id) if source_is_highlight else None,
+            source_document_preview_text=link.source_preview.parent.text if source_is_highlight
             else link.source_preview.text,
-            sourceDocumentHighlightPreviewText=link.source_preview.text if source_is_highlight else None,
+            source_document_highlight_preview_text=link.source_preview.text if source_is_highlight else None,
         )
 
 
@@ -71,11 +75,11 @@ class HighlightModel(PreparedHighlightModel):
 
     @classmethod
     def build(cls, highlight: Highlight):
-        return cls(
+        return cls.construct(
             id=str(highlight.id),
             location=str(highlight.location),
-            noteBody=highlight.note.body if highlight.note else None,
-            linkPreviewText=highlight.link_preview.text,
+            note_body=highlight.note.body if highlight.note else None,
+            link_preview_text=highlight.link_preview.text,
             links=[LinkModel.build(link) for link in highlight.links] if highlight.links else None,
             backlinks=[BacklinkModel.build(link) for link in highlight.backlinks],
         )
@@ -104,13 +108,13 @@ class DocumentModel(BaseModel):
 
     @classmethod
     def build(cls, document: DocumentRepositoryDocument, with_content_body_url=False):
-        return cls(
+        return cls.construct(
             id=str(document.id),
             workspace=str(document.workspace),
             title=document.title,
-            tags=document.tags,
-            contentType=document.content.type,
-            contentBodyUrl=document.get_content_body_url() if with_content_body_url else None,
+            tags=list(document.tags),
+            content_type=document.content.type,
+            content_body_url=document.get_content_body_url() if with_content_body_url else None,
             version=document.version,
             links=[LinkModel.build(link) for link in document.links],
             backlinks=[BacklinkModel.build(link) for link in document.backlinks],
@@ -118,6 +122,101 @@ class DocumentModel(BaseModel):
         )
 
 
+class ClaimCheckModel(BaseModel):
+    # an event that is too large to be published is stored in the bucket instead
+    bucket: str
+    key: str
+
+
+class DocumentSavedEventModel(BaseModel):
+    # Delta of a saved document: only the fields that changed (named by changed_fields) are set, the event leaves out
+    # the others (json with exclude_unset)
+    id: str
+    workspace: str
+    version: int
+    changed_fields: List[str]
+    title: str = None
+    tags: List[str] = None
+    content_type: str = None
+    content_body_url: str = None
+    links: List[LinkModel] = None
+    # the backlinks are not sent, a document might have many of them (and they are not loaded)
+    added_backlink_ids: List[str] = None
+    removed_backlink_ids: List[str] = None
+    backlinks_count: int = None  # of the document and all its highlights
+    highlights: List[HighlightModel] = None
+    claim_check: ClaimCheckModel = None  # -> the fields are stored in the claim check
+
+    @classmethod
+    def build(cls, document: DocumentRepositoryDocument, changed: Optional[Iterable[str]]):
+        # changed -> the changed fields of the document (see DocumentRepository.changed_fields), None -> all
+        names = {name for change in (_EVENT_FIELDS_OF_CHANGES if changed is None else changed)
+                 for name in _EVENT_FIELDS_OF_CHANGES.get(change, ())}
+        getters = {
+            "title": lambda: document.title,
+            "tags": lambda: list(document.tags),
+            "content_type": lambda: document.content.type,
+            "content_body_url": document.get_content_body_url,
+            "links": lambda: [LinkModel.build(link) for link in document.links],
+            "added_backlink_ids": lambda: sorted(document.added_backlink_ids),
+            "removed_backlink_ids": lambda: sorted(document.removed_backlink_ids),
+            # the backlinks of the highlights are always loaded
+            "backlinks_count": lambda: document.backlinks_count + sum(len(highlight.backlinks)
+                                                                      for highlight in document.highlights),
+            "highlights": lambda: [HighlightModel.build(highlight) for highlight in document.highlights],
+        }
+        return cls.construct(
+            id=str(document.id),
+            workspace=str(document.workspace),
+            version=document.version,
+            changed_fields=sorted(cls.__fields__[name].alias for name in names),
+            **{name: getters[name]() for name in names},
+        )
+
+    def merge(self, later: DocumentSavedEventModel) -> DocumentSavedEventModel:
+        # later -> a later event of the same document, the merged event has the changes of both
+        values = {name: getattr(event, name) for event in [self, later] for name in event.__fields_set__}
+        values["changed_fields"] = sorted({*self.changed_fields, *later.changed_fields})
+        if "added_backlink_ids" in self.__fields_set__ and "added_backlink_ids" in later.__fields_set__:
+            # a backlink that was added and removed again is removed
+            values["added_backlink_ids"] = sorted({*self.added_backlink_ids, *later.added_backlink_ids}
+                                                  - {*later.removed_backlink_ids})
+            values["removed_backlink_ids"] = sorted({*self.removed_backlink_ids, *later.removed_backlink_ids}
+                                                    - {*later.added_backlink_ids})
+        return type(self).construct(**values)
+
+
+# changed field of a document -> fields of DocumentSavedEventModel
+_EVENT_FIELDS_OF_CHANGES = {
+    "title": ["title"],
+    "tags": ["tags"],
+    "content": ["content_type", "content_body_url"],
+    "links": ["links"],
+    "backlinks": ["added_backlink_ids", "removed_backlink_ids", "backlinks_count"],
+    "highlights": ["highlights", "backlinks_count"],
+}
+
+
+class DocumentSummaryModel(BaseModel):
+    id: str
+    workspace: str
+    title: str
+    tags: List[str]
+    content_type: str
+    version: int
+
+    @classmethod
+    def build(cls, summary: DocumentRepositoryDocumentSummary):
+        return cls.construct(
+            id=str(summary.id),
+            workspace=str(summary.workspace),
+            title=summary.title,
+            tags=list(summary.tags),
+            content_type=summary.content_type,
+            version=summary.version,
+        )
+
+
 class WorkspaceIdentifierModel(BaseModel):
     workspace: str
 
@@ -1,34 +1,141 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple, ContextManager, Union
+import contextlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 import boto3
 import botocore.exceptions
-from app.interface import DocumentModel, DocumentIdentifierModel
+from app.interface import DocumentSavedEventModel, DocumentIdentifierModel, ClaimCheckModel
+
+EventModel = Union[DocumentSavedEventModel, DocumentIdentifierModel]
 
 
 class NotificationManager:
 
-    def __init__(self):
-        sns = boto3.resource("sns")
-        document_event_sns_topic_arn = os.environ.get("DocumentEventSNSTopicARN")
-        self._document_event_sns_topic = sns.Topic(document_event_sns_topic_arn)
+    # limits of sns publish batch
+    max_batch_size = 10
+    max_batch_bytes = 256 * 1024
+    max_concurrent_batches = 8
+
+    # Larger events are stored in the claim check bucket, the published event only points to them (sns messages can
+    # not be larger than 256 KB). Strictly less than half of the batch limit, so that the two largest events and their
+    # attributes fit into one batch.
+    claim_check_threshold = 120 * 1024
+
+    def __init__(self, buffered: bool = False):
+        # buffered -> the events are published with flush, only the last event of every document is published
+        self._sns = boto3.client("sns")
+        self._s3 = None
+        self._document_event_sns_topic_arn = os.environ.get("DocumentEventSNSTopicARN")
+        self._claim_check_s3_bucket_name = os.environ.get("DocumentEventClaimCheckS3BucketName")
+        self._buffered = buffered
+        self._buffer: Dict[str, Tuple[str, EventModel]] = {}  # group id -> event type, event model
+
+    @classmethod
+    @contextlib.contextmanager
+    def use(cls) -> ContextManager[NotificationManager]:
+        # The events of the documents that were saved are published, even if the saving of others failed
+        notification_manager = cls(buffered=True)
+        try:
+            yield notification_manager
+        finally:
+            notification_manager.flush()
 
-    def _publish(self, event_type: str, event_message_json_str: str, group_id: str):
+    def _publish(self, event_type: str, event_model: EventModel, group_id: str):
+        if self._buffered:
+            buffered_event_type, buffered_event_model = self._buffer.pop(group_id, (None, None))
+            if event_type == buffered_event_type == "documentSaved":
+                event_model = buffered_event_model.merge(event_model)  # both events are deltas
+            self._buffer[group_id] = (event_type, event_model)  # the later event replaces the earlier one
+            return
         try:
-            response = self._document_event_sns_topic.publish(
-                Message=event_message_json_str,
+            self._sns.publish(
+                TopicArn=self._document_event_sns_topic_arn,
+                Message=self._message(event_model, group_id),
                 MessageDeduplicationId=uuid4().hex,
                 MessageGroupId=group_id,
-                MessageAttributes={"eventType": event_type},
+                MessageAttributes=_message_attributes(event_type),
             )
         except botocore.exceptions.ClientError as e:
             raise InternalError() from e
 
-    def document_saved(self, document_model: DocumentModel):
-        self._publish("documentSaved", document_model.json(), group_id=document_model.id)
+    def flush(self):
+        entries = [{
+            "Id": str(i),
+            "Message": self._message(event_model, group_id),
+            "MessageDeduplicationId": uuid4().hex,
+            "MessageGroupId": group_id,
+            "MessageAttributes": _message_attributes(event_type),
+        } for i, (group_id, (event_type, event_model)) in enumerate(self._buffer.items())]
+        self._buffer = {}
+
+        batches = []
+        batch_bytes = 0
+        for entry in entries:
+            entry_bytes = _entry_bytes(entry)
+            if not batches or len(batches[-1]) == self.max_batch_size \
+                    or batch_bytes + entry_bytes > self.max_batch_bytes:
+                batches.append([])
+                batch_bytes = 0
+            batches[-1].append(entry)
+            batch_bytes += entry_bytes
+
+        if len(batches) == 1:
+            self._publish_batch(batches[0])
+        elif batches:
+            # the events of different documents are in different message groups, so their order does not matter
+            with ThreadPoolExecutor(max_workers=min(len(batches), self.max_concurrent_batches)) as executor:
+                for future in [executor.submit(self._publish_batch, batch) for batch in batches]:
+                    future.result()
+
+    def _publish_batch(self, entries: List[Dict]):
+        try:
+            response = self._sns.publish_batch(TopicArn=self._document_event_sns_topic_arn,
+                                               PublishBatchRequestEntries=entries)
+        except botocore.exceptions.ClientError as e:
+            raise InternalError() from e
+        if response.get("Failed"):
+            raise InternalError(", ".join(f"{failed['Id']}: {failed.get('Message', failed['Code'])}"
+                                          for failed in response["Failed"]))
+
+    def _message(self, event_model: EventModel, group_id: str) -> str:
+        message = event_model.json(exclude_unset=True)
+        if not isinstance(event_model, DocumentSavedEventModel) or len(message.encode()) <= self.claim_check_threshold:
+            return message
+        key = f"{group_id}/{uuid4().hex}.json"
+        if not self._s3:
+            self._s3 = boto3.client("s3")
+        try:
+            self._s3.put_object(Bucket=self._claim_check_s3_bucket_name, Key=key, Body=message.encode(),
+                                ContentType="application/json")
+        except botocore.exceptions.ClientError as e:
+            raise InternalError() from e
+        return DocumentSavedEventModel.construct(
+            id=event_model.id,
+            workspace=event_model.workspace,
+            version=event_model.version,
+            changed_fields=event_model.changed_fields,
+            claim_check=ClaimCheckModel.construct(bucket=self._claim_check_s3_bucket_name, key=key),
+        ).json(exclude_unset=True)
+
+    def document_saved(self, event_model: DocumentSavedEventModel):
+        self._publish("documentSaved", event_model, group_id=event_model.id)
 
     def document_deleted(self, document_identifier_model: DocumentIdentifierModel):
-        self._publish("documentDeleted", document_identifier_model.json(),
-                      group_id=document_identifier_model.document_id)
+        self._publish("documentDeleted", document_identifier_model, group_id=document_identifier_model.document_id)
+
+
+def _entry_bytes(entry: Dict) -> int:
+    # sns counts the message and the names, types and values of its attributes
+    return len(entry["Message"].encode()) + sum(
+        len(name.encode()) + len(attribute["DataType"].encode()) + len(attribute["StringValue"].encode())
+        for name, attribute in entry["MessageAttributes"].items()
+    )
+
+
+def _message_attributes(event_type: str) -> Dict:
+    return {"eventType": {"DataType": "String", "StringValue": event_type}}
 
 
 class InternalError(Exception):
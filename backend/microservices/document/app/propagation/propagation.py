@@ -0,0 +1,31 @@
+import os
+from uuid import uuid4
+import boto3
+import botocore.exceptions
+from app.interface import DocumentIdentifierModel
+
+
+class LinkPreviewPropagationQueue:
+    """
+    Jobs to write the changed link previews of documents to the documents that reference them, see the
+    document_link_preview_propagate controller.
+    """
+
+    def __init__(self):
+        sqs = boto3.resource("sqs")
+        self._queue = sqs.Queue(os.environ.get("LinkPreviewPropagationSQSQueueURL"))
+
+    def enqueue(self, document_identifier_model: DocumentIdentifierModel):
+        try:
+            self._queue.send_message(
+                MessageBody=document_identifier_model.json(),
+                MessageDeduplicationId=uuid4().hex,
+                # the jobs of a document are applied in order
+                MessageGroupId=document_identifier_model.document_id,
+            )
+        except botocore.exceptions.ClientError as e:
+            raise InternalError() from e
+
+
+class InternalError(Exception):
+    pass
@@ -1 +1,2 @@
-from .document_repository import DocumentRepository, DocumentRepositoryDocument, DocumentContentUpdatedByOtherUserError
+from .document_repository import DocumentRepository, DocumentRepositoryDocument, DocumentRepositoryDocumentSummary,\
+    DocumentContentUpdatedByOtherUserError, InvalidPageKeyError, DocumentsNotSavedError
@@ -0,0 +1,69 @@
+from typing import Optional, Tuple, Any
+import hashlib
+import uuid
+from .infrastructure import db, object_storage
+
+
+class ContentStore:
+    """
+    Stores content bodies content-addressed: identical bodies in a workspace are stored once, no matter how many
+    documents reference them. References are counted by a blob item in the db, a body is deleted when its last
+    reference is released.
+    Object keys include a generation that is created together with the blob item - a body that is stored again after
+    its blob item got deleted gets a new key, so a late delete of the old body can never remove the new one.
+    """
+
+    def __init__(self, db_: db.DB, object_storage_: object_storage.ObjectStorage):
+        self._db = db_
+        self._object_storage = object_storage_
+
+    @staticmethod
+    def hash(body: Any) -> Optional[str]:
+        # only bodies that are in memory can be addressed by their content
+        if isinstance(body, str):
+            body = body.encode()
+        if not isinstance(body, (bytes, bytearray)):
+            return None
+        return hashlib.sha256(body).hexdigest()
+
+    def acquire(self, workspace: str, content_hash: str) -> Tuple[str, bool]:
+        # Adds a reference, returns the key of the body and whether it is the first reference (-> upload the body)
+        blob = self._db.increment(
+            _blob_key(workspace, content_hash),
+            "references",
+            1,
+            set_if_not_exists={"item_type": "blob", "generation": uuid.uuid4().hex},
+        )
+        return f"{workspace}/{content_hash}/{blob['generation']}", blob["references"] == 1
+
+    def upload(self, key: str, body: Any, first_reference: bool, compress: bool = False):
+        # later references only upload if the body is missing (the upload of the first reference might have failed)
+        if first_reference or not self._object_storage.exists(key):
+            self._object_storage.put(key, body, compress=compress)
+
+    def release(self, key: str):
+        if not is_content_addressed(key):
+            self._object_storage.delete(key)  # stored under the document id, not shared
+            return
+        workspace, content_hash, generation = key.rsplit("/", 2)
+        blob_key = _blob_key(workspace, content_hash)
+        try:
+            blob = self._db.increment(blob_key, "references", -1, expect_item_exists=True)
+        except db.ExpectationNotMet:
+            return  # already released
+        if blob["references"] > 0:
+            return
+        try:
+            self._db.delete(blob_key, expect={"references": 0, "generation": generation})
+        except db.ExpectationNotMet:
+            return  # referenced again in the meantime
+        self._object_storage.delete(key)
+
+
+def is_content_addressed(key: str) -> bool:
+    return "/" in key
+
+
+def _blob_key(workspace: str, content_hash: str) -> db.ItemKey:
+    # in a partition of their own, so that listing the documents of the workspace does not read them
+    return db.ItemKey("workspace", f"{workspace}#blobs", secondary=db.ItemKey("id", content_hash))
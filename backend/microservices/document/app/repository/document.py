@@ -1,16 +1,27 @@
-from typing import List, Callable
-from functools import cache
-from domain.model.document import Document, Content, Link, Highlight
+from typing import List, Callable, Optional, FrozenSet
+import dataclasses
+from domain import lib
+from domain.model.document import Document, Workspace, Content, Link, Highlight
 
 
 class DocumentRepositoryDocument(Document):
     version: int
     get_content_body_url: Callable
+    # stored count of the backlinks (without the ones of the highlights), so that they need not be loaded to count them
+    # (None -> not counted yet)
+    backlinks_count: Optional[int]
+    # of the last save
+    added_backlink_ids: FrozenSet[str]
+    removed_backlink_ids: FrozenSet[str]
 
-    def _repository_init(self: Document, version: int, content_body_url_getter: Callable):
+    def _repository_init(self: Document, version: int, content_body_url_getter: Callable,
+                         backlinks_count: Optional[int] = None):
         self.version = version
         self._initial_version = version
-        self.get_content_body_url = cache(content_body_url_getter)
+        self.get_content_body_url = content_body_url_getter
+        self.backlinks_count = backlinks_count
+        self.added_backlink_ids = frozenset()
+        self.removed_backlink_ids = frozenset()
 
     def update_content(self,
                        content: Content,
@@ -20,3 +31,14 @@ class DocumentRepositoryDocument(Document):
         super().update_content(content, links, highlights)
         if self._initial_version == self.version:
             self.version += 1
+
+
+@dataclasses.dataclass(frozen=True)
+class DocumentRepositoryDocumentSummary:
+    # read only view of a document without content, links, backlinks and highlights
+    id: lib.Id
+    workspace: Workspace
+    title: str
+    tags: List[str]
+    content_type: str
+    version: int
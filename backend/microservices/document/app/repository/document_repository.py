@@ -1,35 +1,78 @@
 from __future__ import annotations
-from typing import List, Generator, ContextManager, Dict, Callable, Union, Tuple, Optional
+from typing import List, Generator, ContextManager, Dict, Callable, Union, Tuple, Optional, NamedTuple, Any, Set, \
+    Sequence, FrozenSet
 import contextlib
+import os
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import binascii
+import json
+from uuid import uuid4
 from domain import lib
 from domain.model.document.link import LinkPreview
 from domain.model.document import Document, Workspace, Link, Highlight, Content, ContentLocation
 from domain.model.document import DocumentRepository as AbstractDocumentRepository
 from .infrastructure import db, object_storage
-from .document import DocumentRepositoryDocument
+from .document import DocumentRepositoryDocument, DocumentRepositoryDocumentSummary
+from .item_cache import ItemCache
+from .content_store import ContentStore, is_content_addressed
 from .document_serialization import SerializedDocumentModel, SerializedLinkModel, SerializedBacklinkModel,\
     SerializedHighlightModel, DocumentSerializer
-from app.implementation import THLINK_DOCUMENT
+from app.implementation import THLINK_DOCUMENT, CompressibleContentTypePolicy
 
 
 class DocumentRepository(AbstractDocumentRepository):
 
-    def __init__(self):
+    max_concurrent_writes = 8
+    # Shared by all repositories of the (warm) lambda container, so that its threads (and their db resources, see
+    # db.DB) are reused by every save
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    # Backlinks beyond this number are stored in separate items, so that the items of hub documents neither grow
+    # unbounded nor have to be rewritten for every new backlink
+    max_inline_backlinks = 100
+
+    # Lives as long as the (warm) lambda container, disabled if the size is 0
+    item_cache = ItemCache(max_size=int(os.environ.get("DocumentRepositoryItemCacheSize", 0)))
+
+    def __init__(self, transactional: bool = False, defer_link_preview_propagation: bool = False):
+        # transactional -> the changes of all documents are saved atomically
+        # defer_link_preview_propagation -> link preview changes are not written to the referencing documents, but
+        #   reported by on_link_previews_changed instead (see propagate_link_previews)
+        self._transactional = transactional
+        self._defer_link_preview_propagation = defer_link_preview_propagation
         self._documents: Dict[Tuple[lib.Id, Workspace], DocumentRepositoryDocument] = {}
         self._documents_loaded_serialized: Dict[Tuple[lib.Id, Workspace], SerializedDocumentModel] = {}
+        self._documents_loaded_items: Dict[Tuple[lib.Id, Workspace], Dict] = {}  # as stored
+        # changes of link previews that are stored by other documents (see _collect_indirect_dirty_documents)
+        self._indirect_changes: Dict[Tuple[lib.Id, Workspace], Set[Tuple]] = {}
+        # documents with link preview changes that were not propagated (see defer_link_preview_propagation)
+        self._deferred_link_previews: Set[Tuple[lib.Id, Workspace]] = set()
+        # ids of the loaded backlinks that are stored in separate items
+        self._overflow_backlink_ids: Dict[Tuple[lib.Id, Workspace], Set[str]] = {}
+        # object storage keys of the content bodies (see ContentStore)
+        self._content_keys: Dict[Tuple[lib.Id, Workspace], str] = {}
         self._db = db.DocumentRepositoryDB()
         self._object_storage = object_storage.DocumentRepositoryObjectStorage()
+        self._content_store = ContentStore(self._db, self._object_storage)
         self._document_factory = DocumentFactory(self)
         self._document_serializer = DocumentSerializer()
         self._saved_documents = []
+        # the fields of the saved documents that changed (None -> all, the document was created)
+        self._saved_changed_fields: Dict[Tuple[lib.Id, Workspace], Optional[FrozenSet[str]]] = {}
         self._deleted_documents = []
         self.on_saved_document: Optional[Callable[[DocumentRepositoryDocument], None]] = None
         self.on_deleted_document: Optional[Callable[[DocumentRepositoryDocument], None]] = None
+        self.on_link_previews_changed: Optional[Callable[[DocumentRepositoryDocument], None]] = None
 
     @classmethod
     @contextlib.contextmanager
-    def use(cls) -> ContextManager[DocumentRepository]:
-        repository = cls()
+    def use(cls, transactional: bool = False, defer_link_preview_propagation: bool = False) \
+            -> ContextManager[DocumentRepository]:
+        repository = cls(transactional, defer_link_preview_propagation)
         yield repository
         repository._save()
 
@@ -39,50 +82,190 @@ class DocumentRepository(AbstractDocumentRepository):
             return document
         if document_id in self._document_factory.document_ids:
             raise ValueError("Attempted to get a document that is currently being build")
-        db_item = self._db.get_item(db.ItemKey("workspace", workspace, secondary=db.ItemKey("id", document_id)))
+        db_item = self._get_db_item(_item_key(document_id, workspace))
         if not db_item:
             return None
-        serialized_document = SerializedDocumentModel(**db_item)
+        return self._load_document(db_item)
+
+    def get_many(self, document_ids: List[lib.Id], workspace: Workspace) -> List[DocumentRepositoryDocument]:
+        # Loads all documents that are not loaded yet with as few db round trips as possible,
+        # documents that do not exist are left out
+        document_ids = list(dict.fromkeys(document_ids))  # deduplicate
+        missing_document_ids = []
+        for document_id in document_ids:
+            if (document_id, workspace) in self._documents:
+                continue
+            if document_id in self._document_factory.document_ids:
+                raise ValueError("Attempted to get a document that is currently being build")
+            missing_document_ids.append(document_id)
+        if missing_document_ids:
+            db_items = self._batch_get_db_items([_item_key(document_id, workspace)
+                                                 for document_id in missing_document_ids])
+            for db_item in db_items:
+                self._load_document(db_item)
+        return [self._documents[(document_id, workspace)] for document_id in document_ids
+                if (document_id, workspace) in self._documents]
+
+    def get_all_in_workspace(self, workspace: Workspace) -> List[DocumentRepositoryDocument]:
+        return [document for documents, _ in self.iter_workspace(workspace) for document in documents]
+
+    def iter_workspace(self, workspace: Workspace, page_size: int = None, start_key: str = None) \
+            -> Generator[Tuple[List[DocumentRepositoryDocument], Optional[str]], None, None]:
+        # Yields the documents of the workspace page by page, together with the opaque key to continue after the page
+        # (None if it is the last page)
+        for document in self._documents_loaded_serialized.values():
+            if document.workspace == workspace:
+                assert ValueError("Workspace is already partially loaded")
+        pages = self._db.iter_query_pages(db.ItemKey("workspace", workspace), page_size,
+                                          start_key=_decode_page_key(start_key, workspace) if start_key else None,
+                                          # only read the current revisions, the items come from the cache
+                                          projection=_REVISION_PROJECTION if self.item_cache.enabled else None)
+        for db_items, last_key in pages:
+            if self.item_cache.enabled:
+                db_items = self._get_cached_db_items(db_items)
+            yield [self._load_document(db_item) for db_item in db_items], \
+                  _encode_page_key(last_key) if last_key else None
+
+    def iter_workspace_summaries(self, workspace: Workspace, page_size: int = None, start_key: str = None) \
+            -> Generator[Tuple[List[DocumentRepositoryDocumentSummary], Optional[str]], None, None]:
+        # Like iter_workspace, but only reads the attributes of the summaries and does not build any documents
+        pages = self._db.iter_query_pages(db.ItemKey("workspace", workspace), page_size,
+                                          start_key=_decode_page_key(start_key, workspace) if start_key else None,
+                                          projection=["id", "workspace", "title", "tags", "content_type", "version"])
+        for db_items, last_key in pages:
+            yield [DocumentRepositoryDocumentSummary(
+                id=lib.Id(db_item["id"]),
+                workspace=Workspace(db_item["workspace"]),
+                title=db_item["title"],
+                tags=db_item["tags"],
+                content_type=db_item["content_type"],
+                version=int(db_item["version"]),
+            ) for db_item in db_items], _encode_page_key(last_key) if last_key else None
+
+    def _get_db_item(self, key: db.ItemKey) -> Optional[Dict]:
+        if not self.item_cache.enabled:
+            return self._db.get_item(key)
+        current = self._db.get_item(key, projection=_REVISION_PROJECTION, consistent=True)
+        if not current:
+            return None
+        db_items = self._get_cached_db_items([current])
+        return db_items[0] if db_items else None
+
+    def _batch_get_db_items(self, keys: List[db.ItemKey]) -> List[Dict]:
+        if not self.item_cache.enabled:
+            return self._db.batch_get_items(keys)
+        return self._get_cached_db_items(self._db.batch_get_items(keys, projection=_REVISION_PROJECTION,
+                                                                  consistent=True))
+
+    def _get_cached_db_items(self, current: List[Dict]) -> List[Dict]:
+        # current -> key and current revision of the stored items
+        # Returns the items in the same order, cached items are only used if their revision is still the current one
+        db_items = {}
+        missing_keys = []
+        for current_item in current:
+            cache_key = (current_item["workspace"], current_item["id"])
+            db_item = self.item_cache.get(cache_key, current_item.get("revision"))
+            if db_item:
+                db_items[cache_key] = db_item
+            else:
+                missing_keys.append(_item_key(current_item["id"], current_item["workspace"]))
+        if len(missing_keys) == 1:
+            loaded_db_items = [self._db.get_item(missing_keys[0], consistent=True)]
+        else:
+            loaded_db_items = self._db.batch_get_items(missing_keys, consistent=True) if missing_keys else []
+        for db_item in loaded_db_items:
+            if db_item:  # might have been deleted in the meantime
+                cache_key = (db_item["workspace"], db_item["id"])
+                self.item_cache.put(cache_key, db_item.get("revision"), db_item)
+                db_items[cache_key] = db_item
+        return [db_items[cache_key] for cache_key in ((current_item["workspace"], current_item["id"])
+                                                      for current_item in current) if cache_key in db_items]
+
+    def _load_document(self, db_item: Dict) -> DocumentRepositoryDocument:
+        serialized_document = self._document_serializer.deserialize_item(db_item)
+        key = (lib.Id(serialized_document.id), Workspace(serialized_document.workspace))
+        # items that were stored before content addressing store the body under the document id
+        content_key = db_item.get("content_key", serialized_document.id)
+        self._content_keys[key] = content_key
         document = self._document_factory.build_document(
             serialized_document,
-            content_body_getter=lambda: self._object_storage.get(serialized_document.id),
-            content_body_url_getter=lambda: self._object_storage.get_url(serialized_document.id),
+            # the content type tells whether the body is stored compressed, ranged reads need not look it up
+            content_body_getter=lambda: self._object_storage.get_body(
+                content_key, compressed=CompressibleContentTypePolicy.is_satisfied_by(serialized_document.content_type)),
+            content_body_url_getter=lambda: self._get_content_body_url(document),
+            overflow_backlinks_getter=functools.partial(self._get_overflow_backlinks, lib.Id(serialized_document.id),
+                                                        Workspace(serialized_document.workspace))
+            if db_item.get("backlinks_overflow") else None,
         )
+        document.clear_changes()
+        if "backlinks_count" in db_item:
+            document.backlinks_count = int(db_item["backlinks_count"])
         self._documents[(document.id, document.workspace)] = document
-        self._documents_loaded_serialized[(document.id, document.workspace)] = SerializedDocumentModel(**db_item)
+        self._documents_loaded_serialized[(document.id, document.workspace)] = serialized_document
+        self._documents_loaded_items[(document.id, document.workspace)] = db_item
         return document
 
-    def get_all_in_workspace(self, workspace: Workspace) -> List[DocumentRepositoryDocument]:
-        for document in self._documents_loaded_serialized.values():
-            if document.workspace == workspace:
-                assert ValueError("Workspace is already partially loaded")
-        db_items = self._db.query_items(db.ItemKey("workspace", workspace))
-        if not db_items:
-            return []
-        documents = []
-        for db_item in db_items:
-            serialized_document = SerializedDocumentModel(**db_item)
-            document = self._document_factory.build_document(
-                serialized_document,
-                content_body_getter=lambda: self._object_storage.get(serialized_document.id),
-                content_body_url_getter=lambda: self._object_storage.get_url(serialized_document.id),
-            )
-            documents.append(document)
-            self._documents[(document.id, document.workspace)] = document
-            self._documents_loaded_serialized[(document.id, document.workspace)] = SerializedDocumentModel(**db_item)
-        return documents
+    def _get_overflow_backlinks(self, document_id: lib.Id, workspace: Workspace, link_id: Optional[lib.Id]) \
+            -> List[Tuple[str, SerializedBacklinkModel]]:
+        # link_id -> only get this backlink, otherwise all
+        if link_id:
+            db_item = self._db.get_item(_overflow_backlink_key(document_id, workspace, link_id))
+            db_items = [db_item] if db_item else []
+        else:
+            db_items = self._db.query_items(_overflow_backlink_key(document_id, workspace))
+        self._overflow_backlink_ids.setdefault((document_id, workspace), set())\
+            .update(db_item["link_id"] for db_item in db_items)
+        return [(db_item["link_id"], SerializedBacklinkModel.construct(**db_item["backlink"])) for db_item in db_items]
 
     def add(self, document: Document):
         self._documents[(document.id, document.workspace)] = document
         DocumentRepositoryDocument._repository_init(
             document,
             version=1,
-            content_body_url_getter=lambda: self._object_storage.get_url(str(document.id)),
+            content_body_url_getter=lambda: self._get_content_body_url(document),
         )
 
+    def _get_content_body_url(self, document: DocumentRepositoryDocument) -> str:
+        content_key = self._content_keys[(document.id, document.workspace)]
+        # content addressed bodies never change, the url can be shared by all documents that reference the body
+        return self._object_storage.get_url(content_key,
+                                            version=None if is_content_addressed(content_key) else document.version)
+
     def _save(self):
-        for document in set(self._collect_dirty_documents()):  # deduplicate
-            self._process_dirty_document(document)
+        dirty_documents = {(document.id, document.workspace): document
+                           for document in self._collect_dirty_documents()}
+        writes = []
+        try:
+            for document in dirty_documents.values():
+                write = self._prepare_write(document)
+                if write:
+                    writes.append(write)
+        except Exception:
+            # preparing acquires references to the content bodies (see _prepare_content)
+            self._release_acquired_content(writes)
+            raise
+
+        if self._transactional:
+            errors = self._commit(writes)
+        else:
+            errors = self._run_concurrently([(write.document, functools.partial(self._write, write))
+                                             for write in writes])
+        for write in writes:
+            cache_key = (str(write.document.workspace), str(write.document.id))
+            if write.document not in errors and isinstance(write.db_operation, db.Put):
+                # a put replaces the whole item, so it is known to be the stored one
+                self.item_cache.put(cache_key, write.db_operation.item["revision"], write.db_operation.item)
+            else:
+                self.item_cache.invalidate(cache_key)
+            if write.document not in errors:
+                if write.document.deleted:
+                    self._deleted_documents.append(write.document)
+                else:
+                    self._saved_documents.append(write.document)
+                    self._saved_changed_fields[(write.document.id, write.document.workspace)] = write.changed_fields
+                    write.document.backlinks_count = write.backlinks_count
+                    write.document.added_backlink_ids = write.added_backlink_ids
+                    write.document.removed_backlink_ids = write.removed_backlink_ids
 
         if self.on_saved_document:
             for document in self._saved_documents:
@@ -90,37 +273,337 @@ class DocumentRepository(AbstractDocumentRepository):
         if self.on_deleted_document:
             for document in self._deleted_documents:
                 self.on_deleted_document(document)
+        if self.on_link_previews_changed:
+            for document in self._saved_documents:
+                if (document.id, document.workspace) in self._deferred_link_previews:
+                    self.on_link_previews_changed(document)
+
+        _raise_errors(errors)
+
+    def changed_fields(self, document: DocumentRepositoryDocument) -> Optional[FrozenSet[str]]:
+        # The fields of the document that changed with the save (e.g. "title", "links"), None -> all (the document was
+        # created)
+        return self._saved_changed_fields[(document.id, document.workspace)]
+
+    def _run_concurrently(self, tasks: List[Tuple[DocumentRepositoryDocument, Callable[[], None]]]) \
+            -> Dict[DocumentRepositoryDocument, Exception]:
+        # Writes of different documents are independent of each other, so they are run concurrently
+        errors = {}
+        if len(tasks) == 1:
+            document, task = tasks[0]
+            try:
+                task()
+            except Exception as e:
+                errors[document] = e
+        elif tasks:
+            futures = [(document, self._get_executor().submit(task)) for document, task in tasks]
+            for document, future in futures:
+                if future.exception():
+                    errors[document] = future.exception()
+        return errors
 
-    def _process_dirty_document(self, document: DocumentRepositoryDocument):
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if not cls._executor:
+                cls._executor = ThreadPoolExecutor(max_workers=cls.max_concurrent_writes)
+            return cls._executor
+
+    def _write(self, write: _DocumentWrite):
+        # The content body is uploaded first, so that a stored item never references a missing body
+        try:
+            self._upload_content(write)
+            self._db.write(write.db_operation)
+        except Exception as e:
+            self._release_acquired_content([write])
+            if isinstance(e, db.ExpectationNotMet) and isinstance(write.db_operation, db.Put):
+                raise DocumentContentUpdatedByOtherUserError from e
+            raise
+        for backlink_db_operation in write.backlink_db_operations:
+            self._db.write(backlink_db_operation)
+        if write.released_content_key:
+            self._content_store.release(write.released_content_key)
+
+    def _commit(self, writes: List[_DocumentWrite]) -> Dict[DocumentRepositoryDocument, Exception]:
+        # Uploads the content bodies, then commits the db operations of all writes atomically (as long as they fit into
+        # one transaction)
+        upload_errors = self._run_concurrently([
+            (write.document, functools.partial(self._upload_content, write))
+            for write in writes if write.upload_content_body
+        ])
+        if upload_errors:
+            self._release_acquired_content(writes)
+            _raise_errors(upload_errors)
+
+        committed = []
+        transaction = []
+        transaction_db_operations = []
+        try:
+            for write in writes:
+                db_operations = [write.db_operation]
+                if not isinstance(write.db_operation, db.Delete):
+                    db_operations.extend(write.backlink_db_operations)
+                if len(transaction_db_operations) + len(db_operations) > self._db.max_transaction_size:
+                    self._db.transact_write(transaction_db_operations)
+                    committed.extend(transaction)
+                    transaction, transaction_db_operations = [], []
+                transaction.append(write)
+                transaction_db_operations.extend(db_operations)
+            if transaction_db_operations:
+                self._db.transact_write(transaction_db_operations)
+                committed.extend(transaction)
+        except Exception as e:
+            self._undo(committed)
+            self._release_acquired_content(writes)
+            if isinstance(e, db.ExpectationNotMet):
+                raise DocumentContentUpdatedByOtherUserError from e
+            raise
+
+        # the items are written for good now, orphaned content bodies/ backlinks are not worth a compensation
+        return self._run_concurrently([
+            (write.document, functools.partial(self._delete_remains, write))
+            for write in writes if isinstance(write.db_operation, db.Delete) or write.released_content_key
+        ])
+
+    def _delete_remains(self, write: _DocumentWrite):
+        if isinstance(write.db_operation, db.Delete):
+            for backlink_db_operation in write.backlink_db_operations:
+                self._db.write(backlink_db_operation)
+        if write.released_content_key:
+            self._content_store.release(write.released_content_key)
+
+    def _undo(self, writes: List[_DocumentWrite]):
+        undo_db_operations = [undo_db_operation for write in writes
+                              for undo_db_operation in [write.undo_db_operation, *write.undo_backlink_db_operations]
+                              if undo_db_operation]
+        for i in range(0, len(undo_db_operations), self._db.max_transaction_size):
+            self._db.transact_write(undo_db_operations[i:i + self._db.max_transaction_size])
+
+    def _upload_content(self, write: _DocumentWrite):
+        if not write.upload_content_body:
+            return
+        if write.content_acquired:
+            self._content_store.upload(write.content_key, write.content_body, write.content_first_reference,
+                                       compress=write.compress_content_body)
+        else:
+            self._object_storage.put(write.content_key, write.content_body, compress=write.compress_content_body)
+
+    def _release_acquired_content(self, writes: List[_DocumentWrite]):
+        # the writes failed, so their items do not reference the acquired content bodies
+        for write in writes:
+            if write.content_acquired:
+                self._content_store.release(write.content_key)
+
+    def _prepare_write(self, document: DocumentRepositoryDocument) -> Optional[_DocumentWrite]:
+        # Serializes the document (in the calling thread) and returns the db and object storage operations that
+        # persist it (can be run in any thread)
+        key = _item_key(document.id, document.workspace)
         document_loaded = self._documents_loaded_serialized.get((document.id, document.workspace))
+        loaded_item = self._documents_loaded_items.get((document.id, document.workspace))
+
         if document.deleted:
-            if document_loaded:
-                self._db.delete(db.ItemKey("workspace", document.workspace, secondary=db.ItemKey("id", document.id)))
-                self._object_storage.delete(str(document.id))
-                self._deleted_documents.append(document)
-        elif document_loaded and document.version == document_loaded.version:
-            self._db.update(
-                key=db.ItemKey("workspace", document.workspace, secondary=db.ItemKey("id", document.id)),
-                item=dict(self._document_serializer.serialize_document(document)),
-                old_item=dict(document_loaded),
-            )
-            self._saved_documents.append(document)
+            if not document_loaded:
+                return None
+            overflow_backlink_keys = [
+                db.ItemKey("workspace", db_item["workspace"], secondary=db.ItemKey("id", db_item["id"]))
+                for db_item in self._db.query_items(_overflow_backlink_key(document.id, document.workspace),
+                                                    projection=["workspace", "id"])
+            ] if loaded_item.get("backlinks_overflow") else []
+            return _DocumentWrite(document, db.Delete(key), undo_db_operation=db.Put(key, loaded_item),
+                                  backlink_db_operations=[db.Delete(key) for key in overflow_backlink_keys],
+                                  released_content_key=self._content_keys[(document.id, document.workspace)])
+
+        changes = {*document.changes, *self._indirect_changes.get((document.id, document.workspace), ())}
+        changed_fields = frozenset(path[0] for path in changes) if document_loaded else None
+        changed_backlink_ids = [path[1] for path in changes if path[0] == "backlinks"]
+        for link_id in changed_backlink_ids:
+            document.get_backlink(link_id)  # makes sure that changed backlinks are loaded
+
+        serialized = self._document_serializer.serialize_document(document)
+        added_backlink_ids, removed_backlink_ids = self._backlink_changes(document, serialized, changed_backlink_ids)
+        stored_backlinks_count = self._stored_backlinks_count(document)
+        backlinks_count = stored_backlinks_count + len(added_backlink_ids) - len(removed_backlink_ids)
+        backlinks = {
+            "backlinks_count": backlinks_count,
+            "added_backlink_ids": added_backlink_ids,
+            "removed_backlink_ids": removed_backlink_ids,
+        }
+        serialized, backlink_db_operations, undo_backlink_db_operations = self._prepare_overflow_backlinks(
+            document, serialized, [str(link_id) for link_id in changed_backlink_ids],
+        )
+        # changes of overflow backlinks do not affect the document item
+        changes = {path for path in changes if path[0] != "backlinks" or str(path[1]) in serialized.backlinks}
+
+        # The version only changes with the content, the revision changes with every write (validates cached items)
+        item = {**self._document_serializer.to_item(serialized), "revision": uuid4().hex,
+                "backlinks_count": backlinks_count}
+        if (loaded_item and loaded_item.get("backlinks_overflow")) or backlink_db_operations:
+            item["backlinks_overflow"] = True
+        for name in ["content_key", "content_hash"]:
+            if loaded_item and name in loaded_item:
+                item[name] = loaded_item[name]
+
+        if document_loaded and document.version == document_loaded.version:
+            # only update the attributes that changed (packed attributes can only be replaced as a whole)
+            if not changes and item.get("backlinks_overflow") == loaded_item.get("backlinks_overflow"):
+                changed_paths = []  # only overflow backlinks changed
+            elif "packed" in item or "packed" in loaded_item:
+                changed_paths = None
+            else:
+                changed_paths = [*self._document_serializer.serialize_changes(changes), ("revision",),
+                                 ("backlinks_overflow",)]
+            # the count is added to, so that concurrent saves of backlinks (e.g. of a document that many documents
+            # link to) are all counted
+            if "backlinks_count" in loaded_item:
+                add, undo_add = ({"backlinks_count": backlinks_count - stored_backlinks_count},
+                                 {"backlinks_count": stored_backlinks_count - backlinks_count})
+            else:
+                add = undo_add = None
+                if changed_paths is not None:
+                    changed_paths.append(("backlinks_count",))
+            return _DocumentWrite(document, db.Update(key, item, loaded_item, changed_paths, add),
+                                  undo_db_operation=db.Update(key, loaded_item, item, changed_paths, undo_add),
+                                  backlink_db_operations=backlink_db_operations,
+                                  undo_backlink_db_operations=undo_backlink_db_operations,
+                                  changed_fields=changed_fields,
+                                  **backlinks)
+
+        return _DocumentWrite(
+            document,
+            db.Put(key, item, expect_if_item_exists={"version": document.version - 1}),
+            undo_db_operation=db.Put(key, loaded_item, expect_if_item_exists={"version": document.version})
+            if document_loaded else db.Delete(key),
+            backlink_db_operations=backlink_db_operations,
+            undo_backlink_db_operations=undo_backlink_db_operations,
+            content_body=document.content.body,
+            changed_fields=changed_fields,
+            **backlinks,
+            **self._prepare_content(document, item, loaded_item),
+        )
+
+    def _backlink_changes(self, document: DocumentRepositoryDocument, serialized: SerializedDocumentModel,
+                          changed_backlink_ids: List[lib.Id]) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        # The ids of the added and the removed backlinks, only the changed backlinks are looked at (the others might not
+        # be loaded)
+        key = (document.id, document.workspace)
+        document_loaded = self._documents_loaded_serialized.get(key)
+        if not document_loaded:
+            return frozenset(serialized.backlinks), frozenset()
+        stored_ids = {*document_loaded.backlinks, *self._overflow_backlink_ids.get(key, ())}
+        overflow = self._documents_loaded_items[key].get("backlinks_overflow")
+        changed_ids = {str(link_id) for link_id in changed_backlink_ids}
+        return (
+            frozenset(link_id for link_id in changed_ids
+                      if link_id in serialized.backlinks and link_id not in stored_ids),
+            # Backlinks are only removed with their (stored) links, a removed backlink that is not known to be stored
+            # is an overflow backlink that was not loaded - unless there are none
+            frozenset(link_id for link_id in changed_ids
+                      if link_id not in serialized.backlinks and (link_id in stored_ids or overflow)),
+        )
+
+    def _stored_backlinks_count(self, document: DocumentRepositoryDocument) -> int:
+        key = (document.id, document.workspace)
+        loaded_item = self._documents_loaded_items.get(key)
+        if not loaded_item:
+            return 0
+        if "backlinks_count" in loaded_item:
+            return int(loaded_item["backlinks_count"])
+        # stored before the backlinks were counted, they are counted once
+        count = len(self._documents_loaded_serialized[key].backlinks)
+        if loaded_item.get("backlinks_overflow"):
+            count += len(self._db.query_items(_overflow_backlink_key(document.id, document.workspace),
+                                              projection=["id"]))
+        return count
+
+    def _prepare_content(self, document: DocumentRepositoryDocument, item: Dict, loaded_item: Optional[Dict]) -> Dict:
+        # Points the item to the content body (acquires a reference to it), returns the content fields of the write
+        loaded_content_key = self._content_keys.get((document.id, document.workspace)) if loaded_item else None
+        content_hash = ContentStore.hash(document.content.body)
+        if content_hash and loaded_item and loaded_item.get("content_hash") == content_hash:
+            return {"content_key": loaded_content_key}  # the body did not change
+        if content_hash:
+            content_key, first_reference = self._content_store.acquire(document.workspace, content_hash)
+            item["content_hash"] = content_hash
+            content = {"content_key": content_key, "content_first_reference": first_reference,
+                       "content_acquired": True}
         else:
-            try:
-                self._db.put(
-                    key=db.ItemKey("workspace", document.workspace, secondary=db.ItemKey("id", document.id)),
-                    item=dict(self._document_serializer.serialize_document(document)),
-                    expect_if_item_exists={"version": document.version - 1}
-                )
-            except db.ExpectationNotMet:
-                raise DocumentContentUpdatedByOtherUserError
-            self._object_storage.put(str(document.id), document.content.body)
-            # TODO Saga Pattern
-            self._saved_documents.append(document)
+            # streamed bodies can not be hashed up front, they are stored under the document id
+            content_key = str(document.id)
+            item.pop("content_hash", None)
+            content = {"content_key": content_key}
+        item["content_key"] = content_key
+        self._content_keys[(document.id, document.workspace)] = content_key
+        return {
+            **content,
+            "upload_content_body": True,
+            "compress_content_body": CompressibleContentTypePolicy.is_satisfied_by(document.content.type),
+            "released_content_key": loaded_content_key if loaded_content_key != content_key else None,
+        }
+
+    def _prepare_overflow_backlinks(self, document: DocumentRepositoryDocument, serialized: SerializedDocumentModel,
+                                    changed_backlink_ids: List[str]) \
+            -> Tuple[SerializedDocumentModel, List[Union[db.Put, db.Delete]], List[db.Delete]]:
+        # Keeps at most max_inline_backlinks backlinks in the serialized document, the db operations for the others are
+        # returned. Backlinks stay where they are stored already.
+        document_loaded = self._documents_loaded_serialized.get((document.id, document.workspace))
+        loaded_inline_ids = set(document_loaded.backlinks) if document_loaded else set()
+        overflow_ids = self._overflow_backlink_ids.get((document.id, document.workspace), set())
+
+        inline = {link_id: backlink for link_id, backlink in serialized.backlinks.items()
+                  if link_id in loaded_inline_ids}
+        for link_id, backlink in serialized.backlinks.items():
+            if link_id not in inline and link_id not in overflow_ids and len(inline) < self.max_inline_backlinks:
+                inline[link_id] = backlink
+
+        db_operations = []
+        undo_db_operations = []
+        for link_id in changed_backlink_ids:
+            if link_id in inline:
+                continue
+            key = _overflow_backlink_key(document.id, document.workspace, link_id)
+            if link_id in serialized.backlinks:
+                db_operations.append(db.Put(key, {
+                    "workspace": key.value,
+                    "id": key.secondary.value,
+                    "item_type": "backlink",
+                    "link_id": link_id,
+                    "backlink": serialized.backlinks[link_id].dict(),
+                }))
+                if link_id not in overflow_ids:
+                    undo_db_operations.append(db.Delete(key))
+            elif link_id not in loaded_inline_ids:
+                db_operations.append(db.Delete(key))
+
+        return serialized.copy(update={"backlinks": inline}), db_operations, undo_db_operations
+
+    def propagate_link_previews(self, document: DocumentRepositoryDocument):
+        # Writes the current link previews of the document (and its highlights) to the referencing documents that store
+        # outdated ones with the next save. Idempotent: references that are up to date already are not written again.
+        document_loaded = self._documents_loaded_serialized.get((document.id, document.workspace))
+        references = self._link_preview_references(document, document_loaded, changed_only=False)
+        documents = self._register_indirect_changes(document.workspace, references)
+        for link, field, across_document, path in references:
+            key = (across_document.id, across_document.workspace)
+            if key in self._documents and not self._stores_outdated_link_preview(key, link, field, path):
+                self._indirect_changes[key].discard(path)
+                if not self._indirect_changes[key]:
+                    del self._indirect_changes[key]
+
+    def _stores_outdated_link_preview(self, key: Tuple[lib.Id, Workspace], link: Link, field: str, path: Tuple) \
+            -> bool:
+        stored = self._documents_loaded_serialized[key]
+        if path[0] == "highlights":
+            stored = stored.highlights.get(str(path[1]))
+        stored = getattr(stored, field).get(str(link.id)) if stored else None
+        if not stored:
+            return True  # stored in a separate item (overflow backlink), which is simply written again
+        model = SerializedLinkModel if field == "links" else SerializedBacklinkModel
+        return stored != model.build(link)
 
     def _document_is_dirty(self, document: DocumentRepositoryDocument):
-        document_loaded = self._documents_loaded_serialized.get((document.id, document.workspace))
-        return not document_loaded or document_loaded != self._document_serializer.serialize_document(document)
+        # Mutations are tracked by the domain, so documents do not have to be serialized to find the dirty ones
+        key = (document.id, document.workspace)
+        return key not in self._documents_loaded_serialized or bool(document.changes) or key in self._indirect_changes
 
     def _collect_dirty_documents(self) -> Generator[DocumentRepositoryDocument]:
         # May yield duplicates
@@ -142,21 +625,128 @@ class DocumentRepository(AbstractDocumentRepository):
             # all changes must have been registered by referencing entities - so they are already known to be dirty
             return
 
-        document_link_preview_changed = document_loaded.title != document.title
+        if self._defer_link_preview_propagation:
+            # The references are not even collected, they might be many (and some stored in separate items). Reported
+            # whenever a link preview was set, even to the same value: if reporting fails after the write, the retry
+            # finds nothing changed (propagating again is harmless).
+            if _link_preview_set(document):
+                self._deferred_link_previews.add((document.id, document.workspace))
+            return
+
+        references = self._link_preview_references(document, document_loaded, changed_only=True)
+        for across_document in self._register_indirect_changes(document.workspace, references):
+            loaded = self._documents.get((across_document.id, across_document.workspace))
+            if loaded:  # otherwise it does not exist (anymore)
+                yield loaded
+
+    @staticmethod
+    def _link_preview_references(document: DocumentRepositoryDocument, document_loaded: SerializedDocumentModel,
+                                 changed_only: bool) -> List[Tuple[Link, str, Document, Tuple]]:
+        # Returns the references to the link previews of the document (and its highlights) that are stored by other
+        # documents: (link, name of the field that stores the link on the other side, document on the other side,
+        # path of the link in that document)
+        # changed_only -> only the references to link previews that changed since the document was loaded
+
+        document_link_preview_changed = not changed_only \
+            or (document.changed("title") and document_loaded.title != document.title)
+
+        references = []  # (link, field, entity on the other side)
 
         if document_link_preview_changed:
-            for link in document.links:
-                yield link.target
+            references.extend((link, "backlinks", link.target) for link in document.links)
+            references.extend((link, "links", link.source) for link in document.backlinks)
 
         def highlight_link_preview_changed(highlight: Highlight):
             loaded_highlight = document_loaded.highlights.get(str(highlight.id))
-            return loaded_highlight and loaded_highlight.links \
+            return loaded_highlight \
                 and (loaded_highlight.link_preview_text != highlight.link_preview.text or document_link_preview_changed)
 
-        for document_highlight in document.highlights:
-            if highlight_link_preview_changed(document_highlight):
-                for link in document_highlight.links:
-                    yield link.target
+        if document.changed("highlights") or document_link_preview_changed:
+            for document_highlight in document.highlights:
+                if not changed_only or highlight_link_preview_changed(document_highlight):
+                    references.extend((link, "backlinks", link.target) for link in document_highlight.links or [])
+                    references.extend((link, "links", link.source) for link in document_highlight.backlinks)
+
+        paths = []
+        for link, field, across in references:
+            if hasattr(across, "parent"):  # highlights are stored by their document
+                paths.append((link, field, across.parent, ("highlights", across.id, field, link.id)))
+            else:
+                paths.append((link, field, across, (field, link.id)))
+        return paths
+
+    def _register_indirect_changes(self, workspace: Workspace, references: List[Tuple[Link, str, Document, Tuple]]) \
+            -> List[Document]:
+        documents = []
+        for _, _, across_document, path in references:
+            self._indirect_changes.setdefault((across_document.id, across_document.workspace), set()).add(path)
+            documents.append(across_document)
+
+        # Load all (lazy) documents at once, instead of one db get per document
+        lib.Lazy.prefetch(documents, lambda lazy_documents: self.get_many(
+            [lazy_document.id for lazy_document in lazy_documents], workspace))
+        return documents
+
+
+_REVISION_PROJECTION = ["workspace", "id", "revision"]
+
+
+def _item_key(document_id: lib.Id, workspace: Workspace) -> db.ItemKey:
+    return db.ItemKey("workspace", workspace, secondary=db.ItemKey("id", document_id))
+
+
+def _overflow_backlink_key(document_id: lib.Id, workspace: Workspace, link_id: Union[lib.Id, str] = None) -> db.ItemKey:
+    # without link_id -> prefix of the keys of all overflow backlinks of the document
+    # In a partition of their own, so that listing the documents of the workspace does not read them
+    return db.ItemKey("workspace", f"{workspace}#backlinks",
+                      secondary=db.ItemKey("id", f"{document_id}#backlink#{link_id if link_id else ''}"))
+
+
+def _link_preview_set(document: DocumentRepositoryDocument) -> bool:
+    # the link previews are the title and the highlight texts
+    return document.changed("title") or document.changed("highlights")
+
+
+def _encode_page_key(key: Dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_page_key(page_key: str, workspace: Workspace) -> Dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(page_key.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidPageKeyError() from e
+    if type(key) is not dict or set(key) != {"workspace", "id"} or key["workspace"] != str(workspace):
+        raise InvalidPageKeyError()
+    return key
+
+
+class _DocumentWrite(NamedTuple):
+    document: DocumentRepositoryDocument
+    db_operation: Union[db.Put, db.Update, db.Delete]
+    undo_db_operation: Optional[Union[db.Put, db.Update, db.Delete]]
+    # overflow backlink items (see DocumentRepository._prepare_overflow_backlinks)
+    backlink_db_operations: Sequence[Union[db.Put, db.Delete]] = ()
+    undo_backlink_db_operations: Sequence[db.Delete] = ()
+    content_body: Any = None
+    upload_content_body: bool = False
+    compress_content_body: bool = False
+    content_key: Optional[str] = None  # see ContentStore
+    content_first_reference: bool = False
+    content_acquired: bool = False  # -> the reference to content_key is released if the write fails
+    released_content_key: Optional[str] = None  # released after the write succeeded
+    changed_fields: Optional[FrozenSet[str]] = None  # see DocumentRepository.changed_fields
+    # see DocumentRepositoryDocument
+    backlinks_count: Optional[int] = None
+    added_backlink_ids: FrozenSet[str] = frozenset()
+    removed_backlink_ids: FrozenSet[str] = frozenset()
+
+
+def _raise_errors(errors: Dict[DocumentRepositoryDocument, Exception]):
+    if len(errors) == 1:
+        raise [*errors.values()][0]
+    if errors:
+        raise DocumentsNotSavedError(errors)
 
 
 class DocumentFactory:
@@ -168,14 +758,19 @@ class DocumentFactory:
         # this means we have to reuse already instantiated Links/ LinkPreviews.
         self._links: Dict[lib.Id, Link] = {}  # key -> link id
         self._link_previews: Dict[lib.Id, LinkPreview] = {}  # key -> document id/ document highlight id
+        # The same ids are referenced by many serialized links, so every id is only instantiated once
+        self._ids: Dict[str, lib.Id] = {}
 
         # Store the id of the documents that are currently being build so that the document repository can prevent
         # bootstrapping loops
         self._document_ids = []
 
     def build_document(self, serialized: SerializedDocumentModel,
-                       content_body_getter: Callable, content_body_url_getter: Callable) -> DocumentRepositoryDocument:
-        document_id = lib.Id(serialized.id)
+                       content_body_getter: Callable, content_body_url_getter: Callable,
+                       overflow_backlinks_getter: Callable[[Optional[lib.Id]],
+                                                           List[Tuple[str, SerializedBacklinkModel]]] = None,
+                       ) -> DocumentRepositoryDocument:
+        document_id = self._get_id(serialized.id)
         self._document_ids.append(document_id)
         workspace = Workspace(serialized.workspace)
         document_link_preview = self._get_link_preview(
@@ -203,6 +798,10 @@ class DocumentFactory:
         highlights = [self._get_highlight(ser_highlight_id, serialized.highlights[ser_highlight_id], lazy_document)
                       for ser_highlight_id in serialized.highlights]
 
+        def backlinks_loader(link_id: Optional[lib.Id]) -> List[Link]:
+            return [self._get_link(ser_link_id, ser_backlink, lazy_document)
+                    for ser_link_id, ser_backlink in overflow_backlinks_getter(link_id)]
+
         document = DocumentRepositoryDocument(
             id_=document_id,
             workspace=workspace,
@@ -213,6 +812,7 @@ class DocumentFactory:
             links=links,
             backlinks=backlinks,
             highlights=highlights,
+            backlinks_loader=backlinks_loader if overflow_backlinks_getter else None,
         )
         document._repository_init(serialized.version, content_body_url_getter)
         self._document_ids.remove(document_id)
@@ -226,10 +826,10 @@ class DocumentFactory:
         # scope entry -> entry of the document (/highlight) to build
         # across entry -> other entry
 
-        link_id = lib.Id(serialized_id)
-        link = self._links.get(link_id)
+        link = self._links.get(serialized_id)
         if link:
             return link
+        link_id = self._get_id(serialized_id)
 
         workspace = scope.workspace if hasattr(scope, "workspace") else scope.parent.workspace
 
@@ -237,10 +837,10 @@ class DocumentFactory:
 
         def get_across() -> Union[Document, Highlight]:
             if across_is_target:
-                across_document_id = lib.Id(serialized.target_document_id)
+                across_document_id = self._get_id(serialized.target_document_id)
                 across_document_highlight_id = serialized.target_document_highlight_id
             else:
-                across_document_id = lib.Id(serialized.source_document_id)
+                across_document_id = self._get_id(serialized.source_document_id)
                 across_document_highlight_id = serialized.source_document_highlight_id
 
             across_is_of_type_highlight = bool(across_document_highlight_id)
@@ -248,7 +848,7 @@ class DocumentFactory:
             # link preview
 
             if across_is_of_type_highlight:
-                across_document_highlight_id = lib.Id(across_document_highlight_id)
+                across_document_highlight_id = self._get_id(across_document_highlight_id)
                 across_link_preview = self._get_link_preview(
                     id_=across_document_highlight_id,
                     factory_fn=lambda:
@@ -319,6 +919,12 @@ class DocumentFactory:
         self._links[link_id] = link
         return link
 
+    def _get_id(self, value: str) -> lib.Id:
+        id_ = self._ids.get(value)
+        if not id_:
+            id_ = self._ids[value] = lib.Id(value)
+        return id_
+
     def _get_link_preview(self, id_: lib.Id, factory_fn: Callable):
         link_preview = self._link_previews.get(id_)
         if not link_preview:
@@ -327,7 +933,7 @@ class DocumentFactory:
         return link_preview
 
     def _get_highlight(self, serialized_id: str, serialized: SerializedHighlightModel, scope: Document) -> Highlight:
-        highlight_id = lib.Id(serialized_id)
+        highlight_id = self._get_id(serialized_id)
         highlight_link_preview = self._get_link_preview(
             id_=highlight_id,
             factory_fn=lambda: LinkPreview(text=serialized.link_preview_text, parent=scope.link_preview)
@@ -358,3 +964,15 @@ class DocumentFactory:
 
 class DocumentContentUpdatedByOtherUserError(ValueError):
     pass
+
+
+class InvalidPageKeyError(ValueError):
+    pass
+
+
+class DocumentsNotSavedError(Exception):
+
+    def __init__(self, errors: Dict[DocumentRepositoryDocument, Exception]):
+        super().__init__(", ".join(f"Document(id='{document.id}') not saved: {error!r}"
+                                   for document, error in errors.items()))
+        self.errors = errors
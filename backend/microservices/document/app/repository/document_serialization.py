@@ -1,9 +1,16 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Tuple
+import os
+import json
+import zlib
 from aws_lambda_powertools.utilities.parser import BaseModel
 from domain.model.document import Link, Highlight
 from .document import DocumentRepositoryDocument
 
 
+# The models are built from the domain and from items that were written by this service (both trusted), so they are
+# constructed without validation
+
+
 class SerializedLinkModel(BaseModel):
     # key -> id: str
     location: str
@@ -15,7 +22,7 @@ class SerializedLinkModel(BaseModel):
     @classmethod
     def build(cls, link: Link):
         target_is_highlight = hasattr(link.target, "parent")
-        return cls(
+        return cls.construct(
             location=str(link.location),
             target_document_id=str(link.target.parent.id) if target_is_highlight else str(link.target.id),
             target_document_highlight_id=str(link.target.id) if target_is_highlight else None,
@@ -36,7 +43,7 @@ class SerializedBacklinkModel(BaseModel):
     @classmethod
     def build(cls, link: Link):
         source_is_highlight = hasattr(link.source, "parent")
-        return cls(
+        return cls.construct(
             location=str(link.location),
             source_document_id=str(link.source.parent.id) if source_is_highlight else str(link.source.id),
             source_document_highlight_id=str(link.source.id) if source_is_highlight else None,
@@ -56,7 +63,7 @@ class SerializedHighlightModel(BaseModel):
 
     @classmethod
     def build(cls, highlight: Highlight):
-        return cls(
+        return cls.construct(
             location=str(highlight.location),
             note_body=highlight.note.body if highlight.note else None,
             link_preview_text=highlight.link_preview.text,
@@ -64,6 +71,18 @@ class SerializedHighlightModel(BaseModel):
             backlinks={str(link.id): SerializedBacklinkModel.build(link) for link in highlight.backlinks},
         )
 
+    @classmethod
+    def from_item(cls, item: Dict):
+        return cls.construct(
+            location=item["location"],
+            note_body=item.get("note_body"),
+            link_preview_text=item["link_preview_text"],
+            links={link_id: SerializedLinkModel.construct(**link) for link_id, link in item["links"].items()}
+            if item.get("links") else None,
+            backlinks={link_id: SerializedBacklinkModel.construct(**backlink)
+                       for link_id, backlink in item["backlinks"].items()},
+        )
+
 
 class SerializedDocumentModel(BaseModel):
     id: str
@@ -80,21 +99,89 @@ class SerializedDocumentModel(BaseModel):
 
     @classmethod
     def build(cls, document: DocumentRepositoryDocument):
-        return cls(
+        return cls.construct(
             id=str(document.id),
             workspace=str(document.workspace),
             title=document.title,
             version=document.version,
-            tags=document.tags,
+            tags=list(document.tags),
             content_type=document.content.type,
             links={str(link.id): SerializedLinkModel.build(link) for link in document.links},
-            backlinks={str(link.id): SerializedBacklinkModel.build(link) for link in document.backlinks},
+            # backlinks that are not loaded yet are stored separately and did not change
+            backlinks={str(link.id): SerializedBacklinkModel.build(link) for link in document.loaded_backlinks},
             highlights={str(highlight.id): SerializedHighlightModel.build(highlight) for highlight in document.highlights},
         )
 
+    @classmethod
+    def from_item(cls, item: Dict):
+        # item -> unpacked (see DocumentSerializer.from_item), numbers are read as decimals
+        return cls.construct(
+            id=item["id"],
+            workspace=item["workspace"],
+            title=item["title"],
+            version=int(item["version"]),
+            tags=list(item["tags"]),
+            content_type=item["content_type"],
+            links={link_id: SerializedLinkModel.construct(**link) for link_id, link in item["links"].items()},
+            backlinks={link_id: SerializedBacklinkModel.construct(**backlink)
+                       for link_id, backlink in item["backlinks"].items()},
+            highlights={highlight_id: SerializedHighlightModel.from_item(highlight)
+                        for highlight_id, highlight in item["highlights"].items()},
+        )
+
 
 class DocumentSerializer:
 
+    # The links, backlinks and highlights of documents that would take up more bytes than this (as json) are packed into
+    # one compressed binary attribute, to stay clear of the item size limit of 400 KB and to save capacity units.
+    # 0 -> never pack
+    pack_threshold = int(os.environ.get("DocumentPackThreshold", 64_000))
+    packed_fields = ["links", "backlinks", "highlights"]
+    pack_format_version = 1  # first byte of the packed attribute
+
     @staticmethod
     def serialize_document(document: DocumentRepositoryDocument) -> SerializedDocumentModel:
         return SerializedDocumentModel.build(document)
+
+    @classmethod
+    def to_item(cls, serialized: SerializedDocumentModel) -> Dict:
+        item = serialized.dict()
+        if not cls.pack_threshold:
+            return item
+        packed = json.dumps({name: item[name] for name in cls.packed_fields}, separators=(",", ":")).encode()
+        if len(packed) < cls.pack_threshold:
+            return item
+        for name in cls.packed_fields:
+            del item[name]
+        item["packed"] = bytes([cls.pack_format_version]) + zlib.compress(packed)
+        return item
+
+    @classmethod
+    def deserialize_item(cls, item: Dict) -> SerializedDocumentModel:
+        return SerializedDocumentModel.from_item(cls.from_item(item))
+
+    @classmethod
+    def from_item(cls, item: Dict) -> Dict:
+        # reads packed as well as unpacked items
+        if "packed" not in item:
+            return item
+        packed = bytes(item["packed"])
+        if packed[0] != cls.pack_format_version:
+            raise ValueError(f"Unknown pack format version: {packed[0]}")
+        unpacked = {name: attribute for name, attribute in item.items() if name != "packed"}
+        unpacked.update(json.loads(zlib.decompress(packed[1:])))
+        return unpacked
+
+    @staticmethod
+    def serialize_changes(changes: Iterable[Tuple]) -> List[Tuple[str, ...]]:
+        # Maps the changes tracked by the domain to the paths of the (nested) serialized fields that might have changed
+        paths = []
+        for field, *sub_path in changes:
+            sub_path = tuple(str(name) for name in sub_path)
+            if field == "content":
+                paths.extend([("content_type",), ("version",)])
+            elif field == "highlights" and sub_path[1:] == ("note",):
+                paths.append(("highlights", sub_path[0]))  # the note body and the links
+            elif field != "deleted":
+                paths.append((field, *sub_path))
+        return paths
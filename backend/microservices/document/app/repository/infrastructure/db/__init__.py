@@ -1,2 +1,2 @@
-from .db import DB, ItemKey, ExpectationNotMet, InternalError
+from .db import DB, ItemKey, Put, Update, Delete, ExpectationNotMet, InternalError
 from .repository import DocumentRepositoryDB
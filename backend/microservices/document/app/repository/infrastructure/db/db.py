@@ -1,8 +1,11 @@
 from __future__ import annotations
 import typing
+import time
+import threading
 import boto3
 import botocore.exceptions
 import boto3.dynamodb.conditions
+import boto3.dynamodb.types
 
 
 class ItemKey:
@@ -15,101 +18,375 @@ class ItemKey:
         self.secondary = secondary
 
     def as_dynamodb_primary_key_cond_expression(self):
-        return boto3.dynamodb.conditions.Key(self.name).eq(self.value)
+        return boto3.dynamodb.conditions.Key(self.name).eq(str(self.value))
+
+    def as_dynamodb_key_cond_expression(self):
+        # secondary -> the value is a prefix of the secondary key
+        expression = self.as_dynamodb_primary_key_cond_expression()
+        if self.secondary:
+            expression &= boto3.dynamodb.conditions.Key(self.secondary.name).begins_with(str(self.secondary.value))
+        return expression
 
     def as_dynamodb_key(self):
-        return {*{self.name: self.value}, *(self.secondary.as_dynamodb_key() if self.secondary else {})}
-    
-    
+        return {self.name: str(self.value), **(self.secondary.as_dynamodb_key() if self.secondary else {})}
+
+
+class Put(typing.NamedTuple):
+    key: ItemKey
+    item: typing.Dict
+    expect_if_item_exists: typing.Dict = None
+
+
+class Update(typing.NamedTuple):
+    key: ItemKey
+    item: typing.Dict
+    old_item: typing.Dict
+    # paths of the (nested) attributes that might have changed, e.g. ("links", "<link id>"),
+    # None -> diff all attributes (one level deep into maps)
+    changed_paths: typing.List[typing.Tuple[str, ...]] = None
+    # number attributes that are atomically added to (concurrent updates do not overwrite each other), not diffed
+    add: typing.Dict[str, int] = None
+
+
+class Delete(typing.NamedTuple):
+    key: ItemKey
+    expect: typing.Dict = None  # only delete the item if it has these attribute values
+
+
 class DB:
 
+    # BatchGetItem accepts at most 100 keys per request
+    max_batch_get_size = 100
+    max_batch_get_attempts = 5
+    # TransactWriteItems accepts at most 100 operations per request
+    max_transaction_size = 100
+
+    # boto3 resources must not be shared between threads, but creating one is expensive (session, service model,
+    # credentials) - so every thread creates its resource once and reuses it for all DB instances
+    _thread_local = threading.local()
+
     def __init__(self, name: str):
-        self._table = boto3.resource("dynamodb").Table(name)
+        self._name = name
+
+    @property
+    def _dynamodb(self):
+        if not hasattr(self._thread_local, "dynamodb"):
+            self._thread_local.dynamodb = boto3.session.Session().resource("dynamodb")
+            self._thread_local.tables = {}
+        return self._thread_local.dynamodb
 
-    def query_items(self, key: ItemKey):
-        # query primary key
+    @property
+    def _table(self):
+        dynamodb = self._dynamodb
+        table = self._thread_local.tables.get(self._name)
+        if not table:
+            table = self._thread_local.tables[self._name] = dynamodb.Table(self._name)
+        return table
+
+    def query_page(self, key: ItemKey, limit: int = None, start_key: typing.Dict = None,
+                   projection: typing.List[str] = None) \
+            -> typing.Tuple[typing.List[typing.Dict], typing.Optional[typing.Dict]]:
+        # query key (see ItemKey.as_dynamodb_key_cond_expression), returns the items of one page and the key to continue
+        # after it (None if last page)
+        params = {"KeyConditionExpression": key.as_dynamodb_key_cond_expression(),
+                  **self._projection_params(projection)}
+        if limit:
+            params["Limit"] = limit
+        if start_key:
+            params["ExclusiveStartKey"] = start_key
         try:
-            response = self._table.query(
-                IndexName=key.name,
-                KeyConditionExpression=key.as_dynamodb_primary_key_cond_expression(),
-            )
-            return response["Items"]
+            response = self._table.query(**params)
         except botocore.exceptions.ClientError as e:
             raise InternalError() from e
+        return response["Items"], response.get("LastEvaluatedKey")
+
+    def iter_query_pages(self, key: ItemKey, page_size: int = None, start_key: typing.Dict = None,
+                         projection: typing.List[str] = None) \
+            -> typing.Generator[typing.Tuple[typing.List[typing.Dict], typing.Optional[typing.Dict]], None, None]:
+        while True:
+            items, start_key = self.query_page(key, page_size, start_key, projection)
+            yield items, start_key
+            if not start_key:
+                return
 
-    def get_item(self, key: ItemKey):
+    def query_items(self, key: ItemKey, projection: typing.List[str] = None):
+        # all pages
+        return [item for items, _ in self.iter_query_pages(key, projection=projection) for item in items]
+
+    def get_item(self, key: ItemKey, projection: typing.List[str] = None, consistent: bool = False):
         try:
-            resp = self._table.get_item(Key=key.as_dynamodb_key())
-            return resp["Item"]
+            resp = self._table.get_item(Key=key.as_dynamodb_key(), ConsistentRead=consistent,
+                                        **self._projection_params(projection))
+            return resp.get("Item")
         except botocore.exceptions.ClientError as e:
-            raise
+            raise InternalError() from e
+
+    def batch_get_items(self, keys: typing.List[ItemKey], projection: typing.List[str] = None,
+                        consistent: bool = False) -> typing.List[typing.Dict]:
+        # items are returned in no particular order, missing items are left out
+        request_params = {"ConsistentRead": consistent, **self._projection_params(projection)}
+        items = []
+        for i in range(0, len(keys), self.max_batch_get_size):
+            request_keys = [key.as_dynamodb_key() for key in keys[i:i + self.max_batch_get_size]]
+            attempt = 0
+            while request_keys:
+                if attempt:
+                    if attempt == self.max_batch_get_attempts:
+                        raise InternalError("Exceeded attempts to get unprocessed keys")
+                    time.sleep(0.05 * 2 ** attempt)  # exponential backoff
+                try:
+                    response = self._dynamodb.batch_get_item(
+                        RequestItems={self._table.name: {"Keys": request_keys, **request_params}},
+                    )
+                except botocore.exceptions.ClientError as e:
+                    raise InternalError() from e
+                items.extend(response["Responses"].get(self._table.name, []))
+                request_keys = response.get("UnprocessedKeys", {}).get(self._table.name, {}).get("Keys", [])
+                attempt += 1
+        return items
 
     def put(self, key: ItemKey, item: typing.Dict, expect_if_item_exists: typing.Dict = None):
-        assert key.name in item
-        assert not key.secondary or key.secondary.name in item
-        expression_values = {}
-        statements = []
-        for name, value in expect_if_item_exists.items():
-            statements.append(f"{name}=:{name}")
-            expression_values[f":{name}"] = value
-        condition_expression = " AND ".join(statements)
-        if expect_if_item_exists:
-            condition_expression = f"({condition_expression}) OR {key.name}<>:{key.name}"
-            expression_values[key.name] = key.value
         try:
-            self._table.put_item(Item=item, ConditionExpression=condition_expression)
+            self._table.put_item(**self._put_params(Put(key, item, expect_if_item_exists)))
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise ExpectationNotMet() from e
+            raise InternalError() from e
+
+    def update(self, key: ItemKey, item: typing.Dict, old_item: typing.Dict,
+               changed_paths: typing.List[typing.Tuple[str, ...]] = None, add: typing.Dict[str, int] = None):
+        params = self._update_params(Update(key, item, old_item, changed_paths, add))
+        if not params:
+            return  # nothing changed
+        try:
+            self._table.update_item(**params)
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise ExpectationNotMet() from e
+            raise InternalError() from e
+
+    def delete(self, key: ItemKey, expect: typing.Dict = None):
+        try:
+            self._table.delete_item(**self._delete_params(Delete(key, expect)))
         except botocore.exceptions.ClientError as e:
             if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
                 raise ExpectationNotMet() from e
             raise InternalError() from e
 
-    def update(self, key: ItemKey, item: typing.Dict, old_item: typing.Dict):
+    def increment(self, key: ItemKey, name: str, by: int, set_if_not_exists: typing.Dict = None,
+                  expect_item_exists: bool = False) -> typing.Dict:
+        # Atomically adds to a number attribute (creates the item unless expect_item_exists), returns the updated item
+        names = {"#n": name}
+        values = {":by": by}
+        set_statements = []
+        for i, (set_name, set_value) in enumerate((set_if_not_exists or {}).items()):
+            names[f"#s{i}"] = set_name
+            values[f":s{i}"] = set_value
+            set_statements.append(f"#s{i} = if_not_exists(#s{i}, :s{i})")
+        params = {
+            "Key": key.as_dynamodb_key(),
+            "UpdateExpression": " ".join([*([f"SET {', '.join(set_statements)}"] if set_statements else []),
+                                          "ADD #n :by"]),
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+            "ReturnValues": "ALL_NEW",
+        }
+        if expect_item_exists:
+            names["#key"] = key.name
+            params["ConditionExpression"] = "attribute_exists(#key)"
+        try:
+            response = self._table.update_item(**params)
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise ExpectationNotMet() from e
+            raise InternalError() from e
+        return response["Attributes"]
+
+    def write(self, operation: typing.Union[Put, Update, Delete]):
+        if isinstance(operation, Put):
+            self.put(*operation)
+        elif isinstance(operation, Update):
+            self.update(*operation)
+        else:
+            self.delete(*operation)
+
+    def transact_write(self, operations: typing.List[typing.Union[Put, Update, Delete]]):
+        # all or nothing
+        if len(operations) > self.max_transaction_size:
+            raise ValueError(f"A transaction can consist of at most {self.max_transaction_size} operations")
+        serializer = boto3.dynamodb.types.TypeSerializer()
+
+        def serialize(params: typing.Dict):
+            # the client (unlike the table resource) expects typed attribute values
+            for name in ["Item", "Key", "ExpressionAttributeValues"]:
+                if name in params:
+                    params[name] = {k: serializer.serialize(v) for k, v in params[name].items()}
+            return {"TableName": self._name, **params}
+
+        transact_items = []
+        for operation in operations:
+            if isinstance(operation, Put):
+                transact_items.append({"Put": serialize(self._put_params(operation))})
+            elif isinstance(operation, Update):
+                params = self._update_params(operation)
+                if params:
+                    transact_items.append({"Update": serialize(params)})
+            else:
+                transact_items.append({"Delete": serialize(self._delete_params(operation))})
+        if not transact_items:
+            return
+        try:
+            self._dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+        except botocore.exceptions.ClientError as e:
+            reasons = e.response.get("CancellationReasons", [])
+            if any(reason.get("Code") == "ConditionalCheckFailed" for reason in reasons):
+                raise ExpectationNotMet() from e
+            raise InternalError() from e
+
+    @staticmethod
+    def _projection_params(projection: typing.Optional[typing.List[str]]) -> typing.Dict:
+        if not projection:
+            return {}
+        # only get these attributes
+        return {
+            "ProjectionExpression": ", ".join(f"#p{i}" for i in range(len(projection))),
+            "ExpressionAttributeNames": {f"#p{i}": name for i, name in enumerate(projection)},
+        }
+
+    @staticmethod
+    def _put_params(operation: Put) -> typing.Dict:
+        key, item, expect_if_item_exists = operation
         assert key.name in item
         assert not key.secondary or key.secondary.name in item
-
-        def build_expression():  # apply diff
-            statements = []
+        params = {"Item": item}
+        if expect_if_item_exists:
+            names = {"#key": key.name}
             values = {}
+            statements = []
+            for i, (name, value) in enumerate(expect_if_item_exists.items()):
+                names[f"#e{i}"] = name
+                values[f":e{i}"] = value
+                statements.append(f"#e{i} = :e{i}")
+            params["ConditionExpression"] = f"attribute_not_exists(#key) OR ({' AND '.join(statements)})"
+            params["ExpressionAttributeNames"] = names
+            params["ExpressionAttributeValues"] = values
+        return params
+
+    @staticmethod
+    def _update_params(operation: Update) -> typing.Optional[typing.Dict]:
+        key, item, old_item, changed_paths, add = operation
+        add = {name: by for name, by in (add or {}).items() if by}
+        assert key.name in item
+        assert not key.secondary or key.secondary.name in item
 
-            for name, attribute in item.items():
+        key_names = [key.name, *([key.secondary.name] if key.secondary else [])]
+        names = {}
+        values = {}
+        set_statements = []
+        remove_statements = []
 
-                if type(attribute) is dict and name in old_item:
-                    for sub_name, sub_attribute in attribute.items():
-                        if sub_name not in old_item[name] or old_item[name][sub_name] != sub_attribute:
-                            statements.append(f"SET {name}.{sub_name}=:{name}.{sub_name}")
-                            values[f":{name}.{sub_name}"] = sub_attribute
-                    for old_sub_name in old_item[name]:
-                        if old_sub_name not in attribute:
-                            statements.append(f"DELETE {name}.{old_sub_name}")
+        placeholders = {}
 
+        def path(*path_names):
+            for path_name in path_names:
+                if path_name not in placeholders:
+                    placeholders[path_name] = f"#n{len(placeholders)}"
+                    names[placeholders[path_name]] = path_name
+            return ".".join(placeholders[path_name] for path_name in path_names)
+
+        def value(attribute):
+            placeholder = f":v{len(values)}"
+            values[placeholder] = attribute
+            return placeholder
+
+        if changed_paths is None:
+            changed_paths = []
+            for name in {*item, *old_item}:
+                if type(item.get(name)) is dict and type(old_item.get(name)) is dict:
+                    changed_paths.extend((name, sub_name) for sub_name in {*item[name], *old_item[name]})
                 else:
-                    statements.append(f"SET {name}=:{name}")
-                    values["name"] = attribute
+                    changed_paths.append((name,))
 
-            for old_name in old_item:
-                if old_name not in item:
-                    statements.append(f"DELETE {old_name}")
+        # apply diff
+        for changed_path in _outermost_paths(_existing_path(changed_path, item, old_item)
+                                             for changed_path in changed_paths):
+            if changed_path[0] in key_names or changed_path[0] in add:
+                continue
+            attribute = _get_path(item, changed_path)
+            old_attribute = _get_path(old_item, changed_path)
+            if attribute is _missing:
+                if old_attribute is not _missing:
+                    remove_statements.append(path(*changed_path))
+            elif attribute != old_attribute:
+                set_statements.append(f"{path(*changed_path)} = {value(attribute)}")
 
-            return ", ".join(statements), values
+        add_statements = [f"{path(name)} {value(by)}" for name, by in add.items()]
 
-        expression, expression_values = build_expression()
+        if not set_statements and not remove_statements and not add_statements:
+            return None
+        expression = " ".join([
+            *([f"SET {', '.join(set_statements)}"] if set_statements else []),
+            *([f"REMOVE {', '.join(remove_statements)}"] if remove_statements else []),
+            *([f"ADD {', '.join(add_statements)}"] if add_statements else []),
+        ])
+        names["#key"] = key.name
+        params = {
+            "Key": key.as_dynamodb_key(),
+            "UpdateExpression": expression,
+            "ExpressionAttributeNames": names,
+            # make sure that item is being updated, not created
+            "ConditionExpression": "attribute_exists(#key)",
+        }
+        if values:
+            params["ExpressionAttributeValues"] = values
+        return params
 
-        try:
-            self._table.update_item(
-                Key=key.as_dynamodb_key(),
-                UpdateExpression=expression,
-                ExpressionAttributeValues=expression_values,
-                # make sure that item is being updated, not created
-                ConditionExpression=f"attribute_exists({key.name})",
-            )
-        except botocore.exceptions.ClientError as e:
-            raise InternalError() from e
+    @staticmethod
+    def _delete_params(operation: Delete) -> typing.Dict:
+        key, expect = operation
+        params = {"Key": key.as_dynamodb_key()}
+        if expect:
+            names = {}
+            values = {}
+            statements = []
+            for i, (name, value) in enumerate(expect.items()):
+                names[f"#e{i}"] = name
+                values[f":e{i}"] = value
+                statements.append(f"#e{i} = :e{i}")
+            params["ConditionExpression"] = " AND ".join(statements)
+            params["ExpressionAttributeNames"] = names
+            params["ExpressionAttributeValues"] = values
+        return params
 
-    def delete(self, key: ItemKey):
-        try:
-            self._table.delete_item(Key=key.as_dynamodb_key())
-        except botocore.exceptions.ClientError as e:
-            raise InternalError() from e
+
+_missing = object()
+
+
+def _get_path(item: typing.Dict, path: typing.Tuple[str, ...]):
+    attribute = item
+    for name in path:
+        if type(attribute) is not dict or name not in attribute:
+            return _missing
+        attribute = attribute[name]
+    return attribute
+
+
+def _existing_path(path: typing.Tuple[str, ...], item: typing.Dict, old_item: typing.Dict) -> typing.Tuple[str, ...]:
+    # A nested attribute can only be set if its parent map exists (in the stored item as well as after the update),
+    # otherwise climb up to the nearest parent that does
+    for i in range(1, len(path)):
+        if type(_get_path(item, path[:i])) is not dict or type(_get_path(old_item, path[:i])) is not dict:
+            return path[:i]
+    return path
+
+
+def _outermost_paths(paths: typing.Iterable[typing.Tuple[str, ...]]) -> typing.List[typing.Tuple[str, ...]]:
+    # paths of an update expression must not overlap
+    outermost = []
+    for path in sorted(set(paths)):  # a parent is sorted right before its descendants
+        if not outermost or outermost[-1] != path[:len(outermost[-1])]:
+            outermost.append(path)
+    return outermost
 
 
 class ExpectationNotMet(ValueError):
@@ -1,2 +1,2 @@
-from .object_storage import ObjectStorage, InternalError
+from .object_storage import ObjectStorage, ObjectBody, InternalError
 from .repository import DocumentRepositoryObjectStorage
@@ -1,9 +1,67 @@
+from __future__ import annotations
+import typing
+import io
+import gzip
+import zlib
+import os
+import time
+import threading
 import boto3
+import boto3.exceptions
+import boto3.s3.transfer
 import botocore.exceptions
 
 
+class PresignedUrlCache:
+    """
+    Presigned urls of the process (shared by all instances and, in warm lambda containers, invocations). A url is
+    refreshed once the given fraction of its lifetime has passed, so a handed out url is still valid for at least the
+    remaining fraction of its lifetime.
+    """
+
+    def __init__(self, lifetime: int, refresh_fraction: float, max_size: int):
+        self._refresh_after = lifetime * refresh_fraction
+        self._max_size = max_size
+        self._urls: typing.Dict[typing.Tuple, typing.Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: typing.Tuple) -> typing.Optional[str]:
+        with self._lock:
+            entry = self._urls.get(key)
+        if not entry or time.time() - entry[1] >= self._refresh_after:
+            return None
+        return entry[0]
+
+    def put(self, key: typing.Tuple, url: str):
+        with self._lock:
+            self._urls.pop(key, None)
+            self._urls[key] = (url, time.time())
+            while len(self._urls) > self._max_size:
+                del self._urls[next(iter(self._urls))]  # the oldest
+
+
 class ObjectStorage:
 
+    default_chunk_size = 1024 * 1024
+
+    # Bodies larger than this are uploaded in parts, the parts are uploaded concurrently
+    multipart_threshold = 8 * 1024 * 1024
+    multipart_part_size = 8 * 1024 * 1024
+    multipart_max_concurrency = 8
+
+    # Codec of compressed bodies, stored as the Content-Encoding of the object (so that presigned urls serve them
+    # correctly) and reverted on read
+    compression_encoding = "gzip"
+    compression_level = 6
+
+    url_lifetime = 60 * 60 * 24  # seconds
+    # Lives as long as the (warm) lambda container
+    url_cache = PresignedUrlCache(
+        lifetime=url_lifetime,
+        refresh_fraction=float(os.environ.get("ObjectStorageUrlRefreshFraction", 0.5)),
+        max_size=10_000,
+    )
+
     def __init__(self, name: str):
         self._client = boto3.client("s3")
         self._bucket = name
@@ -14,30 +72,133 @@ class ObjectStorage:
                 Bucket=self._bucket,
                 Key=id_,
             )
-            return response["Body"]
         except botocore.exceptions.ClientError as e:
             raise InternalError() from e
+        if _is_compressed(response):
+            return gzip.GzipFile(fileobj=response["Body"], mode="rb")
+        return response["Body"]
+
+    def get_range(self, id_: str, start: int, end: int, compressed: bool = None) -> bytes:
+        # bytes [start, end) of the (decompressed) object
+        # compressed -> whether the body is stored compressed, if not known it is looked up before the range is requested
+        if end <= start:
+            return b""
+        if compressed is None:
+            compressed = self._is_stored_compressed(id_)
+        if not compressed:
+            try:
+                response = self._client.get_object(
+                    Bucket=self._bucket,
+                    Key=id_,
+                    Range=f"bytes={start}-{end - 1}",
+                )
+            except botocore.exceptions.ClientError as e:
+                raise InternalError() from e
+            if not _is_compressed(response):
+                return response["Body"].read()
+            response["Body"].close()  # the hint was wrong
+        # the range refers to the decompressed bytes, so the body is decompressed from the start up to the end instead
+        chunks = []
+        size = 0
+        for chunk in self.iter_chunks(id_):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= end:
+                break
+        return b"".join(chunks)[start:end]
 
-    def get_url(self, id_: str):
+    def _is_stored_compressed(self, id_: str) -> bool:
         try:
-            response = self._client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": self._bucket, "Key": id_},
-                ExpiresIn=60*60*24,
-            )
-            return response
+            response = self._client.head_object(Bucket=self._bucket, Key=id_)
         except botocore.exceptions.ClientError as e:
             raise InternalError() from e
+        return _is_compressed(response)
 
-    def put(self, id_: str, body):
+    def iter_chunks(self, id_: str, chunk_size: int = None) -> typing.Generator[bytes, None, None]:
+        # streams the object, only one chunk is held in memory at a time
         try:
-            response = self._client.put_object(
+            response = self._client.get_object(
                 Bucket=self._bucket,
                 Key=id_,
-                Body=body,
             )
         except botocore.exceptions.ClientError as e:
             raise InternalError() from e
+        chunks = response["Body"].iter_chunks(chunk_size or self.default_chunk_size)
+        if not _is_compressed(response):
+            yield from chunks
+            return
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)  # gzip header
+        for chunk in chunks:
+            chunk = decompressor.decompress(chunk)
+            if chunk:
+                yield chunk
+        chunk = decompressor.flush()
+        if chunk:
+            yield chunk
+
+    def exists(self, id_: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self._bucket, Key=id_)
+            return True
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise InternalError() from e
+
+    def get_body(self, id_: str, compressed: bool = None) -> ObjectBody:
+        return ObjectBody(self, id_, compressed)
+
+    def get_url(self, id_: str, version: typing.Any = None):
+        # version -> identifies the body if it is replaced under the same id
+        # The same url is handed out until it is refreshed, so that clients can cache the body
+        cache_key = (self._bucket, id_, version)
+        url = self.url_cache.get(cache_key)
+        if url:
+            return url
+        try:
+            url = self._client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self._bucket, "Key": id_},
+                ExpiresIn=self.url_lifetime,
+            )
+        except botocore.exceptions.ClientError as e:
+            raise InternalError() from e
+        self.url_cache.put(cache_key, url)
+        return url
+
+    def put(self, id_: str, body, compress: bool = False):
+        # compress -> only bodies that are in memory are compressed, file-like bodies are stored as they are
+        if isinstance(body, str):
+            body = body.encode()
+        extra_args = {}
+        if compress and isinstance(body, (bytes, bytearray)):
+            # mtime 0 -> equal bodies are compressed to equal bytes
+            body = gzip.compress(body, compresslevel=self.compression_level, mtime=0)
+            extra_args["ContentEncoding"] = self.compression_encoding
+        if isinstance(body, (bytes, bytearray)) and len(body) <= self.multipart_threshold:
+            try:
+                response = self._client.put_object(
+                    Bucket=self._bucket,
+                    Key=id_,
+                    Body=body,
+                    **extra_args,
+                )
+            except botocore.exceptions.ClientError as e:
+                raise InternalError() from e
+        else:
+            # the size of file-like bodies is not known upfront, the transfer manager decides by reading them
+            self._put_multipart(id_, io.BytesIO(body) if isinstance(body, (bytes, bytearray)) else body, extra_args)
+
+    def _put_multipart(self, id_: str, fileobj: typing.BinaryIO, extra_args: typing.Dict = None):
+        config = boto3.s3.transfer.TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_part_size,
+            max_concurrency=self.multipart_max_concurrency,
+        )
+        try:
+            self._client.upload_fileobj(fileobj, self._bucket, id_, ExtraArgs=extra_args or None, Config=config)
+        except (botocore.exceptions.ClientError, boto3.exceptions.S3UploadFailedError) as e:
+            raise InternalError() from e
 
     def delete(self, id_: str):
         try:
@@ -46,5 +207,33 @@ class ObjectStorage:
             raise InternalError() from e
 
 
+class ObjectBody:
+    """
+    Body of a stored object that is read lazily, nothing is downloaded until (a part of) it is read.
+    """
+
+    def __init__(self, object_storage: ObjectStorage, id_: str, compressed: bool = None):
+        # compressed -> whether the body is stored compressed, None if not known
+        self._object_storage = object_storage
+        self._id = id_
+        self._compressed = compressed
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def read_range(self, start: int, end: int) -> bytes:
+        return self._object_storage.get_range(self._id, start, end, self._compressed)
+
+    def iter_chunks(self, chunk_size: int = None) -> typing.Generator[bytes, None, None]:
+        return self._object_storage.iter_chunks(self._id, chunk_size)
+
+    def __repr__(self):
+        return f"ObjectBody(id='{self._id}')"
+
+
+def _is_compressed(response: typing.Dict) -> bool:
+    return response.get("ContentEncoding") == ObjectStorage.compression_encoding
+
+
 class InternalError(Exception):
     pass
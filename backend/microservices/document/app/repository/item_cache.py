@@ -0,0 +1,45 @@
+from typing import Dict, Tuple, Optional, OrderedDict
+import collections
+import threading
+
+
+class ItemCache:
+    """
+    Size-bounded LRU cache of db items that lives as long as the process, so that warm lambda containers can reuse the
+    items of earlier invocations. A cached item is only returned for the revision it was cached with - the caller has
+    to read the current revision (cheaply) to validate it.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._items: OrderedDict[Tuple[str, str], Tuple[str, Dict]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_size > 0
+
+    def get(self, key: Tuple[str, str], revision: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._items.get(key)
+            if not entry or entry[0] != revision:
+                return None
+            self._items.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Tuple[str, str], revision: Optional[str], item: Dict):
+        if not self.enabled or not revision:
+            return  # items without a revision can not be validated
+        with self._lock:
+            self._items[key] = (revision, item)
+            self._items.move_to_end(key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: Tuple[str, str]):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Dict
 import os
 import shutil
 import subprocess
@@ -7,6 +7,8 @@ import aws_cdk.aws_lambda as lambda_
 import aws_cdk.aws_dynamodb as dynamodb
 import aws_cdk.aws_s3 as s3
 import aws_cdk.aws_sns as sns
+import aws_cdk.aws_sqs as sqs
+import aws_cdk.aws_lambda_event_sources as lambda_event_sources
 import aws_cdk.aws_logs as logs
 
 
@@ -25,6 +27,34 @@ class DocumentServiceStack(core.Stack):
             fifo=True,
         )
 
+        # events that are too large to be published (see NotificationManager)
+        self.document_event_claim_check_s3_bucket = s3.Bucket(
+            self,
+            "DocumentEventClaimCheck",
+            bucket_name="DocumentEventClaimCheck",
+            lifecycle_rules=[s3.LifecycleRule(expiration=core.Duration.days(14))],
+        )
+
+        # jobs to write changed link previews to the referencing documents (see document_link_preview_propagate)
+        link_preview_propagation_sqs_queue = sqs.Queue(
+            self,
+            "LinkPreviewPropagation",
+            queue_name="LinkPreviewPropagation.fifo",
+            fifo=True,
+            visibility_timeout=core.Duration.minutes(2),
+            # a job that keeps failing would otherwise block the later jobs of its document
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=5,
+                queue=sqs.Queue(
+                    self,
+                    "LinkPreviewPropagationDeadLetter",
+                    queue_name="LinkPreviewPropagationDeadLetter.fifo",
+                    fifo=True,
+                    retention_period=core.Duration.days(14),
+                ),
+            ),
+        )
+
         document_dynamodb_table = dynamodb.Table(
             self,
             "Document",
@@ -64,6 +94,7 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_create_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_create_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_create_lambda_function)
         document_content_s3_bucket.grant_write(self.document_create_lambda_function)
 
@@ -80,6 +111,8 @@ class DocumentServiceStack(core.Stack):
             self,
             "document_get",
             layers=controller_lambda_layers,
+            # read heavy, warm containers are served from memory mostly
+            environment={"DocumentRepositoryItemCacheSize": "1000"},
         )
         document_dynamodb_table.grant_read_data(self.document_get_lambda_function)
         document_content_s3_bucket.grant_read(self.document_get_lambda_function)
@@ -97,6 +130,7 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_highlight_create_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_highlight_create_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_highlight_create_lambda_function)
 
         self.document_highlight_delete_lambda_function = ControllerLambdaFunction(
@@ -105,6 +139,7 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_highlight_delete_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_highlight_delete_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_highlight_delete_lambda_function)
 
         self.document_highlight_note_lambda_function = ControllerLambdaFunction(
@@ -113,6 +148,7 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_highlight_note_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_highlight_note_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_highlight_note_lambda_function)
 
         self.document_link_create_lambda_function = ControllerLambdaFunction(
@@ -121,6 +157,7 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_link_create_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_link_create_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_link_create_lambda_function)
 
         self.document_link_delete_lambda_function = ControllerLambdaFunction(
@@ -129,15 +166,32 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_link_delete_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_link_delete_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_link_delete_lambda_function)
 
         self.document_rename_lambda_function = ControllerLambdaFunction(
             self,
             "document_rename",
             layers=controller_lambda_layers,
+            environment={"LinkPreviewPropagationSQSQueueURL": link_preview_propagation_sqs_queue.queue_url},
         )
         self.document_event_sns_topic.grant_publish(self.document_rename_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_rename_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_rename_lambda_function)
+        link_preview_propagation_sqs_queue.grant_send_messages(self.document_rename_lambda_function)
+
+        self.document_link_preview_propagate_lambda_function = ControllerLambdaFunction(
+            self,
+            "document_link_preview_propagate",
+            layers=controller_lambda_layers,
+            timeout=core.Duration.minutes(1),
+        )
+        self.document_link_preview_propagate_lambda_function.add_event_source(
+            lambda_event_sources.SqsEventSource(link_preview_propagation_sqs_queue, batch_size=10)
+        )
+        document_dynamodb_table.grant_read_write_data(self.document_link_preview_propagate_lambda_function)
+        self.document_event_sns_topic.grant_publish(self.document_link_preview_propagate_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_link_preview_propagate_lambda_function)
 
         self.document_tag_add_lambda_function = ControllerLambdaFunction(
             self,
@@ -145,6 +199,7 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_tag_add_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_tag_add_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_tag_add_lambda_function)
 
         self.document_tag_remove_lambda_function = ControllerLambdaFunction(
@@ -153,6 +208,7 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_tag_remove_lambda_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_tag_remove_lambda_function)
         document_dynamodb_table.grant_read_write_data(self.document_tag_remove_lambda_function)
 
         self.document_update_content_function = ControllerLambdaFunction(
@@ -161,13 +217,15 @@ class DocumentServiceStack(core.Stack):
             layers=controller_lambda_layers,
         )
         self.document_event_sns_topic.grant_publish(self.document_update_content_function)
+        self.document_event_claim_check_s3_bucket.grant_put(self.document_update_content_function)
         document_dynamodb_table.grant_read_write_data(self.document_update_content_function)
         document_content_s3_bucket.grant_write(self.document_update_content_function)
 
 
 class ControllerLambdaFunction(lambda_.Function):
 
-    def __init__(self, scope: DocumentServiceStack, controller_name: str, layers: List[lambda_.LayerVersion]):
+    def __init__(self, scope: DocumentServiceStack, controller_name: str, layers: List[lambda_.LayerVersion],
+                 environment: Dict[str, str] = None, timeout: core.Duration = None):
         super().__init__(
             scope,
             id=to_camel_case(controller_name),
@@ -176,8 +234,11 @@ class ControllerLambdaFunction(lambda_.Function):
             runtime=lambda_.Runtime.PYTHON_3_8,
             environment={
                 "DocumentEventSNSTopicARN": scope.document_event_sns_topic.topic_arn,
+                "DocumentEventClaimCheckS3BucketName": scope.document_event_claim_check_s3_bucket.bucket_name,
+                **(environment or {}),
             },
             memory_size=256,
+            timeout=timeout,
             layers=layers,
             log_retention=logs.RetentionDays.FIVE_DAYS,
         )
@@ -1,31 +1,50 @@
 import typing
+import types
 import abc
+import sys
 import uuid
+from .lazy import Lazy
 
 
 class Id:
 
+    # Ids are equal to (and hash like) their string value, so they can be looked up by strings
+
+    __slots__ = ("_value", "_hash")
+
     def __init__(self, value: str = None):
         if value is None:
             value = uuid.uuid4().hex
-        self._value = value
+        # ids are referenced by many entities (and items), interned they share one string
+        self._value = sys.intern(value)
+        self._hash = hash(self._value)
 
     @property
     def value(self):
         return self._value
 
     def __eq__(self, other):
-        return str(self) == other
+        if isinstance(other, Id):
+            return self._value == other._value
+        return self._value == other
 
     def __hash__(self):
-        return hash(self.value)
+        return self._hash
+
+    def __str__(self):
+        return self._value
 
     def __repr__(self):
-        return self.value
+        return self._value
 
 
 class Entity(abc.ABC):
 
+    # Entities (and all of their bases) are slotted, so that the many links and highlights of a workspace stay small.
+    # Only one base of a class can declare slots, so the slots of the attributes of most bases (like _id) are declared
+    # by the concrete classes.
+    __slots__ = ()
+
     def __init__(self, id_: Id):
         self._id = id_
 
@@ -47,6 +66,8 @@ class Entity(abc.ABC):
         pass
 
     def __eq__(self, other):
+        if isinstance(other, Lazy):  # checks the type of the wrapper, the id is known without loading the entity
+            return self.id == other.id
         if not isinstance(other, Entity):
             raise NotImplementedError()
         return self.id == other.id
@@ -63,14 +84,35 @@ class RootEntity(Entity):
     Life cycle:
     - create
       /init (instantiate)
-    - mutate; behaviour creates child entities
+    - mutate; behaviour creates child entities; changed fields are tracked (also the ones of child entities)
     - delete; delete child entities
     """
 
+    __slots__ = ("_id", "_changes")
+
+    def __init__(self, id_: Id):
+        Entity.__init__(self, id_)
+        self._changes: typing.Set[typing.Tuple] = set()
+
     @abc.abstractmethod
     def create(self, *args, **kwargs):
         pass
 
+    @property
+    def changes(self) -> typing.FrozenSet[typing.Tuple]:
+        # paths of the fields that were mutated since instantiation (/since the changes were cleared),
+        # e.g. ("title",) or ("links", <link id>)
+        return frozenset(self._changes)
+
+    def changed(self, field: str) -> bool:
+        return any(path[0] == field for path in self._changes)
+
+    def _mark_changed(self, *path):
+        self._changes.add(path)
+
+    def clear_changes(self):
+        self._changes.clear()
+
 
 class ChildEntity(Entity):
     """
@@ -84,6 +126,8 @@ class ChildEntity(Entity):
         (-> unregisters on all parents)
     """
 
+    __slots__ = ()
+
     @classmethod
     @abc.abstractmethod
     def prepare(cls, *args, **kwargs):
@@ -106,17 +150,54 @@ class ChildEntity(Entity):
 
 class ChildEntityManager:
 
-    def __init__(self, list_: typing.List[Entity]):
-        self._dict = {entity.id: entity for entity in list_}
+    __slots__ = ("_dict", "_loader", "_unregistered")
+
+    def __init__(self, list_: typing.List[Entity],
+                 loader: typing.Callable[[typing.Optional[Id]], typing.List[Entity]] = None):
+        # loader -> lazily loads the entities that are not in list_, all of them (None) or the one with the given id
+        # Most nodes have no links (or backlinks), the managers of those share one empty mapping
+        self._dict = {entity.id: entity for entity in list_} if list_ else _no_entities
+        self._loader = loader
+        self._unregistered = _no_ids  # before everything was loaded, only allocated when needed
 
     def get_all(self) -> typing.ValuesView:
+        if self._loader:
+            loader, self._loader = self._loader, None
+            for entity in loader(None):
+                if entity.id not in self._dict and entity.id not in self._unregistered:
+                    self._writable_dict()[entity.id] = entity
+        return self._dict.values()
+
+    def get_loaded(self) -> typing.ValuesView:
+        # without loading the remaining entities
         return self._dict.values()
 
     def get(self, id_: Id):
+        if id_ not in self._dict and self._loader and id_ not in self._unregistered:
+            for entity in self._loader(id_):
+                self._writable_dict()[entity.id] = entity
         return self._dict.get(id_)
 
     def register(self, entity: Entity):
-        self._dict[entity.id] = entity
+        self._writable_dict()[entity.id] = entity
+        if self._unregistered:
+            self._unregistered.discard(entity.id)
 
     def unregister(self, id_: Id):
-        del self._dict[id_]
+        if self._loader:
+            if id_ in self._dict:
+                del self._dict[id_]
+            if self._unregistered is _no_ids:
+                self._unregistered = set()
+            self._unregistered.add(id_)
+        else:
+            del self._writable_dict()[id_]
+
+    def _writable_dict(self) -> typing.Dict[Id, Entity]:
+        if self._dict is _no_entities:
+            self._dict = {}
+        return self._dict
+
+
+_no_ids = frozenset()
+_no_entities = types.MappingProxyType({})
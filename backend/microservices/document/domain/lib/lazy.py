@@ -1,5 +1,4 @@
-from typing import Callable, Dict, List
-import abc
+from typing import Callable, Dict, List, Iterable
 import copy
 import operator
 
@@ -20,50 +19,85 @@ class Lazy:
     A wrapper for another class that can be used to delay instantiation of the
     wrapped class. The wrapper can provide properties that are already known
     (without instantiating the wrapped class).
+    A known id is the identity of the wrapped entity: hashing and comparing the
+    wrapper never instantiates the wrapped class then.
     """
 
-    # Avoid infinite recursion when tracing __init__
-    _wrapped = None
+    __slots__ = ("_get_wrapped", "_wrapped", "_known_properties", "_known_non_properties")
 
     def __init__(self, getter: Callable, known_properties: Dict = None, known_non_properties: List = None):
-        # Note: if a subclass overrides __init__(), it will likely need to
-        # override __copy__() and __deepcopy__() as well.
-        self.__dict__['_get_wrapped'] = getter
-        self._wrapped = empty
-        self.__dict__["_known_properties"] = known_properties if known_properties else {}
-        self.__dict__["_known_non_properties"] = known_non_properties if known_non_properties else []
+        # The slots are assigned with object.__setattr__, because __setattr__ is proxied
+        object.__setattr__(self, "_get_wrapped", getter)
+        object.__setattr__(self, "_wrapped", empty)
+        object.__setattr__(self, "_known_properties", known_properties if known_properties else {})
+        object.__setattr__(self, "_known_non_properties", known_non_properties if known_non_properties else ())
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._wrapped is not empty
+
+    @staticmethod
+    def prefetch(lazies: Iterable, batch_loader: Callable[[List["Lazy"]], None]):
+        # Sets up all lazies that are not loaded yet, batch_loader is called once with them before (e.g. to load all of
+        # them with one db request, so that their getters do not have to)
+        pending = [lazy for lazy in lazies if type(lazy) is Lazy and lazy._wrapped is empty]
+        if not pending:
+            return
+        batch_loader(pending)
+        for lazy in pending:
+            if lazy._wrapped is empty:
+                lazy._setup()
 
     def __getattr__(self, name):
-        if self._wrapped is empty and name in self._known_properties:
-            return self._known_properties[name]
-        else:
-            if self._wrapped is empty:
-                if name in self._known_non_properties:
-                    raise AttributeError()
-                self._setup()
-            return getattr(self._wrapped, name)
+        # only called for attributes that are not slots of the wrapper
+        if self._wrapped is empty:
+            if name in self._known_properties:
+                return self._known_properties[name]
+            if name in self._known_non_properties:
+                raise AttributeError(name)
+            self._setup()
+        return getattr(self._wrapped, name)
 
     def __setattr__(self, name, value):
-        if name == "_wrapped":
-            # Assign to __dict__ to avoid infinite __setattr__ loops
-            self.__dict__["_wrapped"] = value
-        else:
-            if self._wrapped is empty:
-                self._setup()
-            setattr(self._wrapped, name, value)
+        if self._wrapped is empty:
+            self._setup()
+        setattr(self._wrapped, name, value)
 
     def __delattr__(self, name):
-        if name == "_wrapped":
-            raise TypeError("Can't delete _wrapped.")
         if self._wrapped is empty:
             if name in self._known_non_properties:
-                raise AttributeError()
+                raise AttributeError(name)
             self._setup()
         delattr(self._wrapped, name)
 
-    @abc.abstractmethod
     def _setup(self):
-        self._wrapped = self._get_wrapped()
+        object.__setattr__(self, "_wrapped", self._get_wrapped())
+
+    def _known_id(self):
+        if self._wrapped is empty:
+            return self._known_properties.get("id", empty)
+        return getattr(self._wrapped, "id", empty)
+
+    def __eq__(self, other):
+        id_ = self._known_id()
+        if id_ is not empty and self._wrapped is empty:
+            if type(other) is Lazy:
+                other_id = other._known_id()
+                if other_id is not empty:
+                    return id_ == other_id
+            else:
+                # entities compare their id with the known id (see lib.Entity)
+                return NotImplemented
+        if self._wrapped is empty:
+            self._setup()
+        return self._wrapped == other
+
+    def __hash__(self):
+        if self._wrapped is empty and "id" in self._known_properties:
+            return hash(self._known_properties["id"])  # like the hash of the wrapped entity
+        if self._wrapped is empty:
+            self._setup()
+        return hash(self._wrapped)
 
     def __reduce__(self):
         # Because we have messed with __class__ below, we confuse pickle as to what
@@ -90,7 +124,7 @@ class Lazy:
         if self._wrapped is empty:
             # If uninitialized, copy the wrapper. Use type(self), not
             # self.__class__, because the latter is proxied.
-            return type(self)(self._get_object, self._known_properties)
+            return type(self)(self._get_wrapped, self._known_properties, self._known_non_properties)
         else:
             # If initialized, return a copy of the wrapped object.
             return copy.copy(self._wrapped)
@@ -99,7 +133,7 @@ class Lazy:
         if self._wrapped is empty:
             # We have to use type(self), not self.__class__, because the
             # latter is proxied.
-            result = type(self)(self._get_object, self._known_properties)
+            result = type(self)(self._get_wrapped, self._known_properties, self._known_non_properties)
             memo[id(self)] = result
             return result
         return copy.deepcopy(self._wrapped, memo)
@@ -114,11 +148,8 @@ class Lazy:
     # Need to pretend to be the wrapped class, for the sake of objects that
     # care about this (especially in equality tests)
     __class__ = property(method_proxy(operator.attrgetter("__class__")))
-    __eq__ = method_proxy(operator.eq)
     __lt__ = method_proxy(operator.lt)
     __gt__ = method_proxy(operator.gt)
-    __ne__ = method_proxy(operator.ne)
-    __hash__ = method_proxy(hash)
 
     # List/Tuple/Dictionary methods support
     __getitem__ = method_proxy(operator.getitem)
@@ -130,6 +161,6 @@ class Lazy:
 
     def __repr__(self):
         if self._wrapped is empty:
-            return f"{type(self).__name__} -> {self._setupfunc}"
+            return f"{type(self).__name__}({self._known_properties})"
         else:
             return repr(self._wrapped)
@@ -13,6 +13,8 @@ ContentLocation = typing.NewType("ContentLocation", str)
 
 class ContentLocatable:
 
+    __slots__ = ("_location",)
+
     def __init__(self, location: ContentLocation):
         self._location = location
 
@@ -18,6 +18,7 @@ class Document(Node, Highlightable, lib.RootEntity):
                  links: typing.List[Link],
                  backlinks: typing.List[Link],
                  highlights: typing.List[Highlight],
+                 backlinks_loader: typing.Callable[[typing.Optional[lib.Id]], typing.List[Link]] = None,
                  ):
         lib.RootEntity.__init__(self, id_)
         self._workspace = workspace
@@ -25,7 +26,7 @@ class Document(Node, Highlightable, lib.RootEntity):
         self._tags = tags
         self._content = content
         self._link_preview = link_preview  # text should always be the document title
-        Node.__init__(self, links, backlinks)
+        Node.__init__(self, links, backlinks, backlinks_loader)
         self._highlights = lib.ChildEntityManager(highlights)
         self._deleted = False
 
@@ -46,6 +47,7 @@ class Document(Node, Highlightable, lib.RootEntity):
 
     def delete(self):
         self._deleted = True
+        self._mark_changed("deleted")
 
     @property
     def deleted(self):
@@ -63,6 +65,7 @@ class Document(Node, Highlightable, lib.RootEntity):
     def title(self, title: str):
         self._title = title
         self._link_preview.text = title
+        self._mark_changed("title")
 
     @property
     def tags(self):
@@ -70,9 +73,11 @@ class Document(Node, Highlightable, lib.RootEntity):
 
     def tag(self, tag: str):
         self._tags.append(tag)
+        self._mark_changed("tags")
 
     def untag(self, tag: str):
         self._tags.remove(tag)
+        self._mark_changed("tags")
 
     @property
     def content(self):
@@ -86,6 +91,7 @@ class Document(Node, Highlightable, lib.RootEntity):
         self._delete_links()
         self._delete_highlights()
         self._content = content
+        self._mark_changed("content")
         self._complete_links(links)
         self._complete_highlights(highlights)
 
@@ -116,9 +122,17 @@ class Document(Node, Highlightable, lib.RootEntity):
 
     def _register_highlight(self, highlight: Highlight):
         self._highlights.register(highlight)
+        self._mark_changed("highlights", highlight.id)
 
     def _unregister_highlight(self, id_: lib.Id):
         self._highlights.unregister(id_)
+        self._mark_changed("highlights", id_)
+
+    def _highlight_changed(self, id_: lib.Id, *path):
+        self._mark_changed("highlights", id_, *path)
+
+    def _node_changed(self, *path):
+        self._mark_changed(*path)
 
     @property
     def link_preview(self):
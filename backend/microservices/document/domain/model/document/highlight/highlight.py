@@ -8,6 +8,8 @@ from ..link import Node, Link, LinkPreview, LinkReference
 
 class Highlight(Node, ContentLocatable, lib.ChildEntity):
 
+    __slots__ = ("_id", "_parent", "_links", "_backlinks", "_note", "_link_preview", "_deleted")
+
     def __init__(self,
                  id_: lib.Id,
                  location: ContentLocation,
@@ -58,12 +60,14 @@ class Highlight(Node, ContentLocatable, lib.ChildEntity):
     def make_note(self, note: Content, links: typing.List[Link] = None):
         self._delete_links()
         self._note = note
+        self._node_changed("note")
         if links:
             self._complete_links(links)
 
     def delete_note(self):
         self._delete_links()
         self._note = None
+        self._node_changed("note")
 
     @property
     def note(self):
@@ -84,6 +88,10 @@ class Highlight(Node, ContentLocatable, lib.ChildEntity):
             raise lib.DomainError(f"{self} can't be a link source.")
         super()._register_link(link)
 
+    def _node_changed(self, *path):
+        if self.parent:  # otherwise the parent is marked when the highlight is completed
+            self.parent._highlight_changed(self.id, *path)
+
     @property
     def link_preview(self):
         return self._link_preview
@@ -103,6 +111,8 @@ class HighlightIsLinkSourcePolicy:
 
 class Highlightable(LinkReference):
 
+    __slots__ = ()
+
     @abc.abstractmethod
     def _register_highlight(self, highlight: Highlight):
         pass
@@ -110,3 +120,8 @@ class Highlightable(LinkReference):
     @abc.abstractmethod
     def _unregister_highlight(self, id_: lib.Id):
         pass
+
+    @abc.abstractmethod
+    def _highlight_changed(self, id_: lib.Id, *path):
+        # called by a highlight when one of its fields changed
+        pass
@@ -9,6 +9,8 @@ from .policy import TargetIsInSameWorkspaceAsSourcePolicy
 
 class Link(ContentLocatable, lib.ChildEntity):
 
+    __slots__ = ("_id", "_source", "_target", "_source_preview", "_target_preview", "_deleted")
+
     def __init__(self,
                  id_: lib.Id,
                  location: ContentLocation,
@@ -81,12 +83,15 @@ class Link(ContentLocatable, lib.ChildEntity):
 
 @dataclasses.dataclass
 class LinkPreview:
+    __slots__ = ("text", "parent")
     text: typing.Optional[str]
     parent: typing.Optional[LinkPreview]
 
 
 class LinkReference(abc.ABC):
 
+    __slots__ = ()
+
     @property
     @abc.abstractmethod
     def link_preview(self) -> LinkPreview:
@@ -100,6 +105,8 @@ class LinkReference(abc.ABC):
 
 class LinkSource(LinkReference):
 
+    __slots__ = ()
+
     @property
     @abc.abstractmethod
     def links(self) -> typing.ValuesView[Link]:
@@ -118,6 +125,8 @@ class LinkSource(LinkReference):
 
 class LinkTarget(LinkReference):
 
+    __slots__ = ()
+
     @property
     @abc.abstractmethod
     def backlinks(self) -> typing.ValuesView[Link]:
@@ -6,9 +6,13 @@ from .link import Link, LinkPreview, LinkSource, LinkTarget
 
 class Node(LinkSource, LinkTarget):
 
-    def __init__(self, links: typing.List[Link] = None, backlinks: typing.List[Link] = None):
+    __slots__ = ()  # _links and _backlinks are declared by the concrete classes, see lib.Entity
+
+    def __init__(self, links: typing.List[Link] = None, backlinks: typing.List[Link] = None,
+                 backlinks_loader: typing.Callable[[typing.Optional[lib.Id]], typing.List[Link]] = None):
+        # backlinks_loader -> lazily loads the backlinks that are not passed (see lib.ChildEntityManager)
         self._links = lib.ChildEntityManager(links if links else [])
-        self._backlinks = lib.ChildEntityManager(backlinks if backlinks else [])
+        self._backlinks = lib.ChildEntityManager(backlinks if backlinks else [], backlinks_loader)
 
     @property
     def links(self) -> typing.Optional[typing.ValuesView[Link]]:
@@ -19,9 +23,11 @@ class Node(LinkSource, LinkTarget):
 
     def _register_link(self, link: Link):
         self._links.register(link)
+        self._node_changed("links", link.id)
 
     def _unregister_link(self, id_: lib.Id):
         self._links.unregister(id_)
+        self._node_changed("links", id_)
 
     def _complete_links(self, links: typing.List[Link]):
         for link in links:
@@ -39,11 +45,23 @@ class Node(LinkSource, LinkTarget):
     def get_backlink(self, id_: lib.Id) -> Link:
         return self._backlinks.get(id_)
 
+    @property
+    def loaded_backlinks(self) -> typing.ValuesView[Link]:
+        # without lazily loading the remaining backlinks
+        return self._backlinks.get_loaded()
+
     def _register_backlink(self, link: Link):
         self._backlinks.register(link)
+        self._node_changed("backlinks", link.id)
 
     def _unregister_backlink(self, id_: lib.Id):
         self._backlinks.unregister(id_)
+        self._node_changed("backlinks", id_)
+
+    @abc.abstractmethod
+    def _node_changed(self, *path):
+        # called when the links or backlinks changed, to mark the root entity
+        pass
 
     @property
     @abc.abstractmethod
@@ -2,4 +2,4 @@ from domain.lib import Id
 
 
 class Workspace(Id):
-    pass
+    __slots__ = ()
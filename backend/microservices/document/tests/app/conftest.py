@@ -6,6 +6,8 @@ from tests.app.mocks.repository_infrastructure.db import DocumentRepositoryDB
 from tests.app.mocks.repository_infrastructure.object_storage import DocumentRepositoryObjectStorage
 import app.notification
 from tests.app.mocks.notification import NotificationManager
+import app.propagation
+from tests.app.mocks.propagation import LinkPreviewPropagationQueue
 from domain.model.document import Document, Content, ContentLocation, Workspace
 from app import middleware
 
@@ -15,9 +17,12 @@ def MockedDBForDocumentRepository(monkeypatch):
     DocumentRepositoryDB._table = {}
     DocumentRepositoryDB.count_query_operations = 0
     DocumentRepositoryDB.count_get_operations = 0
+    DocumentRepositoryDB.count_batch_get_operations = 0
     DocumentRepositoryDB.count_put_operations = 0
     DocumentRepositoryDB.count_update_operations = 0
     DocumentRepositoryDB.count_delete_operations = 0
+    DocumentRepositoryDB.count_transact_write_operations = 0
+    DocumentRepositoryDB.count_increment_operations = 0
     monkeypatch.setattr(db, "DocumentRepositoryDB", DocumentRepositoryDB)
     return DocumentRepositoryDB
 
@@ -29,6 +34,7 @@ def MockedObjectStorageForDocumentRepository(monkeypatch):
     DocumentRepositoryObjectStorage.count_get_url_operations = 0
     DocumentRepositoryObjectStorage.count_put_operations = 0
     DocumentRepositoryObjectStorage.count_delete_operations = 0
+    DocumentRepositoryObjectStorage.count_exists_operations = 0
     monkeypatch.setattr(object_storage, "DocumentRepositoryObjectStorage", DocumentRepositoryObjectStorage)
     return DocumentRepositoryObjectStorage
 
@@ -44,7 +50,16 @@ def MockedMiddlewareWithoutErrorCatching(monkeypatch):
 
 @pytest.fixture(autouse=True)
 def MockedEvent(monkeypatch):
+    NotificationManager.saved_events = []
     monkeypatch.setattr(app.notification, "NotificationManager", NotificationManager)
+    return NotificationManager
+
+
+@pytest.fixture(autouse=True)
+def MockedLinkPreviewPropagationQueue(monkeypatch):
+    LinkPreviewPropagationQueue.jobs = []
+    monkeypatch.setattr(app.propagation, "LinkPreviewPropagationQueue", LinkPreviewPropagationQueue)
+    return LinkPreviewPropagationQueue
 
 
 @pytest.fixture
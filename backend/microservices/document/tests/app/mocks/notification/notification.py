@@ -1,10 +1,25 @@
-from app.interface import DocumentModel, DocumentIdentifierModel
+from typing import ContextManager, List
+import contextlib
+from app.interface import DocumentSavedEventModel, DocumentIdentifierModel
 
 
 class NotificationManager:
 
-    def document_saved(self, document_model: DocumentModel):
+    saved_events: List[DocumentSavedEventModel]
+
+    def __init__(self, buffered: bool = False):
         pass
 
+    @classmethod
+    @contextlib.contextmanager
+    def use(cls) -> ContextManager["NotificationManager"]:
+        yield cls(buffered=True)
+
+    def flush(self):
+        pass
+
+    def document_saved(self, event_model: DocumentSavedEventModel):
+        NotificationManager.saved_events.append(event_model)
+
     def document_deleted(self, identifier_model: DocumentIdentifierModel):
         pass
@@ -0,0 +1 @@
+from .propagation import LinkPreviewPropagationQueue
@@ -0,0 +1,10 @@
+from typing import List
+from app.interface import DocumentIdentifierModel
+
+
+class LinkPreviewPropagationQueue:
+
+    jobs: List[DocumentIdentifierModel] = []
+
+    def enqueue(self, document_identifier_model: DocumentIdentifierModel):
+        self.jobs.append(document_identifier_model)
@@ -1,27 +1,57 @@
-from typing import Dict, Any, Tuple, Optional
-from app.repository.infrastructure.db import ItemKey, ExpectationNotMet
+from typing import Dict, Any, Tuple, Optional, List
+import math
+import copy
+from app.repository.infrastructure.db import ItemKey, Put, Update, ExpectationNotMet
 
 
 class DocumentRepositoryDB:
 
     _table: Dict[Tuple[str, Optional[str]], Any]
 
+    max_transaction_size = 100
+
     count_query_operations: int
 
-    def query_items(self, key: ItemKey):
-        DocumentRepositoryDB.count_query_operations += 1
-        items = []
-        for found_key, found_item in DocumentRepositoryDB._table.items():
-            if found_key[0] == key.value:
-                items.append(found_item)
-        return items
+    def iter_query_pages(self, key: ItemKey, page_size: int = None, start_key: Dict = None, projection: List = None):
+        items = sorted((found_item for found_key, found_item in DocumentRepositoryDB._table.items()
+                        if found_key[0] == key.value
+                        and (not key.secondary or str(found_key[1]).startswith(str(key.secondary.value)))),
+                       key=lambda found_item: str(found_item["id"]))
+        if start_key:
+            items = [item for item in items if str(item["id"]) > start_key["id"]]
+        while True:
+            DocumentRepositoryDB.count_query_operations += 1
+            page, items = (items[:page_size], items[page_size:]) if page_size else (items, [])
+            last_key = {"workspace": str(page[-1]["workspace"]), "id": str(page[-1]["id"])} if items else None
+            if projection:
+                page = [self._project(item, projection) for item in page]
+            yield page, last_key
+            if not last_key:
+                return
+
+    def query_items(self, key: ItemKey, projection: List = None):
+        return [item for items, _ in self.iter_query_pages(key, projection=projection) for item in items]
 
     count_get_operations: int
 
-    def get_item(self, key: ItemKey, count=True):
+    def get_item(self, key: ItemKey, count=True, projection: List = None, consistent: bool = False):
         if count:
             DocumentRepositoryDB.count_get_operations += 1
-        return DocumentRepositoryDB._table.get(self._key_for_table(key))
+        item = DocumentRepositoryDB._table.get(self._key_for_table(key))
+        if item and projection:
+            return self._project(item, projection)
+        return item
+
+    count_batch_get_operations: int
+
+    def batch_get_items(self, keys: List[ItemKey], projection: List = None, consistent: bool = False):
+        DocumentRepositoryDB.count_batch_get_operations += math.ceil(len(keys) / 100)
+        items = []
+        for key in keys:
+            item = self.get_item(key, count=False, projection=projection)
+            if item:
+                items.append(item)
+        return items
 
     count_put_operations: int
 
@@ -30,8 +60,9 @@ class DocumentRepositoryDB:
             expect_if_item_exists = {}
         if count:
             DocumentRepositoryDB.count_put_operations += 1
-        assert key.name in item
-        assert not key.secondary or key.secondary.name in item
+        # dynamodb puts the item under the key attributes of the item
+        assert str(item[key.name]) == str(key.value)
+        assert not key.secondary or str(item[key.secondary.name]) == str(key.secondary.value)
         existing = self.get_item(key, count=False)
         if existing:
             for name, value in expect_if_item_exists.items():
@@ -41,24 +72,109 @@ class DocumentRepositoryDB:
 
     count_update_operations: int
 
-    def update(self, key: ItemKey, item: Dict, old_item: Dict):
-        DocumentRepositoryDB.count_update_operations += 1
-        self.put(key, item, count=False)
+    def update(self, key: ItemKey, item: Dict, old_item: Dict, changed_paths: List = None, add: Dict = None,
+               count=True):
+        add = {name: by for name, by in (add or {}).items() if by}
+        if changed_paths == [] and not add:
+            return  # nothing to update, no request is made
+        if count:
+            DocumentRepositoryDB.count_update_operations += 1
+        existing = self.get_item(key, count=False)
+        if not existing:
+            raise ExpectationNotMet()
+        if changed_paths is None:
+            updated = {name: value for name, value in item.items() if name not in add}
+            updated.update({name: existing[name] for name in add if name in existing})
+        else:  # only the changed attributes are written
+            updated = self._apply_changed_paths(existing, item, [path for path in changed_paths if path[0] not in add])
+        for name, by in add.items():  # atomically
+            updated[name] = updated.get(name, 0) + by
+        self.put(key, updated, count=False)
 
     count_delete_operations: int
 
-    def delete(self, key: ItemKey):
-        DocumentRepositoryDB.count_delete_operations += 1
+    def delete(self, key: ItemKey, expect: Dict = None, count=True):
+        if count:
+            DocumentRepositoryDB.count_delete_operations += 1
+        existing = self.get_item(key, count=False)
+        for name, value in (expect or {}).items():
+            if not existing or existing.get(name) != value:
+                raise ExpectationNotMet()
         if self._key_for_table(key) in self._table:
             del DocumentRepositoryDB._table[self._key_for_table(key)]
 
+    count_increment_operations: int
+
+    def increment(self, key: ItemKey, name: str, by: int, set_if_not_exists: Dict = None,
+                  expect_item_exists: bool = False):
+        DocumentRepositoryDB.count_increment_operations += 1
+        existing = self.get_item(key, count=False)
+        if expect_item_exists and not existing:
+            raise ExpectationNotMet()
+        key_attributes = {key.name: key.value, key.secondary.name: key.secondary.value}
+        item = {**(set_if_not_exists or {}), **(existing or key_attributes)}
+        item[name] = item.get(name, 0) + by
+        self.put(key, item, count=False)
+        return copy.deepcopy(item)
+
+    def write(self, operation):
+        if isinstance(operation, Put):
+            self.put(*operation)
+        elif isinstance(operation, Update):
+            self.update(*operation)
+        else:
+            self.delete(*operation)
+
+    count_transact_write_operations: int
+
+    def transact_write(self, operations: List):
+        DocumentRepositoryDB.count_transact_write_operations += 1
+        for operation in operations:  # check all conditions before writing anything
+            existing = self.get_item(operation.key, count=False)
+            if isinstance(operation, Put) and existing:
+                for name, value in (operation.expect_if_item_exists or {}).items():
+                    if existing.get(name) != value:
+                        raise ExpectationNotMet()
+            if isinstance(operation, Update) and not existing:
+                raise ExpectationNotMet()
+        for operation in operations:
+            if isinstance(operation, Put):
+                self.put(operation.key, operation.item, count=False)
+            elif isinstance(operation, Update):
+                self.update(*operation, count=False)
+            else:
+                self.delete(operation.key, count=False)
+
     @staticmethod
-    def test_operations_count(query=0, get=0, put=0, update=0, delete=0):
+    def test_operations_count(query=0, get=0, batch_get=0, put=0, update=0, delete=0, transact_write=0, increment=0):
         assert DocumentRepositoryDB.count_query_operations == query
         assert DocumentRepositoryDB.count_get_operations == get
+        assert DocumentRepositoryDB.count_batch_get_operations == batch_get
         assert DocumentRepositoryDB.count_put_operations == put
         assert DocumentRepositoryDB.count_update_operations == update
         assert DocumentRepositoryDB.count_delete_operations == delete
+        assert DocumentRepositoryDB.count_transact_write_operations == transact_write
+        assert DocumentRepositoryDB.count_increment_operations == increment
+
+    @staticmethod
+    def _apply_changed_paths(existing: Dict, item: Dict, changed_paths: List):
+        updated = copy.deepcopy(existing)
+        for path in changed_paths:
+            stored, new, name = updated, item, path[0]
+            for name in path:
+                if name not in stored or name not in new or name == path[-1] \
+                        or type(stored[name]) is not dict or type(new[name]) is not dict:
+                    break
+                stored, new = stored[name], new[name]
+            if name in new:
+                stored[name] = copy.deepcopy(new[name])
+            else:
+                stored.pop(name, None)
+        return updated
+
+    @staticmethod
+    def _project(item: Dict, projection: List):
+        return {name: item[name] for name in projection if name in item}
 
     @staticmethod
     def _key_for_table(key: ItemKey):
@@ -1,4 +1,5 @@
 from typing import Dict, Any
+from app.repository.infrastructure.object_storage import ObjectBody
 
 
 class DocumentRepositoryObjectStorage:
@@ -11,15 +12,35 @@ class DocumentRepositoryObjectStorage:
         DocumentRepositoryObjectStorage.count_get_operations += 1
         return DocumentRepositoryObjectStorage._storage.get(id_)
 
+    def get_range(self, id_: str, start: int, end: int, compressed: bool = None):
+        DocumentRepositoryObjectStorage.count_get_operations += 1
+        return self._as_bytes(DocumentRepositoryObjectStorage._storage[id_])[start:end]
+
+    def iter_chunks(self, id_: str, chunk_size: int = None):
+        DocumentRepositoryObjectStorage.count_get_operations += 1
+        body = self._as_bytes(DocumentRepositoryObjectStorage._storage[id_])
+        chunk_size = chunk_size or 1024 * 1024
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    count_exists_operations: int
+
+    def exists(self, id_: str):
+        DocumentRepositoryObjectStorage.count_exists_operations += 1
+        return id_ in DocumentRepositoryObjectStorage._storage
+
+    def get_body(self, id_: str, compressed: bool = None):
+        return ObjectBody(self, id_, compressed)
+
     count_get_url_operations: int
 
-    def get_url(self, id_: str):
+    def get_url(self, id_: str, version=None):
         DocumentRepositoryObjectStorage.count_get_url_operations += 1
         return "url"  # important, tests depends on this!
 
     count_put_operations: int
 
-    def put(self, id_: str, body):
+    def put(self, id_: str, body, compress: bool = False):
         DocumentRepositoryObjectStorage.count_put_operations += 1
         DocumentRepositoryObjectStorage._storage[id_] = body
 
@@ -31,8 +52,13 @@ class DocumentRepositoryObjectStorage:
             del DocumentRepositoryObjectStorage._storage[id_]
 
     @staticmethod
-    def test_operations_count(get=0, get_url=0, put=0, delete=0):
+    def _as_bytes(body):
+        return body.encode() if isinstance(body, str) else body
+
+    @staticmethod
+    def test_operations_count(get=0, get_url=0, put=0, delete=0, exists=0):
         assert DocumentRepositoryObjectStorage.count_get_operations == get
         assert DocumentRepositoryObjectStorage.count_get_url_operations == get_url
         assert DocumentRepositoryObjectStorage.count_put_operations == put
         assert DocumentRepositoryObjectStorage.count_delete_operations == delete
+        assert DocumentRepositoryObjectStorage.count_exists_operations == exists
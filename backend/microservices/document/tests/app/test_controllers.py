@@ -1,3 +1,7 @@
+import pytest
+from app.middleware import BadOperationUserError
+
+
 # TODO test events
 
 
@@ -92,6 +96,52 @@ def test_can_get_all_documents_in_workspace(lambda_context,
     assert controller_other_created_document in response["documents"]
 
 
+def test_can_get_document_summaries_in_workspace(lambda_context,
+                                                controller_created_document, controller_other_created_document,
+                                                MockedMiddlewareWithoutErrorCatching):
+    from app.controllers.document_get_all_in_workspace.lambda_function import handler
+    event = {
+        "workspace": controller_created_document["workspace"],
+        "summary": True,
+    }
+    response = handler(event.copy(), lambda_context)
+
+    summary_attributes = ["id", "workspace", "title", "tags", "contentType", "version"]
+    for document in [controller_created_document, controller_other_created_document]:
+        assert {attribute: document[attribute] for attribute in summary_attributes} in response["documents"]
+    assert response["nextToken"] is None
+
+
+def test_can_page_through_documents_in_workspace(lambda_context,
+                                                 controller_created_document, controller_other_created_document,
+                                                 MockedMiddlewareWithoutErrorCatching):
+    from app.controllers.document_get_all_in_workspace.lambda_function import handler
+    event = {
+        "workspace": controller_created_document["workspace"],
+        "pageSize": 1,
+    }
+    first_response = handler(event.copy(), lambda_context)
+    event["nextToken"] = first_response["nextToken"]
+    second_response = handler(event.copy(), lambda_context)
+
+    assert len(first_response["documents"]) == 1
+    assert len(second_response["documents"]) == 1
+    assert second_response["nextToken"] is None
+    assert {first_response["documents"][0]["id"], second_response["documents"][0]["id"]} \
+           == {controller_created_document["id"], controller_other_created_document["id"]}
+
+
+def test_get_all_documents_in_workspace_rejects_invalid_next_token(lambda_context, controller_created_document,
+                                                                   MockedMiddlewareWithoutErrorCatching):
+    from app.controllers.document_get_all_in_workspace.lambda_function import handler
+    event = {
+        "workspace": controller_created_document["workspace"],
+        "nextToken": "invalid",
+    }
+    with pytest.raises(BadOperationUserError):
+        handler(event.copy(), lambda_context)
+
+
 def test_can_create_document_highlight(lambda_context, MockedMiddlewareWithoutErrorCatching,
                                        controller_created_document):
     from app.controllers.document_highlight_create.lambda_function import handler
@@ -264,6 +314,54 @@ def test_can_rename_document(lambda_context, MockedMiddlewareWithoutErrorCatchin
     assert controller_created_document == response
 
 
+def test_rename_propagates_link_preview_in_background(lambda_context, MockedMiddlewareWithoutErrorCatching,
+                                                     MockedLinkPreviewPropagationQueue, MockedEvent,
+                                                     controller_created_document, controller_other_created_document):
+    from app.controllers.document_link_create.lambda_function import handler as link_create_handler
+    from app.controllers.document_rename.lambda_function import handler as rename_handler
+    from app.controllers.document_get.lambda_function import handler as get_handler
+    from app.controllers.document_link_preview_propagate.lambda_function import handler
+    link_create_handler({
+        "documentId": controller_other_created_document["id"],
+        "workspace": "MyWorkspace",
+        "location": "6:15",
+        "targetDocumentId": controller_created_document["id"],
+    }, lambda_context)
+    rename_handler({
+        "documentId": controller_created_document["id"],
+        "workspace": "MyWorkspace",
+        "title": "NewTitle",
+    }, lambda_context)
+    get_event = {"documentId": controller_other_created_document["id"], "workspace": "MyWorkspace"}
+
+    assert get_handler(get_event.copy(), lambda_context)["links"][0]["targetDocumentPreviewText"] == "MyDocument"
+
+    event = {"Records": [{
+        "messageId": str(i),
+        "receiptHandle": "receipt-handle",
+        "body": job.json(),
+        "attributes": {
+            "ApproximateReceiveCount": "1",
+            "ApproximateFirstReceiveTimestamp": "1545082649185",
+            "SenderId": "AIDAIENQZJOLO23YVJ4VO",
+            "SentTimestamp": "1545082649183",
+        },
+        "messageAttributes": {},
+        "md5OfBody": "e4e68fb7bd0e697a0ae8f1bb342846b3",
+        "eventSource": "aws:sqs",
+        "eventSourceARN": "arn:aws:sqs:eu-west-1:809313241:LinkPreviewPropagation.fifo",
+        "awsRegion": "eu-west-1",
+    } for i, job in enumerate(MockedLinkPreviewPropagationQueue.jobs)]}
+    MockedEvent.saved_events = []
+    handler(event, lambda_context)
+
+    assert len(event["Records"]) == 1
+    assert get_handler(get_event.copy(), lambda_context)["links"][0]["targetDocumentPreviewText"] == "NewTitle"
+    # the rewritten linking documents are published
+    assert [(saved_event.id, saved_event.changed_fields) for saved_event in MockedEvent.saved_events] \
+        == [(controller_other_created_document["id"], ["links"])]
+
+
 def test_can_add_tag_to_document(lambda_context, MockedMiddlewareWithoutErrorCatching, controller_created_document):
     from app.controllers.document_tag_add.lambda_function import handler
     event = {
@@ -0,0 +1,98 @@
+import threading
+import boto3
+from app.repository.infrastructure.db import DB, ItemKey, Update
+
+
+key = ItemKey("workspace", "MyWorkspace", secondary=ItemKey("id", "MyDocument"))
+
+
+def expression_paths(params):
+    # resolves the placeholders of the update expression
+    expression = params["UpdateExpression"]
+    for placeholder, name in sorted(params["ExpressionAttributeNames"].items(), key=lambda p: -len(p[0])):
+        expression = expression.replace(placeholder, name)
+    for placeholder, value in sorted(params.get("ExpressionAttributeValues", {}).items(), key=lambda p: -len(p[0])):
+        expression = expression.replace(placeholder, repr(value))
+    return expression
+
+
+def test_update_params_diff_all_attributes():
+    old_item = {"workspace": "MyWorkspace", "id": "MyDocument", "title": "A", "tags": ["x"],
+                "links": {"l1": {"location": "1:2"}, "l2": {"location": "3:4"}}}
+    item = {"workspace": "MyWorkspace", "id": "MyDocument", "title": "B", "tags": ["x"],
+            "links": {"l1": {"location": "1:2"}, "l3": {"location": "5:6"}}}
+
+    params = DB._update_params(Update(key, item, old_item))
+
+    assert expression_paths(params) == "SET links.l3 = {'location': '5:6'}, title = 'B' REMOVE links.l2"
+    assert params["ConditionExpression"] == "attribute_exists(#key)"
+
+
+def test_update_params_only_changed_paths():
+    old_item = {"workspace": "MyWorkspace", "id": "MyDocument", "title": "A",
+                "backlinks": {"l1": {"source_document_preview_text": "Old"}, "l2": {"location": "3:4"}},
+                "highlights": {"h1": {"links": None, "backlinks": {"l3": {"source_document_preview_text": "Old"}}}}}
+    item = {"workspace": "MyWorkspace", "id": "MyDocument", "title": "A",
+            "backlinks": {"l1": {"source_document_preview_text": "New"}, "l2": {"location": "3:4"}},
+            "highlights": {"h1": {"links": {"l4": {"location": "1:2"}},
+                                  "backlinks": {"l3": {"source_document_preview_text": "New"}}}}}
+
+    params = DB._update_params(Update(key, item, old_item, changed_paths=[
+        ("backlinks", "l1"),
+        ("highlights", "h1", "backlinks", "l3"),
+        ("highlights", "h1", "links", "l4"),  # links is not a map yet -> set the whole map
+        ("title",),  # unchanged
+    ]))
+
+    assert expression_paths(params) == "SET backlinks.l1 = {'source_document_preview_text': 'New'}, " \
+                                       "highlights.h1.backlinks.l3 = {'source_document_preview_text': 'New'}, " \
+                                       "highlights.h1.links = {'l4': {'location': '1:2'}}"
+
+
+def test_update_params_overlapping_changed_paths():
+    old_item = {"workspace": "MyWorkspace", "id": "MyDocument", "highlights": {"h1": {"links": {}}}}
+    item = {"workspace": "MyWorkspace", "id": "MyDocument", "highlights": {}}
+
+    params = DB._update_params(Update(key, item, old_item, changed_paths=[
+        ("highlights", "h1", "links", "l1"),
+        ("highlights", "h1"),
+    ]))
+
+    assert expression_paths(params) == "REMOVE highlights.h1"
+
+
+def test_update_params_nothing_changed():
+    item = {"workspace": "MyWorkspace", "id": "MyDocument", "title": "A"}
+
+    assert DB._update_params(Update(key, item, {**item})) is None
+    assert DB._update_params(Update(key, item, {**item}, changed_paths=[("title",)])) is None
+
+
+def test_resources_are_created_once_per_thread(monkeypatch):
+    created = []
+
+    class Session:
+        def resource(self, service_name):
+            created.append(threading.get_ident())
+            return type("DynamoDB", (), {"Table": lambda self, name: name})()
+
+    monkeypatch.setattr(boto3.session, "Session", Session)
+    monkeypatch.setattr(DB, "_thread_local", threading.local())
+
+    assert DB("Document")._table == DB("Document")._table == "Document"
+    assert DB("Other")._table == "Other"
+    thread = threading.Thread(target=lambda: DB("Document")._table)
+    thread.start()
+    thread.join()
+
+    assert len(created) == 2 and created[0] != created[1]
+
+
+def test_update_params_add():
+    old_item = {"workspace": "MyWorkspace", "id": "MyDocument", "title": "A", "backlinks_count": 3}
+    item = {"workspace": "MyWorkspace", "id": "MyDocument", "title": "B", "backlinks_count": 4}
+
+    params = DB._update_params(Update(key, item, old_item, add={"backlinks_count": 1}))
+
+    assert expression_paths(params) == "SET title = 'B' ADD backlinks_count 1"
+    assert DB._update_params(Update(key, old_item, {**old_item}, add={"backlinks_count": 0})) is None
@@ -1,6 +1,9 @@
-from app.repository import DocumentRepository
+import pytest
+from app.repository import DocumentRepository, DocumentsNotSavedError
+from app.repository.item_cache import ItemCache
+from app.repository.document_serialization import DocumentSerializer
 from app import interface
-from domain.model.document import Link
+from domain.model.document import Document, Link, Content
 
 
 def test_save_and_retrieve_document_with_content(document,
@@ -16,7 +19,7 @@ def test_save_and_retrieve_document_with_content(document,
     assert interface.DocumentModel.build(document=document, with_content_body_url=True) \
            == interface.DocumentModel.build(document=retrieved_document, with_content_body_url=True)
 
-    MockedDBForDocumentRepository.test_operations_count(put=1, get=1)
+    MockedDBForDocumentRepository.test_operations_count(put=1, get=1, increment=1)
     MockedObjectStorageForDocumentRepository.test_operations_count(put=1, get_url=2)
 
 
@@ -43,8 +46,8 @@ def test_save_and_retrieve_all_documents_in_workspace(document, other_document,
         else:
             assert None
 
-    MockedDBForDocumentRepository.test_operations_count(put=3, query=1)
-    MockedObjectStorageForDocumentRepository.test_operations_count(put=3, get=0)
+    MockedDBForDocumentRepository.test_operations_count(put=3, query=1, increment=3)
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=2, get=0, exists=1)
 
 
 def test_save_and_retrieve_document_with_link(document, other_document, content_location,
@@ -65,13 +68,13 @@ def test_save_and_retrieve_document_with_link(document, other_document, content_
            == interface.DocumentModel.build(document=retrieved_document)
     assert retrieved_document_link.target.id == other_document.id
 
-    MockedDBForDocumentRepository.test_operations_count(get=1, put=2)
+    MockedDBForDocumentRepository.test_operations_count(get=1, put=2, increment=2)
 
     # will result in a db get
     assert retrieved_document_link.target.get_backlink(retrieved_document_link.id) == retrieved_document_link
 
-    MockedDBForDocumentRepository.test_operations_count(get=2, put=2)
-    MockedObjectStorageForDocumentRepository.test_operations_count(put=2, get=0)
+    MockedDBForDocumentRepository.test_operations_count(get=2, put=2, increment=2)
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=1, get=0, exists=1)
 
 
 def test_save_and_retrieve_document_with_highlight_with_link(document, other_document, content_location, content,
@@ -94,14 +97,14 @@ def test_save_and_retrieve_document_with_highlight_with_link(document, other_doc
            == interface.DocumentModel.build(document=retrieved_document)
     assert retrieved_document_highlight_link.target.id == other_document.id
 
-    MockedDBForDocumentRepository.test_operations_count(get=1, put=2)
+    MockedDBForDocumentRepository.test_operations_count(get=1, put=2, increment=2)
 
     # will result in a db get
     assert retrieved_document_highlight_link.target.get_backlink(retrieved_document_highlight_link.id) \
            == retrieved_document_highlight_link
 
-    MockedDBForDocumentRepository.test_operations_count(get=2, put=2)
-    MockedObjectStorageForDocumentRepository.test_operations_count(put=2, get=0)
+    MockedDBForDocumentRepository.test_operations_count(get=2, put=2, increment=2)
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=1, get=0, exists=1)
 
 
 def test_save_and_retrieve_document_with_backlink(document, other_document, content_location,
@@ -122,13 +125,13 @@ def test_save_and_retrieve_document_with_backlink(document, other_document, cont
            == interface.DocumentModel.build(document=retrieved_document)
     assert retrieved_document_backlink.source.id == other_document.id
 
-    MockedDBForDocumentRepository.test_operations_count(get=1, put=2)
+    MockedDBForDocumentRepository.test_operations_count(get=1, put=2, increment=2)
 
     # will result in a db get
     assert retrieved_document_backlink.source.get_link(retrieved_document_backlink.id) == retrieved_document_backlink
 
-    MockedDBForDocumentRepository.test_operations_count(get=2, put=2)
-    MockedObjectStorageForDocumentRepository.test_operations_count(put=2, get=0)
+    MockedDBForDocumentRepository.test_operations_count(get=2, put=2, increment=2)
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=1, get=0, exists=1)
 
 
 def test_save_and_retrieve_document_with_highlight_with_backlink(document, other_document, content_location, content,
@@ -151,11 +154,542 @@ def test_save_and_retrieve_document_with_highlight_with_backlink(document, other
            == interface.DocumentModel.build(document=retrieved_document)
     assert retrieved_document_highlight_backlink.source.id == other_document.id
 
-    MockedDBForDocumentRepository.test_operations_count(get=1, put=2)
+    MockedDBForDocumentRepository.test_operations_count(get=1, put=2, increment=2)
 
     # will result in a db get
     assert retrieved_document_highlight_backlink.source.get_link(retrieved_document_highlight_backlink.id) \
            == retrieved_document_highlight_backlink
 
-    MockedDBForDocumentRepository.test_operations_count(get=2, put=2)
-    MockedObjectStorageForDocumentRepository.test_operations_count(put=2, get=0)
+    MockedDBForDocumentRepository.test_operations_count(get=2, put=2, increment=2)
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=1, get=0, exists=1)
+
+
+def test_get_many_documents(document, other_document, document_from_other_workspace,
+                            MockedDBForDocumentRepository,
+                            ):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+        repository.add(document_from_other_workspace)
+
+    with DocumentRepository.use() as repository:
+        retrieved_documents = repository.get_many(
+            [document.id, other_document.id, document_from_other_workspace.id, document.id],
+            document.workspace,
+        )
+        assert repository.get(document.id, document.workspace) is retrieved_documents[0]
+
+    assert [retrieved_document.id for retrieved_document in retrieved_documents] == [document.id, other_document.id]
+
+    MockedDBForDocumentRepository.test_operations_count(put=3, batch_get=1, increment=3)
+
+
+def test_rename_document_prefetches_link_targets_in_one_batch(document, content, content_location, workspace,
+                                                              MockedDBForDocumentRepository,
+                                                              ):
+    targets = [Document.create(workspace, f"Target{i}", tags=[], content=content, links=[], highlights=[])
+               for i in range(3)]
+    with DocumentRepository.use() as repository:
+        for target in targets:
+            repository.add(target)
+        repository.add(document)
+        for target in targets:
+            document.link(content_location, target)
+
+    with DocumentRepository.use() as repository:
+        retrieved_document = repository.get(document.id, document.workspace)
+        retrieved_document.title = "MyRenamedDocument"
+
+    MockedDBForDocumentRepository.test_operations_count(put=4, get=1, batch_get=1, update=4, increment=4)
+
+    with DocumentRepository.use() as repository:
+        retrieved_target = repository.get(targets[0].id, workspace)
+
+    assert [*retrieved_target.backlinks][0].source_preview.text == "MyRenamedDocument"
+
+
+def test_rename_document_updates_backlinks_of_linked_highlights(document, other_document, content, content_location,
+                                                               MockedDBForDocumentRepository,
+                                                               ):
+    with DocumentRepository.use() as repository:
+        repository.add(other_document)
+        repository.add(document)
+        highlight = other_document.highlight(content_location, link_preview_text=content.body)
+        document.link(content_location, highlight)
+
+    with DocumentRepository.use() as repository:
+        repository.get(document.id, document.workspace).title = "MyRenamedDocument"
+
+    MockedDBForDocumentRepository.test_operations_count(put=2, get=1, batch_get=1, update=2, increment=2)
+
+    with DocumentRepository.use() as repository:
+        retrieved_highlight = repository.get(other_document.id, other_document.workspace).get_highlight(highlight.id)
+
+    assert [*retrieved_highlight.backlinks][0].source_preview.text == "MyRenamedDocument"
+
+
+def test_rename_document_updates_links_of_linking_documents(document, other_document, content_location,
+                                                           MockedDBForDocumentRepository,
+                                                           ):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+        other_document.link(content_location, document)
+
+    with DocumentRepository.use() as repository:
+        repository.get(document.id, document.workspace).title = "MyRenamedDocument"
+
+    MockedDBForDocumentRepository.test_operations_count(put=2, get=1, batch_get=1, update=2, increment=2)
+
+    with DocumentRepository.use() as repository:
+        retrieved_other_document = repository.get(other_document.id, other_document.workspace)
+
+    assert [*retrieved_other_document.links][0].target_preview.text == "MyRenamedDocument"
+
+
+def test_deferred_rename_only_writes_the_document_and_propagation_is_idempotent(document, other_document, content,
+                                                                              content_location,
+                                                                              MockedDBForDocumentRepository,
+                                                                              ):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+        other_document.link(content_location, document)
+        highlight = other_document.highlight(content_location, link_preview_text=content.body)
+        document.link(content_location, highlight)
+
+    changed_documents = []
+    with DocumentRepository.use(defer_link_preview_propagation=True) as repository:
+        repository.get(document.id, document.workspace).title = "MyRenamedDocument"
+        repository.on_link_previews_changed = changed_documents.append
+
+    assert [changed_document.id for changed_document in changed_documents] == [document.id]
+    MockedDBForDocumentRepository.test_operations_count(put=2, get=1, update=1, increment=2)
+    with DocumentRepository.use() as repository:
+        retrieved_other_document = repository.get(other_document.id, other_document.workspace)
+    assert [*retrieved_other_document.links][0].target_preview.text == "MyDocument"
+
+    for _ in range(2):  # the second propagation has nothing left to write
+        with DocumentRepository.use() as repository:
+            repository.propagate_link_previews(repository.get(document.id, document.workspace))
+
+    MockedDBForDocumentRepository.test_operations_count(put=2, get=4, batch_get=2, update=2, increment=2)
+    with DocumentRepository.use() as repository:
+        retrieved_other_document = repository.get(other_document.id, other_document.workspace)
+    assert [*retrieved_other_document.links][0].target_preview.text == "MyRenamedDocument"
+    assert [*retrieved_other_document.get_highlight(highlight.id).backlinks][0].source_preview.text \
+        == "MyRenamedDocument"
+
+
+def test_deferred_link_preview_is_reported_again_if_set_to_the_same_value(document, MockedDBForDocumentRepository):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+
+    def fail(changed_document):
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):  # e.g. the propagation job could not be enqueued after the write
+        with DocumentRepository.use(defer_link_preview_propagation=True) as repository:
+            repository.get(document.id, document.workspace).title = "MyRenamedDocument"
+            repository.on_link_previews_changed = fail
+
+    changed_documents = []
+    with DocumentRepository.use(defer_link_preview_propagation=True) as repository:  # the retry
+        repository.get(document.id, document.workspace).title = "MyRenamedDocument"
+        repository.on_link_previews_changed = changed_documents.append
+
+    assert [changed_document.id for changed_document in changed_documents] == [document.id]
+
+
+def test_changed_fields_of_saved_documents(document, other_document, content_location):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+
+    assert repository.changed_fields(document) is None  # created
+
+    with DocumentRepository.use() as repository:
+        retrieved_document = repository.get(document.id, document.workspace)
+        retrieved_document.link(content_location, repository.get(other_document.id, other_document.workspace))
+        retrieved_document.tag("Changed")
+
+    assert repository.changed_fields(retrieved_document) == {"links", "tags"}
+    assert repository.changed_fields(other_document) == {"backlinks"}
+
+
+def test_only_mutated_documents_are_serialized(document, other_document, monkeypatch,
+                                               MockedDBForDocumentRepository,
+                                               ):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+
+    serialized_documents = []
+    serialize_document = DocumentSerializer.serialize_document
+
+    def serialize_document_recorded(document_to_serialize):
+        serialized_documents.append(document_to_serialize)
+        return serialize_document(document_to_serialize)
+
+    monkeypatch.setattr(DocumentSerializer, "serialize_document", staticmethod(serialize_document_recorded))
+
+    with DocumentRepository.use() as repository:
+        repository.get_all_in_workspace(document.workspace)
+
+    assert not serialized_documents
+
+    with DocumentRepository.use() as repository:
+        repository.get_all_in_workspace(document.workspace)
+        repository.get(document.id, document.workspace).tag("Mutated")
+
+    assert serialized_documents == [document]
+    MockedDBForDocumentRepository.test_operations_count(query=2, put=2, update=1, increment=2)
+
+
+def test_delete_document(document, MockedDBForDocumentRepository):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+
+    with DocumentRepository.use() as repository:
+        repository.get(document.id, document.workspace).delete()
+
+    with DocumentRepository.use() as repository:
+        assert repository.get(document.id, document.workspace) is None
+
+    MockedDBForDocumentRepository.test_operations_count(put=1, get=2, delete=2, increment=2)
+
+
+def test_iter_documents_in_workspace_page_by_page(document, other_document, document_from_other_workspace,
+                                                  MockedDBForDocumentRepository,
+                                                  ):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+        repository.add(document_from_other_workspace)
+
+    with DocumentRepository.use() as repository:
+        pages = [*repository.iter_workspace(document.workspace, page_size=1)]
+
+    assert [len(documents) for documents, _ in pages] == [1, 1]
+    assert pages[0][1] and pages[1][1] is None
+    assert {documents[0].id for documents, _ in pages} == {document.id, other_document.id}
+
+    with DocumentRepository.use() as repository:
+        documents, next_key = next(repository.iter_workspace(document.workspace, page_size=1, start_key=pages[0][1]))
+
+    assert documents[0].id == pages[1][0][0].id
+    assert next_key is None
+
+    MockedDBForDocumentRepository.test_operations_count(put=3, query=3, increment=3)
+
+
+def test_iter_document_summaries_in_workspace(document, other_document, content_location,
+                                              MockedDBForDocumentRepository,
+                                              ):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+        document.link(content_location, other_document)
+
+    with DocumentRepository.use() as repository:
+        summaries, next_key = next(repository.iter_workspace_summaries(document.workspace))
+        assert repository.get(document.id, document.workspace)  # summaries are not registered as loaded documents
+
+    assert next_key is None
+    assert {summary.id: summary.title for summary in summaries} \
+           == {document.id: document.title, other_document.id: other_document.title}
+
+    MockedDBForDocumentRepository.test_operations_count(put=2, query=1, get=1, increment=2)
+
+
+def test_failed_writes_are_reported_together(document, other_document, content, workspace, monkeypatch,
+                                             MockedDBForDocumentRepository,
+                                             ):
+    failing_documents = [Document.create(workspace, f"Failing{i}", tags=[], content=content, links=[], highlights=[])
+                         for i in range(2)]
+    failing_document_ids = {str(failing_document.id) for failing_document in failing_documents}
+    put = MockedDBForDocumentRepository.put
+
+    def put_failing(self, key, item, *args, **kwargs):
+        if item["id"] in failing_document_ids:
+            raise RuntimeError()
+        return put(self, key, item, *args, **kwargs)
+
+    monkeypatch.setattr(MockedDBForDocumentRepository, "put", put_failing)
+
+    saved_documents = []
+    with pytest.raises(DocumentsNotSavedError) as e:
+        with DocumentRepository.use() as repository:
+            repository.add(document)
+            repository.add(other_document)
+            for failing_document in failing_documents:
+                repository.add(failing_document)
+            repository.on_saved_document = saved_documents.append
+
+    assert set(e.value.errors) == set(failing_documents)
+    assert set(saved_documents) == {document, other_document}
+
+
+def test_transactional_save_writes_all_documents_at_once(document, other_document, content_location,
+                                                         MockedDBForDocumentRepository,
+                                                         MockedObjectStorageForDocumentRepository,
+                                                         ):
+    with DocumentRepository.use() as repository:
+        repository.add(other_document)
+
+    with DocumentRepository.use(transactional=True) as repository:
+        repository.add(document)
+        document.link(content_location, repository.get(other_document.id, other_document.workspace))
+
+    with DocumentRepository.use() as repository:
+        retrieved_other_document = repository.get(other_document.id, other_document.workspace)
+
+    assert [*retrieved_other_document.backlinks][0].source.id == document.id
+
+    MockedDBForDocumentRepository.test_operations_count(put=1, get=2, transact_write=1, increment=2)
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=1, exists=1)
+
+
+def test_transactional_save_is_compensated_if_content_upload_fails(other_document, content_location, workspace,
+                                                                   monkeypatch,
+                                                                   MockedDBForDocumentRepository,
+                                                                   MockedObjectStorageForDocumentRepository,
+                                                                   ):
+    with DocumentRepository.use() as repository:
+        repository.add(other_document)
+
+    def put_failing(self, id_, body, **kwargs):
+        raise RuntimeError()
+
+    monkeypatch.setattr(MockedObjectStorageForDocumentRepository, "put", put_failing)
+
+    # a body that is not stored yet
+    new_document = Document.create(workspace, "NewDocument", tags=[], content=Content("Dolor", "MD"), links=[],
+                                   highlights=[])
+
+    with pytest.raises(RuntimeError):
+        with DocumentRepository.use(transactional=True) as repository:
+            repository.add(new_document)
+            new_document.link(content_location, repository.get(other_document.id, other_document.workspace))
+
+    with DocumentRepository.use() as repository:
+        assert repository.get(new_document.id, new_document.workspace) is None
+        assert not repository.get(other_document.id, other_document.workspace).backlinks
+
+    # the upload precedes the transaction, the reference to the body is released again
+    assert len(MockedDBForDocumentRepository._table) == 2  # other_document and the blob item of its body
+    MockedDBForDocumentRepository.test_operations_count(put=1, get=3, increment=3, delete=1)
+
+
+def test_item_cache_serves_unchanged_documents(document, other_document, monkeypatch,
+                                               MockedDBForDocumentRepository,
+                                               ):
+    monkeypatch.setattr(DocumentRepository, "item_cache", ItemCache(max_size=10))
+
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+
+    # cached by the puts, only the revisions are read
+    with DocumentRepository.use() as repository:
+        assert len(repository.get_all_in_workspace(document.workspace)) == 2
+    with DocumentRepository.use() as repository:
+        repository.get(document.id, document.workspace).tag("Cached")
+
+    MockedDBForDocumentRepository.test_operations_count(query=1, get=1, put=2, update=1, increment=2)
+
+    # the update invalidated the cached item of document, so it is read again (and then cached)
+    for _ in range(2):
+        with DocumentRepository.use() as repository:
+            assert "Cached" in repository.get(document.id, document.workspace).tags
+
+    MockedDBForDocumentRepository.test_operations_count(query=1, get=4, put=2, update=1, increment=2)
+
+
+def test_item_cache_is_validated_by_revision(document, monkeypatch,
+                                             MockedDBForDocumentRepository,
+                                             ):
+    monkeypatch.setattr(DocumentRepository, "item_cache", ItemCache(max_size=10))
+
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+
+    # written by another lambda container
+    stored_item = MockedDBForDocumentRepository._table[(document.workspace, document.id)]
+    MockedDBForDocumentRepository._table[(document.workspace, document.id)] = \
+        {**stored_item, "title": "RenamedElsewhere", "revision": "other"}
+
+    with DocumentRepository.use() as repository:
+        assert repository.get(document.id, document.workspace).title == "RenamedElsewhere"
+
+    MockedDBForDocumentRepository.test_operations_count(get=2, put=1, increment=1)
+
+
+def test_save_and_retrieve_packed_document(document, other_document, content_location, content, monkeypatch,
+                                           MockedDBForDocumentRepository,
+                                           ):
+    with DocumentRepository.use() as repository:
+        repository.add(other_document)
+        repository.add(document)
+        document.link(content_location, other_document)
+
+    # stored unpacked, from now on packed
+    monkeypatch.setattr(DocumentSerializer, "pack_threshold", 1)
+
+    with DocumentRepository.use() as repository:
+        highlighted_document = repository.get(document.id, document.workspace)
+        highlighted_document.highlight(content_location, link_preview_text=content.body)
+
+    stored_item = MockedDBForDocumentRepository._table[(document.workspace, document.id)]
+    assert "packed" in stored_item and "links" not in stored_item and "highlights" not in stored_item
+
+    with DocumentRepository.use() as repository:
+        retrieved_document = repository.get(document.id, document.workspace)
+        retrieved_other_document = repository.get(other_document.id, other_document.workspace)
+
+    assert interface.DocumentModel.build(document=highlighted_document) \
+           == interface.DocumentModel.build(document=retrieved_document)
+    assert len(retrieved_document.highlights) == 1
+    assert [*retrieved_other_document.backlinks][0].source.id == document.id
+
+    MockedDBForDocumentRepository.test_operations_count(put=2, get=3, update=1, increment=2)
+
+
+def test_backlinks_beyond_threshold_are_stored_separately(document, content, content_location, workspace, monkeypatch,
+                                                          MockedDBForDocumentRepository,
+                                                          ):
+    monkeypatch.setattr(DocumentRepository, "max_inline_backlinks", 1)
+    sources = [Document.create(workspace, f"Source{i}", tags=[], content=content, links=[], highlights=[])
+               for i in range(4)]
+
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        for source in sources[:3]:
+            repository.add(source)
+            source.link(content_location, document)
+
+    stored_item = MockedDBForDocumentRepository._table[(workspace, document.id)]
+    assert len(stored_item["backlinks"]) == 1 and stored_item["backlinks_overflow"]
+    MockedDBForDocumentRepository.test_operations_count(put=6, increment=4)
+
+    with DocumentRepository.use() as repository:
+        assert len(repository.get_all_in_workspace(workspace)) == 4
+    # the overflow backlinks (and content blobs) are not in the partition of the workspace, so listing pages are full
+    assert {key[1] for key in MockedDBForDocumentRepository._table if key[0] == workspace} \
+           == {document.id, *(source.id for source in sources[:3])}
+
+    # new backlinks do not rewrite the document item (only add to its count), neither are the other backlinks loaded
+    with DocumentRepository.use() as repository:
+        repository.add(sources[3])
+        retrieved_document = repository.get(document.id, workspace)
+        sources[3].link(content_location, retrieved_document)
+
+    MockedDBForDocumentRepository.test_operations_count(query=1, get=1, put=8, update=1, increment=5)
+    assert MockedDBForDocumentRepository._table[(workspace, document.id)]["backlinks_count"] == 4
+    assert retrieved_document.backlinks_count == 4
+    assert retrieved_document.added_backlink_ids == {str([*sources[3].links][0].id)}
+
+    # the backlinks are loaded when they are accessed
+    with DocumentRepository.use() as repository:
+        retrieved_document = repository.get(document.id, workspace)
+        assert {backlink.source.id for backlink in retrieved_document.backlinks} == {source.id for source in sources}
+
+    MockedDBForDocumentRepository.test_operations_count(query=2, get=2, put=8, update=1, increment=5)
+
+    with DocumentRepository.use() as repository:
+        [*repository.get(sources[2].id, workspace).links][0].delete()
+    assert MockedDBForDocumentRepository._table[(workspace, document.id)]["backlinks_count"] == 3
+
+    with DocumentRepository.use() as repository:
+        retrieved_document = repository.get(document.id, workspace)
+        assert {backlink.source.id for backlink in retrieved_document.backlinks} \
+               == {sources[0].id, sources[1].id, sources[3].id}
+        retrieved_document.delete()
+
+    assert {key[1] for key in MockedDBForDocumentRepository._table if key[0] == workspace} \
+           == {source.id for source in sources}
+    assert not any(key[0] == f"{workspace}#backlinks" for key in MockedDBForDocumentRepository._table)
+    MockedDBForDocumentRepository.test_operations_count(query=4, get=5, put=8, update=3, delete=4, increment=6)
+
+
+def test_content_body_is_read_lazily(document, MockedObjectStorageForDocumentRepository):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+
+    with DocumentRepository.use() as repository:
+        body = repository.get(document.id, document.workspace).content.body
+
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=1)
+
+    assert body.read_range(8, 13) == b"ipsum"
+    assert [*body.iter_chunks(chunk_size=6)] == [b"Lorem ", b"[[ipsu", b"m]]"]
+    assert body.read() == document.content.body.encode()
+
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=1, get=3)
+
+
+def test_content_bodies_are_stored_once_per_workspace(document, other_document, document_from_other_workspace,
+                                                      MockedDBForDocumentRepository,
+                                                      MockedObjectStorageForDocumentRepository,
+                                                      ):
+    with DocumentRepository.use() as repository:
+        repository.add(document)
+        repository.add(other_document)
+        repository.add(document_from_other_workspace)
+
+    assert len(MockedObjectStorageForDocumentRepository._storage) == 2
+
+    # still referenced by other_document
+    with DocumentRepository.use() as repository:
+        repository.get(document.id, document.workspace).delete()
+
+    assert len(MockedObjectStorageForDocumentRepository._storage) == 2
+
+    with DocumentRepository.use() as repository:
+        retrieved_other_document = repository.get(other_document.id, other_document.workspace)
+        assert retrieved_other_document.content.body.read() == other_document.content.body.encode()
+        retrieved_other_document.delete()
+
+    assert len(MockedObjectStorageForDocumentRepository._storage) == 1
+    assert not [item for item in MockedDBForDocumentRepository._table.values()
+                if item["workspace"] == document.workspace]
+    MockedObjectStorageForDocumentRepository.test_operations_count(put=2, get=1, delete=1, exists=1)
+
+
+def test_acquired_content_is_released_if_preparing_a_later_write_fails(document, other_document, monkeypatch,
+                                                                      MockedDBForDocumentRepository,
+                                                                      ):
+    serialize_document = DocumentSerializer.serialize_document
+
+    def failing_serialize_document(serialized_document):
+        if serialized_document is other_document:
+            raise ValueError()
+        return serialize_document(serialized_document)
+
+    monkeypatch.setattr(DocumentSerializer, "serialize_document", staticmethod(failing_serialize_document))
+
+    with pytest.raises(ValueError):
+        with DocumentRepository.use() as repository:
+            repository.add(document)
+            repository.add(other_document)
+
+    # the reference to the body of document was acquired and released again
+    assert not MockedDBForDocumentRepository._table
+    MockedDBForDocumentRepository.test_operations_count(increment=2, delete=1)
+
+
+def test_lazy_documents_are_hashed_and_compared_without_loading(document, other_document, content_location,
+                                                                 MockedDBForDocumentRepository,
+                                                                 ):
+    with DocumentRepository.use() as repository:
+        repository.add(other_document)
+        repository.add(document)
+        document.link(content_location, other_document)
+
+    with DocumentRepository.use() as repository:
+        target = [*repository.get(document.id, document.workspace).links][0].target
+        assert not target.is_loaded
+        assert target in {other_document} and target == other_document and other_document == target
+        assert target != document
+
+    MockedDBForDocumentRepository.test_operations_count(put=2, get=1, increment=2)
@@ -1,4 +1,4 @@
-from app.interface import DocumentModel
+from app.interface import DocumentModel, DocumentSavedEventModel
 from domain.model.document import Link
 from app.repository import DocumentRepositoryDocument
 
@@ -60,3 +60,49 @@ def test_document_model(document, other_document, content_location, content):
             }],
         }],
     }
+
+
+def test_document_model_of_link_to_highlight(document, other_document, content_location, content):
+    DocumentRepositoryDocument._repository_init(document, version=1, content_body_url_getter=lambda: "url")
+    highlight = other_document.highlight(content_location, link_preview_text=content.body)
+    document.link(content_location, highlight)
+    model = DocumentModel.build(document)
+
+    assert model.links[0].target_document_highlight_id == str(highlight.id)
+    # built without validation, but equal to the validated model
+    assert model == DocumentModel(**model.dict())
+
+
+def test_document_saved_event_model_only_has_the_changed_fields(document, other_document, content_location):
+    DocumentRepositoryDocument._repository_init(document, version=1, content_body_url_getter=lambda: "url",
+                                                backlinks_count=1)
+    backlink = other_document.link(content_location, document)
+    document.added_backlink_ids = frozenset([str(backlink.id)])
+    event = DocumentSavedEventModel.build(document, changed=frozenset(["title", "backlinks"]))
+
+    assert event.dict(exclude_unset=True) == {
+        "id": str(document.id),
+        "workspace": str(document.workspace),
+        "version": 1,
+        "changedFields": ["addedBacklinkIds", "backlinksCount", "removedBacklinkIds", "title"],
+        "title": document.title,
+        "addedBacklinkIds": [str(backlink.id)],  # only the ids, the backlinks are not sent
+        "removedBacklinkIds": [],
+        "backlinksCount": 1,
+    }
+    # all fields of a created document
+    assert [*DocumentSavedEventModel.build(document, changed=None).dict(exclude_unset=True)] == [
+        "id", "workspace", "version", "changedFields", "title", "tags", "contentType", "contentBodyUrl", "links",
+        "addedBacklinkIds", "removedBacklinkIds", "backlinksCount", "highlights",
+    ]
+
+
+def test_merged_document_saved_events_have_the_backlink_changes_of_both():
+    def event(added, removed):
+        return DocumentSavedEventModel.construct(id="a", workspace="MyWorkspace", version=1,
+                                                 changed_fields=["addedBacklinkIds", "removedBacklinkIds"],
+                                                 added_backlink_ids=added, removed_backlink_ids=removed)
+
+    merged = event(["1", "2"], ["3"]).merge(event(["4"], ["2"]))
+
+    assert (merged.added_backlink_ids, merged.removed_backlink_ids) == (["1", "4"], ["2", "3"])
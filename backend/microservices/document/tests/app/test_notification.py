@@ -0,0 +1,121 @@
+import threading
+import boto3
+import pytest
+from app.notification.notification import NotificationManager, InternalError
+import json
+from app.interface import DocumentSavedEventModel, DocumentIdentifierModel
+
+
+class S3Client:
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+
+
+class SNSClient:
+
+    def __init__(self, fail_ids=()):
+        self.calls = []
+        self.messages = []
+        self._fail_ids = fail_ids
+        self._lock = threading.Lock()
+
+    def publish(self, TopicArn, Message, MessageDeduplicationId, MessageGroupId, MessageAttributes):
+        with self._lock:
+            self.calls.append(("publish", [(MessageGroupId, MessageAttributes["eventType"]["StringValue"])]))
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        with self._lock:
+            self.messages.extend(json.loads(entry["Message"]) for entry in PublishBatchRequestEntries)
+            self.calls.append(("publish_batch", [(entry["MessageGroupId"],
+                                                  entry["MessageAttributes"]["eventType"]["StringValue"])
+                                                 for entry in PublishBatchRequestEntries]))
+        return {
+            "Successful": [{"Id": entry["Id"]} for entry in PublishBatchRequestEntries
+                           if entry["MessageGroupId"] not in self._fail_ids],
+            "Failed": [{"Id": entry["Id"], "Code": "InternalError", "SenderFault": False}
+                       for entry in PublishBatchRequestEntries if entry["MessageGroupId"] in self._fail_ids],
+        }
+
+
+def document_model(document_id: str, title: str = "MyDocument") -> DocumentSavedEventModel:
+    return DocumentSavedEventModel.construct(id=document_id, workspace="MyWorkspace", version=1,
+                                             changed_fields=["title"], title=title)
+
+
+def test_unbuffered_events_are_published_at_once(monkeypatch):
+    client = SNSClient()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+
+    NotificationManager().document_saved(document_model("a"))
+
+    assert client.calls == [("publish", [("a", "documentSaved")])]
+
+
+def test_buffered_events_are_coalesced_and_published_in_batches(monkeypatch):
+    client = SNSClient()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+
+    with NotificationManager.use() as notification_manager:
+        for i in range(25):
+            notification_manager.document_saved(document_model(str(i)))
+        notification_manager.document_saved(DocumentSavedEventModel.construct(
+            id="0", workspace="MyWorkspace", version=1, changed_fields=["tags"], tags=["Other"]))
+        notification_manager.document_deleted(DocumentIdentifierModel.construct(document_id="1",
+                                                                                 workspace="MyWorkspace"))
+        assert client.calls == []
+
+    assert sorted(len(entries) for _, entries in client.calls) == [5, 10, 10]
+    published = [entry for _, entries in client.calls for entry in entries]
+    assert len(published) == 25
+    assert ("1", "documentDeleted") in published and ("1", "documentSaved") not in published
+    # saved events of the same document are merged
+    assert [message for message in client.messages if message.get("id") == "0"] == [{
+        "id": "0", "workspace": "MyWorkspace", "version": 1, "changedFields": ["tags", "title"], "title": "MyDocument",
+        "tags": ["Other"],
+    }]
+
+
+def test_large_events_are_claim_checked(monkeypatch):
+    client = SNSClient()
+    s3_client = S3Client()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client if service_name == "sns" else s3_client)
+    monkeypatch.setattr(NotificationManager, "claim_check_threshold", 200)
+    monkeypatch.setattr(NotificationManager, "max_batch_bytes", 300)
+
+    with NotificationManager.use() as notification_manager:
+        notification_manager.document_saved(document_model("a", title="Lorem ipsum " * 20))
+        for document_id in ["b", "c", "d"]:
+            notification_manager.document_saved(document_model(document_id))
+
+    claim_checked = [message for message in client.messages if message["id"] == "a"][0]
+    assert "title" not in claim_checked and claim_checked["changedFields"] == ["title"]
+    assert json.loads(s3_client.objects[claim_checked["claimCheck"]["key"]])["title"] == "Lorem ipsum " * 20
+    # batches are limited by their size as well, including the attributes (the other events are about 130 bytes each)
+    assert sorted(len(entries) for _, entries in client.calls) == [1, 1, 2]
+
+
+def test_failed_batch_entries_are_raised(monkeypatch):
+    client = SNSClient(fail_ids=["b"])
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+
+    with pytest.raises(InternalError):
+        with NotificationManager.use() as notification_manager:
+            notification_manager.document_saved(document_model("a"))
+            notification_manager.document_saved(document_model("b"))
+
+
+def test_message_attributes_count_towards_the_batch_size(monkeypatch):
+    client = SNSClient()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+    # the messages alone would fit into one batch
+    monkeypatch.setattr(NotificationManager, "max_batch_bytes", 2 * len(document_model("a").json(exclude_unset=True)))
+
+    with NotificationManager.use() as notification_manager:
+        notification_manager.document_saved(document_model("a"))
+        notification_manager.document_saved(document_model("b"))
+
+    assert len(client.calls) == 2
@@ -0,0 +1,105 @@
+import io
+import time
+import boto3
+import botocore.response
+from app.repository.infrastructure.object_storage import ObjectStorage
+from app.repository.infrastructure.object_storage.object_storage import PresignedUrlCache
+
+
+class S3Client:
+
+    def __init__(self):
+        self.calls = []
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append(("put_object", Key, len(Body)))
+        self.objects[Key] = (Body, kwargs.get("ContentEncoding"))
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs, Config):
+        self.calls.append(("upload_fileobj", Key, len(Fileobj.read()), Config.multipart_chunksize))
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.calls.append(("get_object", Key, Range))
+        body, content_encoding = self.objects[Key]
+        if Range:
+            start, end = map(int, Range[len("bytes="):].split("-"))
+            body = body[start:end + 1]
+        response = {"Body": botocore.response.StreamingBody(io.BytesIO(body), len(body))}
+        if content_encoding:
+            response["ContentEncoding"] = content_encoding
+        return response
+
+    def head_object(self, Bucket, Key):
+        self.calls.append(("head_object", Key))
+        content_encoding = self.objects[Key][1]
+        return {"ContentEncoding": content_encoding} if content_encoding else {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        self.calls.append(("generate_presigned_url", Params["Key"]))
+        return f"https://{Params['Bucket']}/{Params['Key']}?signature={len(self.calls)}"
+
+
+def test_put_selects_upload_by_body_size(monkeypatch):
+    client = S3Client()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+    monkeypatch.setattr(ObjectStorage, "multipart_threshold", 10)
+    monkeypatch.setattr(ObjectStorage, "multipart_part_size", 5)
+    object_storage = ObjectStorage("DocumentContent")
+
+    object_storage.put("small", "Lorem")
+    object_storage.put("large", b"Lorem ipsum dolor")
+
+    assert client.calls == [("put_object", "small", 5), ("upload_fileobj", "large", 17, 5)]
+
+
+def test_compressed_bodies_are_decompressed_on_read(monkeypatch):
+    client = S3Client()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+    object_storage = ObjectStorage("DocumentContent")
+    body = "Lorem [[ipsum]] " * 100
+
+    object_storage.put("compressed", body, compress=True)
+    object_storage.put("raw", body)
+
+    assert client.objects["compressed"][1] == "gzip" and len(client.objects["compressed"][0]) < len(body)
+    for id_ in ["compressed", "raw"]:
+        stored = object_storage.get_body(id_)
+        assert stored.read() == body.encode()
+        assert stored.read_range(6, 15) == b"[[ipsum]]"
+        assert b"".join(stored.iter_chunks(chunk_size=7)) == body.encode()
+        assert object_storage.get(id_).read() == body.encode()
+
+
+def test_ranged_reads_of_compressed_bodies_are_not_requested_as_ranges(monkeypatch):
+    client = S3Client()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+    object_storage = ObjectStorage("DocumentContent")
+    body = "Lorem [[ipsum]] " * 100
+    object_storage.put("compressed", body, compress=True)
+    object_storage.put("raw", body)
+
+    client.calls = []
+    assert object_storage.get_body("compressed", compressed=True).read_range(6, 15) == b"[[ipsum]]"
+    assert object_storage.get_body("raw", compressed=False).read_range(6, 15) == b"[[ipsum]]"
+    assert client.calls == [("get_object", "compressed", None), ("get_object", "raw", "bytes=6-14")]
+
+    client.calls = []
+    assert object_storage.get_body("compressed").read_range(6, 15) == b"[[ipsum]]"  # not known, looked up
+    assert client.calls == [("head_object", "compressed"), ("get_object", "compressed", None)]
+
+
+def test_presigned_urls_are_reused_until_refresh(monkeypatch):
+    client = S3Client()
+    monkeypatch.setattr(boto3, "client", lambda service_name: client)
+    monkeypatch.setattr(ObjectStorage, "url_cache", PresignedUrlCache(lifetime=100, refresh_fraction=0.5, max_size=2))
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+
+    url = ObjectStorage("DocumentContent").get_url("body")
+    assert ObjectStorage("DocumentContent").get_url("body") == url  # shared by instances
+    assert ObjectStorage("DocumentContent").get_url("body", version=2) != url
+
+    now += 50
+    assert ObjectStorage("DocumentContent").get_url("body") != url
+    assert len(client.calls) == 3
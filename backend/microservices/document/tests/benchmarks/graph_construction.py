@@ -0,0 +1,75 @@
+"""
+Time of building the domain graph of a workspace, run from the service directory:
+
+    python -m tests.benchmarks.graph_construction [--documents 200] [--links 100] [--without-id-pool]
+
+Measures the operations on lib.Id that the graph construction relies on (dict lookups by equal ids and comparisons) and
+the loading of a workspace through the repository (with the db and object storage mocks of the tests). Without the id
+pool every serialized id is instantiated again (see DocumentFactory._get_id).
+"""
+import argparse
+import cProfile
+import pstats
+import time
+import timeit
+from app.repository import DocumentRepository
+from app.repository.document_repository import DocumentFactory
+from domain import lib
+from domain.model.document import Workspace
+from tests.benchmarks.memory_per_link import build_workspace, use_mocks
+
+
+def measure_ids(count: int):
+    ids = [lib.Id() for _ in range(count)]
+    equal_ids = [lib.Id(id_.value) for id_ in ids]  # equal, but not the same objects
+    by_id = {id_: id_ for id_ in ids}
+    timings = {
+        "dict lookup by an equal Id": lambda: [by_id[id_] for id_ in equal_ids],
+        "dict lookup by str": lambda: [by_id[id_.value] for id_ in equal_ids],
+        "Id == Id": lambda: [a == b for a, b in zip(ids, equal_ids)],
+        "Id(str)": lambda: [lib.Id(id_.value) for id_ in ids],
+    }
+    for name, fn in timings.items():
+        print(f"{name}: {min(timeit.repeat(fn, number=1, repeat=20)) * 1000:.2f} ms ({count} ids)")
+
+
+def measure_loading(workspace: Workspace, repeat: int):
+    def load():
+        return DocumentRepository().get_all_in_workspace(workspace)
+
+    load()  # warm up
+    seconds = min(_timed(load) for _ in range(repeat))
+    profile = cProfile.Profile()
+    profile.runcall(load)
+    calls = pstats.Stats(profile).total_calls
+    print(f"loading the workspace: {seconds * 1000:.0f} ms, {calls} function calls")
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--links", type=int, default=100)
+    parser.add_argument("--ids", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--without-id-pool", action="store_true")
+    args = parser.parse_args()
+    if args.without_id_pool:
+        DocumentFactory._get_id = lambda self, value: lib.Id(value)
+
+    measure_ids(args.ids)
+
+    use_mocks()
+    with DocumentRepository.use() as repository:
+        for document in build_workspace(args.documents, args.links, highlights=0):
+            repository.add(document)
+    measure_loading(Workspace("BenchmarkWorkspace"), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Memory of the domain graph per link (tracemalloc), run from the service directory:
+
+    python -m tests.benchmarks.memory_per_link [--documents 200] [--links 100] [--highlights 10]
+
+Every document links to the next documents of the workspace and has highlights (without links). Measures the links
+built in the domain and a workspace loaded through the repository (with the db and object storage mocks of the tests,
+so the items and serialized models are included).
+"""
+import argparse
+import gc
+import tracemalloc
+from app.repository import DocumentRepository
+from app.repository.infrastructure import db, object_storage
+from domain.model.document import Document, Content, ContentLocation, Workspace
+from tests.app.mocks.repository_infrastructure.db import DocumentRepositoryDB
+from tests.app.mocks.repository_infrastructure.object_storage import DocumentRepositoryObjectStorage
+
+
+def build_workspace(documents: int, links: int, highlights: int):
+    workspace = Workspace("BenchmarkWorkspace")
+    content = Content("Lorem [[ipsum]]", "MD")
+    built = [Document.create(workspace, f"Document{i}", tags=[], content=content, links=[], highlights=[])
+             for i in range(documents)]
+    for document in built:
+        for i in range(highlights):
+            document.highlight(ContentLocation(f"{i}:{i + 1}"), link_preview_text=f"Highlight{i}")
+    for i, document in enumerate(built):
+        for j in range(1, links + 1):
+            document.link(ContentLocation("6:15"), built[(i + j) % documents])
+    return built
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, built
+
+
+def use_mocks():
+    DocumentRepositoryDB._table = {}
+    for name in ["query", "get", "batch_get", "put", "update", "delete", "transact_write", "increment"]:
+        setattr(DocumentRepositoryDB, f"count_{name}_operations", 0)
+    DocumentRepositoryObjectStorage._storage = {}
+    for name in ["get", "get_url", "put", "delete", "exists"]:
+        setattr(DocumentRepositoryObjectStorage, f"count_{name}_operations", 0)
+    db.DocumentRepositoryDB = DocumentRepositoryDB
+    object_storage.DocumentRepositoryObjectStorage = DocumentRepositoryObjectStorage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--links", type=int, default=100)
+    parser.add_argument("--highlights", type=int, default=10)
+    args = parser.parse_args()
+    count = args.documents * args.links
+
+    documents_size, _ = measure(lambda: build_workspace(args.documents, 0, args.highlights))
+    size, built = measure(lambda: build_workspace(args.documents, args.links, args.highlights))
+    print(f"domain: {(size - documents_size) / count:.0f} B per link, "
+          f"{documents_size / args.documents:.0f} B per document without links")
+
+    use_mocks()
+    with DocumentRepository.use() as repository:
+        for document in built:
+            repository.add(document)
+    del built
+    size, _ = measure(lambda: DocumentRepository().get_all_in_workspace(Workspace("BenchmarkWorkspace")))
+    print(f"loaded through the repository: {size / count:.0f} B per link (including the documents)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .claim_check import load_claim_check
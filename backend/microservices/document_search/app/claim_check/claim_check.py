@@ -0,0 +1,8 @@
+import boto3
+from app.interface import ClaimCheckModel
+
+
+def load_claim_check(claim_check: ClaimCheckModel) -> bytes:
+    # Events that are too large to be published are stored by the document service, the published event points to them
+    response = boto3.client("s3").get_object(Bucket=claim_check.bucket, Key=claim_check.key)
+    return response["Body"].read()
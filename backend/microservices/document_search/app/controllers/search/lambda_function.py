@@ -2,7 +2,8 @@ from aws_lambda_powertools.utilities.parser import event_parser
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from app.interface import SearchEventModel, SearchResponseModel, SearchResponseDocumentModel,\
     SearchResponseHighlightModel
-from elasticsearch_dsl.query import Bool, Nested, MultiMatch
+from elasticsearch_dsl import SF
+from elasticsearch_dsl.query import Query, Bool, Nested, MultiMatch, FunctionScore
 from app.es import AppDocument
 from app.middleware import middleware
 
@@ -10,9 +11,6 @@ from app.middleware import middleware
 @middleware
 @event_parser(model=SearchEventModel)
 def handler(event: SearchEventModel, context: LambdaContext):
-    # TODO boost based on backlink count
-    #  https://www.elastic.co/guide/en/elasticsearch/reference/current/query-dsl-function-score-query.html
-
     match_document = MultiMatch(
         query=event.query,
         fields=[
@@ -22,11 +20,15 @@ def handler(event: SearchEventModel, context: LambdaContext):
         ],
     )
     match_highlight = Nested(
-        query=MultiMatch(
-            query=event.query,
-            fields=[
-                "link_preview_text",
-            ],
+        query=_boost_by_backlinks(
+            MultiMatch(
+                query=event.query,
+                fields=[
+                    "link_preview_text",
+                ],
+            ),
+            field="highlights.backlinks_count",
+            factor=event.backlinks_boost,
         ),
         path="highlights",
         score_mode="max",
@@ -35,8 +37,9 @@ def handler(event: SearchEventModel, context: LambdaContext):
         },
     )
     s = AppDocument.search()\
-        .filter("workspace", workspace=event.workspace)\
-        .query(Bool(must=[match_document, match_highlight]))
+        .filter("term", workspace=event.workspace)\
+        .query(_boost_by_backlinks(Bool(must=[match_document, match_highlight]), field="backlinks_count",
+                                   factor=event.backlinks_boost))
 
     response = s.execute()
 
@@ -58,3 +61,15 @@ def handler(event: SearchEventModel, context: LambdaContext):
             content_type=hit.content_type,
         ))
     return SearchResponseModel(documents=documents).dict()
+
+
+def _boost_by_backlinks(query: Query, field: str, factor: float) -> Query:
+    # Documents (/ highlights) that are referenced more often rank higher, the boost is added to the score (instead of
+    # multiplied), so that matches without backlinks are not scored 0
+    if not factor:
+        return query
+    return FunctionScore(
+        query=query,
+        functions=[SF("field_value_factor", field=field, factor=factor, modifier="log1p", missing=0)],
+        boost_mode="sum",
+    )
@@ -0,0 +1,144 @@
+from typing import Dict, Optional
+from aws_lambda_powertools import Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.parser import event_parser
+from aws_lambda_powertools.utilities.parser.models import SqsModel, SqsRecordModel
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from elasticsearch.helpers import streaming_bulk
+from app.interface import DocumentSavedEventModel, DocumentDeletedEventModel
+from app.es import client, AppDocument
+from app.claim_check import load_claim_check
+from app.middleware.middleware import logger
+
+
+metrics = Metrics(namespace="DocumentSearch", service="DocumentSearch")
+
+# Applies the fields of a saved event that are older in the indexed document: events are deltas, so every field is
+# stamped by the event that set it (see _stamp). Deleted documents are kept as tombstones, later (stale) events of them
+# are skipped.
+_UPDATE_SCRIPT = """
+def source = ctx._source;
+if (source.deleted == true) {
+    ctx.op = 'noop';
+} else {
+    if (source.stamps == null) {
+        source.stamps = new HashMap();
+    }
+    boolean applied = false;
+    for (field in params.fields.entrySet()) {
+        def stamp = source.stamps[field.getKey()];
+        if (stamp == null || stamp.compareTo(params.stamp) < 0) {
+            source[field.getKey()] = field.getValue();
+            source.stamps[field.getKey()] = params.stamp;
+            applied = true;
+        }
+    }
+    if (!applied) {
+        ctx.op = 'noop';
+    }
+}
+"""
+
+# The tombstone has none of the indexed fields, so it matches no search (document ids are not reused)
+_DELETE_SCRIPT = """
+if (ctx._source.deleted == true) {
+    ctx.op = 'noop';
+} else {
+    ctx._source.clear();
+    ctx._source.deleted = true;
+}
+"""
+
+# Consumes the document events from the queue that is subscribed to the document event topic and indexes them with one
+# bulk request per batch. Not wrapped by the middleware: failed events are reported (batchItemFailures), so that only
+# they are retried.
+@metrics.log_metrics
+@logger.inject_lambda_context
+@event_parser(model=SqsModel)
+def handler(event: SqsModel, context: LambdaContext):
+    failed_message_ids = set()
+    actions = []  # (message id, bulk action)
+    for record in event.Records:
+        try:
+            actions.append((record.messageId, _bulk_action(record)))
+        except Exception:
+            logger.exception("EventError")  # invalid event or the claim check could not be loaded
+            failed_message_ids.add(record.messageId)
+
+    # the results are yielded in the order of the actions
+    results = streaming_bulk(client, (action for _, action in actions), raise_on_error=False,
+                             raise_on_exception=False)
+    skipped = 0
+    for (message_id, action), (ok, item) in zip(actions, results):
+        if not ok:
+            logger.error("BulkItemError", extra={"item": item})
+            failed_message_ids.add(message_id)
+        elif item.get("update", {}).get("result") == "noop":
+            skipped += 1
+    # stale or redelivered events
+    metrics.add_metric(name="SkippedDocumentEvents", unit=MetricUnit.Count, value=skipped)
+
+    # The events of a document are ordered (fifo), the events after a failed one are retried with it
+    failed_groups = set()
+    for record in event.Records:
+        group = record.attributes.MessageGroupId
+        if group in failed_groups:
+            failed_message_ids.add(record.messageId)
+        elif record.messageId in failed_message_ids:
+            failed_groups.add(group)
+
+    return {"batchItemFailures": [{"itemIdentifier": record.messageId} for record in event.Records
+                                  if record.messageId in failed_message_ids]}
+
+
+def _bulk_action(record: SqsRecordModel) -> Dict:
+    # the queue subscription delivers raw messages, the attributes of the sns message are sqs message attributes
+    event_type = record.messageAttributes["eventType"].stringValue
+    if event_type == "documentDeleted":
+        deleted_event = DocumentDeletedEventModel.parse_raw(record.body)
+        return _scripted_upsert(deleted_event.document_id, _DELETE_SCRIPT, {})
+    if event_type != "documentSaved":
+        raise ValueError(f"Unknown event type: {event_type}")
+
+    saved_event = DocumentSavedEventModel.parse_raw(record.body)
+    if saved_event.claim_check:
+        saved_event = DocumentSavedEventModel.parse_raw(load_claim_check(saved_event.claim_check))
+
+    # only the changed fields are updated
+    fields = {"workspace": saved_event.workspace}
+    if saved_event.title is not None:
+        fields["title"] = saved_event.title
+    if saved_event.tags is not None:
+        fields["tag"] = saved_event.tags
+    if saved_event.content_type is not None:
+        fields["content_type"] = saved_event.content_type
+    if saved_event.backlinks_count is not None:
+        fields["backlinks_count"] = saved_event.backlinks_count
+    if saved_event.highlights is not None:
+        fields["highlights"] = [{
+            "link_preview_text": highlight.link_preview_text,
+            "backlinks_count": len(highlight.backlinks),
+        } for highlight in saved_event.highlights]
+    return _scripted_upsert(saved_event.id, _UPDATE_SCRIPT, {
+        "fields": fields,
+        "stamp": _stamp(saved_event.version, record.attributes.SequenceNumber),
+    })
+
+
+def _scripted_upsert(document_id: str, script: str, params: Dict) -> Dict:
+    # the script also runs if the document is not indexed (yet)
+    return {
+        "_op_type": "update",
+        "_index": AppDocument._index._name,
+        "_id": document_id,
+        "script": {"source": script, "lang": "painless", "params": params},
+        "scripted_upsert": True,
+        "upsert": {},
+    }
+
+
+def _stamp(version: int, sequence_number: Optional[str]) -> str:
+    # Orders the events of a document by the version, the events of the same version by their sequence number in the
+    # queue (redelivered events have the same). Padded, so that the stamps (the sequence numbers are 128 bit) can be
+    # compared as strings.
+    return f"{version:020d}{(sequence_number or '').zfill(40)}"
@@ -1,3 +1,4 @@
+import os
 from elasticsearch import Elasticsearch, RequestsHttpConnection
 from requests_aws4auth import AWS4Auth
 import boto3
@@ -5,11 +6,11 @@ import boto3
 
 def get_client() -> Elasticsearch:
     host = ""
-    region = ""
+    region = os.environ.get("AWS_REGION", "")  # set by the lambda runtime
 
     credentials = boto3.Session().get_credentials()
-    awsauth = AWS4Auth(credentials.access_key, credentials.secret_key, region,
-                       service="es", session_token=credentials.token)
+    awsauth = AWS4Auth(credentials.access_key, credentials.secret_key, region, "es",
+                       session_token=credentials.token)
 
     client = Elasticsearch(
         hosts=[{'host': host, 'port': 443}],
@@ -1,4 +1,4 @@
-from elasticsearch_dsl import Index, Document, InnerDoc, Nested, Text, Integer
+from elasticsearch_dsl import Index, Document, InnerDoc, Nested, Object, Text, Keyword, Integer, Boolean
 from . import client
 
 
@@ -21,12 +21,15 @@ class AppHighlight(InnerDoc):
 @app_document_search_index.document
 class AppDocument(Document):
     # id is the document id
-    workspace = Text()
+    workspace = Keyword()  # filtered by the exact value
     title = Text()
     tag = Text()
     backlinks_count = Integer()  # + the sum of the backlinks_count of all contained highlights
     highlights = Nested(AppHighlight)
     content_type = Text()
+    # field -> stamp of the event that set it, deleted -> tombstone (see the update_on_document_event controller)
+    stamps = Object(enabled=False)
+    deleted = Boolean()
     # TODO content body
 
 
@@ -1,3 +1,3 @@
 from .base_model import BaseModel
-from .models import DocumentSavedEventModel, DocumentDeletedEventModel, SearchEventModel, SearchResponseModel,\
+from .models import DocumentSavedEventModel, ClaimCheckModel, DocumentDeletedEventModel, SearchEventModel, SearchResponseModel,\
     SearchResponseDocumentModel, SearchResponseHighlightModel
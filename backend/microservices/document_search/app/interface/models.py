@@ -1,6 +1,6 @@
 from typing import List
-from aws_lambda_powertools.utilities.parser import BaseModel
-from aws_lambda_powertools.utilities.parser.models import SnsModel
+from pydantic import confloat
+from .base_model import BaseModel
 
 
 # Shared
@@ -28,25 +28,35 @@ class HighlightModel(BaseModel):
     backlinks: List[LinkModel]
 
 
-class DocumentSavedEventModel(SnsModel):
+class ClaimCheckModel(BaseModel):
+    bucket: str
+    key: str
+
+
+class DocumentSavedEventModel(BaseModel):
+    # Delta of a saved document: only the fields that changed (named by changed_fields) are set, the fields that are
+    # not indexed (e.g. links) are not parsed at all
     id: str
     workspace: str
-    title: str
-    tags: List[str]
-    content_type: str
-    content_body_url: str = None
-    links: List[LinkModel]
-    backlinks: List[LinkModel]
-    highlights: List[HighlightModel]
+    version: int
+    changed_fields: List[str]
+    title: str = None
+    tags: List[str] = None
+    content_type: str = None
+    backlinks_count: int = None  # of the document and all its highlights
+    highlights: List[HighlightModel] = None
+    claim_check: ClaimCheckModel = None  # -> the fields are stored in the claim check (see load_claim_check)
 
 
-class DocumentDeletedEventModel(SnsModel, DocumentIdentifierModel):
+class DocumentDeletedEventModel(DocumentIdentifierModel):
     pass
 
 
 class SearchEventModel(WorkspaceIdentifierModel):
     query: str
     include_highlights = False
+    # factor of the boost by the backlinks count (log1p(factor * backlinks count) is added to the score), 0 -> disabled
+    backlinks_boost: confloat(ge=0) = 1.0
 
 
 # Response
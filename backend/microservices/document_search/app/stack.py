@@ -3,6 +3,8 @@ import aws_cdk.aws_elasticsearch as es
 import aws_cdk.aws_lambda as lambda_
 import aws_cdk.aws_sns as sns
 import aws_cdk.aws_sns_subscriptions as subs
+import aws_cdk.aws_sqs as sqs
+import aws_cdk.aws_lambda_event_sources as lambda_event_sources
 
 
 class DocumentSearchServiceStack(core.Stack):
@@ -33,8 +35,36 @@ class DocumentSearchServiceStack(core.Stack):
         )
 
         document_event_sns_topic: sns.Topic = document_service_stack.document_event_sns_topic
-        self.update_on_document_event_lambda_function = lambda_.Function()
-        document_event_sns_topic.add_subscription(subs.LambdaSubscription(
-            self.update_on_document_event_lambda_function)
+        # the events are buffered by a queue, so that they are indexed in batches
+        document_event_sqs_queue = sqs.Queue(
+            self,
+            "DocumentSearchDocumentEvent",
+            queue_name="DocumentSearchDocumentEvent.fifo",
+            fifo=True,
+            visibility_timeout=core.Duration.minutes(2),
+            # an event that keeps failing would otherwise block the later events of its document
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=5,
+                queue=sqs.Queue(
+                    self,
+                    "DocumentSearchDocumentEventDeadLetter",
+                    queue_name="DocumentSearchDocumentEventDeadLetter.fifo",
+                    fifo=True,
+                    retention_period=core.Duration.days(14),
+                ),
+            ),
         )
+        document_event_sns_topic.add_subscription(subs.SqsSubscription(
+            document_event_sqs_queue,
+            raw_message_delivery=True,
+        ))
+        self.update_on_document_event_lambda_function = lambda_.Function()
+        self.update_on_document_event_lambda_function.add_event_source(lambda_event_sources.SqsEventSource(
+            document_event_sqs_queue,
+            batch_size=10,  # maximum of fifo queues
+            report_batch_item_failures=True,
+        ))
         es_domain.grant_write(self.update_on_document_event_lambda_function)
+        document_service_stack.document_event_claim_check_s3_bucket.grant_read(
+            self.update_on_document_event_lambda_function
+        )
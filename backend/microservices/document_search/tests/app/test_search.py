@@ -0,0 +1,57 @@
+import pytest
+from elasticsearch_dsl import Search
+from aws_lambda_powertools.utilities.parser import ValidationError
+from app.interface import SearchEventModel
+from app.controllers.search.lambda_function import handler
+
+
+@pytest.fixture
+def executed_queries(monkeypatch):
+    queries = []
+
+    def execute(search, ignore_cache=False):
+        queries.append(search.to_dict()["query"])
+        return []
+    monkeypatch.setattr(Search, "execute", execute)
+    return queries
+
+
+def backlinks_boost(query, field, factor=1.0):
+    return {"function_score": {
+        "query": query,
+        "functions": [{"field_value_factor": {"field": field, "factor": factor, "modifier": "log1p", "missing": 0}}],
+        "boost_mode": "sum",
+    }}
+
+
+def test_matches_are_boosted_by_their_backlinks(lambda_context, executed_queries):
+    handler({"workspace": "MyWorkspace", "query": "Lorem", "backlinksBoost": 0.5}, lambda_context)
+
+    query, = executed_queries
+    must_document, must_highlight = query["bool"]["must"][0]["function_score"]["query"]["bool"]["must"]
+    assert query["bool"]["must"][0] == backlinks_boost(
+        {"bool": {"must": [must_document, must_highlight]}}, "backlinks_count", 0.5)
+    assert must_highlight["nested"]["query"] == backlinks_boost(
+        {"multi_match": {"query": "Lorem", "fields": ["link_preview_text"]}}, "highlights.backlinks_count", 0.5)
+    assert query["bool"]["filter"] == [{"term": {"workspace": "MyWorkspace"}}]
+
+
+def test_boost_is_applied_by_default(lambda_context, executed_queries):
+    handler({"workspace": "MyWorkspace", "query": "Lorem"}, lambda_context)
+
+    query, = executed_queries
+    assert query["bool"]["must"][0]["function_score"]["functions"][0]["field_value_factor"]["factor"] == 1.0
+
+
+def test_boost_can_be_disabled(lambda_context, executed_queries):
+    handler({"workspace": "MyWorkspace", "query": "Lorem", "backlinksBoost": 0}, lambda_context)
+
+    query, = executed_queries
+    must_document, must_highlight = query["bool"]["must"]
+    assert must_document == {"multi_match": {"query": "Lorem", "fields": ["title", "tag^2", "content_type"]}}
+    assert must_highlight["nested"]["query"] == {"multi_match": {"query": "Lorem", "fields": ["link_preview_text"]}}
+
+
+def test_negative_boost_is_rejected():
+    with pytest.raises(ValidationError):
+        SearchEventModel.parse_obj({"workspace": "MyWorkspace", "query": "Lorem", "backlinksBoost": -1})
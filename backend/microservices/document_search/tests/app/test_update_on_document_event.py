@@ -0,0 +1,163 @@
+import json
+import pytest
+from app.controllers.update_on_document_event import lambda_function
+from app.controllers.update_on_document_event.lambda_function import handler
+
+
+class StreamingBulk:
+    # stub of elasticsearch.helpers.streaming_bulk, the items of the given ids fail with the given status
+
+    def __init__(self, fail=None, noop=()):
+        # noop -> the ids whose update scripts skip the event
+        self.calls = 0
+        self.actions = []
+        self._fail = fail or {}
+        self._noop = noop
+
+    def __call__(self, client, actions, raise_on_error, raise_on_exception):
+        self.calls += 1
+        for action in actions:
+            self.actions.append(action)
+            status = self._fail.get(action["_id"])
+            yield (status is None, {action["_op_type"]: {"_id": action["_id"], "status": status or 200,
+                                                         "result": "noop" if action["_id"] in self._noop else "updated"}})
+
+
+@pytest.fixture
+def streaming_bulk(monkeypatch):
+    def use(fail=None, noop=()):
+        stub = StreamingBulk(fail, noop)
+        monkeypatch.setattr(lambda_function, "streaming_bulk", stub)
+        return stub
+    return use
+
+
+def record(message_id, event_type, body, group):
+    return {
+        "messageId": message_id,
+        "receiptHandle": "receipt-handle",
+        "body": json.dumps(body),
+        "attributes": {
+            "ApproximateReceiveCount": "1",
+            "ApproximateFirstReceiveTimestamp": "1545082649185",
+            "MessageGroupId": group,
+            "MessageDeduplicationId": message_id,
+            "SenderId": "AIDAIENQZJOLO23YVJ4VO",
+            "SentTimestamp": "1545082649183",
+            "SequenceNumber": str(int(message_id) + 1000),
+        },
+        "messageAttributes": {"eventType": {"stringValue": event_type, "dataType": "String"}},
+        "md5OfBody": "e4e68fb7bd0e697a0ae8f1bb342846b3",
+        "eventSource": "aws:sqs",
+        "eventSourceARN": "arn:aws:sqs:eu-west-1:809313241:DocumentSearchDocumentEvent.fifo",
+        "awsRegion": "eu-west-1",
+    }
+
+
+def saved(message_id, document_id, **fields):
+    return record(message_id, "documentSaved", {"id": document_id, "workspace": "MyWorkspace", "version": 1,
+                                                "changedFields": [*fields], **fields}, group=document_id)
+
+
+def deleted(message_id, document_id):
+    return record(message_id, "documentDeleted", {"documentId": document_id, "workspace": "MyWorkspace"},
+                  group=document_id)
+
+
+def failed(response):
+    return [failure["itemIdentifier"] for failure in response["batchItemFailures"]]
+
+
+def test_events_are_dispatched_to_bulk_actions(lambda_context, streaming_bulk):
+    stub = streaming_bulk()
+    response = handler({"Records": [
+        saved("1", "a", title="MyDocument", tags=["MyTag"]),
+        deleted("2", "b"),
+    ]}, lambda_context)
+
+    assert failed(response) == []
+    assert stub.calls == 1  # one bulk request per batch
+    assert [(action["_index"], action["_id"]) for action in stub.actions] \
+        == [("DocumentSearchV1", "a"), ("DocumentSearchV1", "b")]
+    update, _ = stub.actions
+    assert update["script"]["params"]["fields"] == {"workspace": "MyWorkspace", "title": "MyDocument",
+                                                    "tag": ["MyTag"]}  # only the changed fields
+
+
+def test_failed_bulk_items_are_reported(lambda_context, streaming_bulk):
+    streaming_bulk(fail={"a": 400})
+    response = handler({"Records": [
+        saved("1", "a", title="MyDocument"),
+        saved("2", "b", title="MyOtherDocument"),
+    ]}, lambda_context)
+
+    assert failed(response) == ["1"]
+
+
+def test_failed_deletes_are_retried(lambda_context, streaming_bulk):
+    streaming_bulk(fail={"a": 429})
+    response = handler({"Records": [
+        deleted("1", "a"),
+        deleted("2", "b"),
+    ]}, lambda_context)
+
+    assert failed(response) == ["1"]
+
+
+def test_later_events_of_a_failed_document_are_retried(lambda_context, streaming_bulk):
+    stub = streaming_bulk(fail={"a": 429})
+    response = handler({"Records": [
+        saved("1", "a", title="MyDocument"),
+        saved("2", "b", title="MyOtherDocument"),
+        record("3", "unknownEvent", {}, group="c"),
+        saved("4", "a", title="MyRenamedDocument"),
+        saved("5", "c", title="MyThirdDocument"),
+    ]}, lambda_context)
+
+    assert failed(response) == ["1", "3", "4", "5"]
+    assert [action["_id"] for action in stub.actions] == ["a", "b", "a", "c"]  # invalid events are not sent
+
+
+def test_saved_events_are_applied_per_field_by_their_stamp(lambda_context, streaming_bulk):
+    stub = streaming_bulk()
+    handler({"Records": [saved("1", "a", title="MyDocument")]}, lambda_context)
+
+    update, = stub.actions
+    assert (update["_op_type"], update["scripted_upsert"], update["upsert"]) == ("update", True, {})
+    assert update["script"]["source"] == lambda_function._UPDATE_SCRIPT
+    assert update["script"]["params"]["stamp"] == lambda_function._stamp(1, "1001")
+
+
+def test_events_are_stamped_by_version_and_sequence_number():
+    stamps = [lambda_function._stamp(1, "99"), lambda_function._stamp(1, "100"), lambda_function._stamp(2, "5"),
+              lambda_function._stamp(10, "1")]
+    assert sorted(stamps) == stamps
+
+
+def test_deletes_leave_a_tombstone(lambda_context, streaming_bulk):
+    stub = streaming_bulk()
+    handler({"Records": [deleted("1", "a")]}, lambda_context)
+
+    delete, = stub.actions
+    # an upsert, so that a stale save of the document that is indexed after the delete is skipped
+    assert (delete["_op_type"], delete["_id"], delete["scripted_upsert"], delete["upsert"]) == ("update", "a", True, {})
+    assert delete["script"]["source"] == lambda_function._DELETE_SCRIPT
+
+
+def test_skipped_events_are_counted(lambda_context, streaming_bulk, monkeypatch):
+    added_metrics = []
+    add_metric = lambda_function.metrics.add_metric
+
+    def record_metric(name, unit, value):
+        added_metrics.append((name, value))
+        add_metric(name=name, unit=unit, value=value)
+    monkeypatch.setattr(lambda_function.metrics, "add_metric", record_metric)
+    streaming_bulk(noop=("a", "b"))
+    response = handler({"Records": [
+        saved("1", "a", title="MyDocument"),
+        deleted("2", "b"),
+        saved("3", "c", title="MyOtherDocument"),
+    ]}, lambda_context)
+
+    assert failed(response) == []  # skipping is not a failure
+    assert added_metrics == [("SkippedDocumentEvents", 2)]